@@ -0,0 +1,346 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Load test of the server, booted in-process with mock agents, through its API.
+
+Each mock agent streams `steps` messages of `output_bytes`, over `latency`
+seconds in total, and interrupts a share `interrupt_rate` of its runs halfway.
+The scenarios drive the API at the given concurrency (clients sending their
+next request as soon as the previous one returns):
+- runs: POST /runs, then GET /runs/{run_id}/wait
+- wait: POST /runs/wait
+- stream: POST /runs/stream, reading the SSE stream to its end, then
+  GET /runs/{run_id} for the status of the run
+- threads: POST /threads, then POST /threads/{thread_id}/runs/wait
+Interrupted stateless runs are resumed with POST /runs/{run_id}, then waited
+for, within the same request. Thread runs cannot be resumed yet: use agents
+without interrupts for the threads scenario.
+
+Reports, as a JSON line per scenario and concurrency: the throughput, the
+p50/p95/p99 latency of the requests and the growth of the RSS of the process.
+The client shares the event loop of the server, so it takes its part of the
+CPU: compare the results of a same machine and settings.
+
+Run with: `AGWS_STORAGE_PERSIST=False poetry run python -m benchmarks.load_test \\
+    --agents '[{"latency": 0.05, "steps": 5, "interrupt_rate": 0.1}]'`
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, NamedTuple, Optional
+from uuid import NAMESPACE_URL, uuid5
+
+import httpx
+import uvicorn
+
+from agent_workflow_server.agents.base import BaseAgent
+from agent_workflow_server.agents.load import AGENTS, AgentInfo, _read_manifest
+from agent_workflow_server.agents.validators import AgentValidators
+from agent_workflow_server.main import app
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.queue import start_workers
+from agent_workflow_server.services.thread_state import ThreadState
+from agent_workflow_server.storage.models import Run
+
+# Input, output and interrupt schemas of the mock agents
+MANIFEST_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "mock_manifest.json"
+)
+
+SCENARIOS = ("runs", "wait", "stream", "threads")
+
+
+class AgentProfile(NamedTuple):
+    latency: float = 0.01
+    output_bytes: int = 100
+    steps: int = 1
+    interrupt_rate: float = 0.0
+
+
+class LoadAgent(BaseAgent):
+    def __init__(self, profile: AgentProfile):
+        self.profile = profile
+        self.random = random.Random(0)
+
+    async def astream(self, run: Run) -> AsyncGenerator[Message, None]:
+        profile = self.profile
+        text = "x" * profile.output_bytes
+        resumed = (run.get("interrupt") or {}).get("user_data") is not None
+        # Interrupted runs stream half of the steps, and the rest when resumed,
+        # at least one each
+        half = max(1, profile.steps // 2)
+        steps = range(profile.steps)
+        if resumed:
+            steps = range(half, max(half + 1, profile.steps))
+        elif self.random.random() < profile.interrupt_rate:
+            steps = range(half)
+        else:
+            resumed = True
+        for step in steps:
+            await asyncio.sleep(profile.latency / profile.steps)
+            yield Message(type="message", data={"message": text}, step=f"step_{step}")
+        if not resumed:
+            yield Message(
+                type="interrupt",
+                event="mock_interrupt",
+                data={"interrupt_message": text},
+            )
+
+    async def get_agent_state(self, thread_id: str) -> Optional[ThreadState]:
+        return None
+
+    async def get_history(
+        self, thread_id: str, limit: int, before: int
+    ) -> List[ThreadState]:
+        return []
+
+    async def update_agent_state(
+        self, thread_id: str, state: ThreadState
+    ) -> Optional[ThreadState]:
+        return None
+
+
+def register_agents(profiles: List[AgentProfile]) -> List[str]:
+    acp_descriptor, deployment = _read_manifest(MANIFEST_PATH)
+    agent_ids = []
+    for i, profile in enumerate(profiles):
+        agent_id = str(uuid5(NAMESPACE_URL, f"load-agent-{i}"))
+        AGENTS[agent_id] = AgentInfo(
+            agent=LoadAgent(profile),
+            acp_descriptor=acp_descriptor,
+            # The OpenAPI spec of the agents is not served in the load test
+            schema={},
+            deployment=deployment,
+            validators=AgentValidators.from_specs(acp_descriptor.specs),
+        )
+        agent_ids.append(agent_id)
+    return agent_ids
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak RSS, in bytes on macOS and in KB elsewhere
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+class RunOutcome(NamedTuple):
+    status: str
+    interrupted: bool
+
+
+def _json(response: httpx.Response) -> dict:
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+    return response.json()
+
+
+class Client:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    def _body(self, agent_id: str) -> dict:
+        return {
+            "agent_id": agent_id,
+            "input": {"message": "What's up?"},
+            "config": {"configurable": {}},
+        }
+
+    async def _resume(self, run_id: str) -> RunOutcome:
+        url = f"/runs/{run_id}"
+        _json(await self.client.post(url, json={"message": "Go on"}))
+        response = await self.client.get(f"{url}/wait")
+        return RunOutcome(_json(response)["run"]["status"], True)
+
+    async def _outcome(self, result: dict) -> RunOutcome:
+        status = result["run"]["status"]
+        if status == "interrupted":
+            return await self._resume(result["run"]["run_id"])
+        return RunOutcome(status, False)
+
+    async def runs(self, agent_id: str) -> RunOutcome:
+        response = await self.client.post("/runs", json=self._body(agent_id))
+        run_id = _json(response)["run_id"]
+        response = await self.client.get(f"/runs/{run_id}/wait")
+        return await self._outcome(_json(response))
+
+    async def wait(self, agent_id: str) -> RunOutcome:
+        response = await self.client.post("/runs/wait", json=self._body(agent_id))
+        return await self._outcome(_json(response))
+
+    async def stream(self, agent_id: str) -> RunOutcome:
+        run_id = None
+        async with self.client.stream(
+            "POST", "/runs/stream", json=self._body(agent_id)
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+            async for line in response.aiter_lines():
+                if run_id is None and line.startswith("data: "):
+                    run_id = json.loads(line[6:])["run_id"]
+        if run_id is None:
+            raise RuntimeError("no event streamed")
+        # Interrupts are not streamed
+        status = _json(await self.client.get(f"/runs/{run_id}"))["status"]
+        if status == "interrupted":
+            return await self._resume(run_id)
+        return RunOutcome(status, False)
+
+    async def threads(self, agent_id: str) -> RunOutcome:
+        response = await self.client.post("/threads", json={"metadata": {}})
+        thread_id = _json(response)["thread_id"]
+        response = await self.client.post(
+            f"/threads/{thread_id}/runs/wait", json=self._body(agent_id)
+        )
+        status = _json(response)["run"]["status"]
+        return RunOutcome(status, status == "interrupted")
+
+
+async def _drive(
+    request: Callable[[str], Awaitable[RunOutcome]],
+    agent_ids: List[str],
+    n_requests: int,
+    concurrency: int,
+) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    interrupted = 0
+    sent = 0
+
+    async def client():
+        nonlocal sent, interrupted
+        while sent < n_requests:
+            agent_id = agent_ids[sent % len(agent_ids)]
+            sent += 1
+            started_at = time.perf_counter()
+            try:
+                outcome = await request(agent_id)
+            except Exception as error:
+                error = f"{type(error).__name__}: {error}"[:200]
+                errors[error] = errors.get(error, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started_at)
+            statuses[outcome.status] = statuses.get(outcome.status, 0) + 1
+            interrupted += outcome.interrupted
+
+    rss_before = _rss_bytes()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    rss_after = _rss_bytes()
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "requests/s": round(len(latencies) / elapsed, 1),
+        "p50 (ms)": round(_percentile(latencies, 50) * 1e3, 1),
+        "p95 (ms)": round(_percentile(latencies, 95) * 1e3, 1),
+        "p99 (ms)": round(_percentile(latencies, 99) * 1e3, 1),
+        "statuses": statuses,
+        "errors": errors,
+        "interrupted": interrupted,
+        "rss (MB)": round(rss_after / 2**20, 1),
+        "rss growth (MB)": round((rss_after - rss_before) / 2**20, 1),
+    }
+
+
+async def _bench(args: argparse.Namespace) -> None:
+    # The client logs each request at INFO level
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    profiles = [AgentProfile(**profile) for profile in json.loads(args.agents)]
+    agent_ids = register_agents(profiles)
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=args.host, port=args.port, log_level="warning")
+    )
+    workers = asyncio.create_task(start_workers(args.workers))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    results = []
+    rss_start = _rss_bytes()
+    # A connection per concurrent client, without timeouts
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://{args.host}:{args.port}", timeout=None, limits=limits
+        ) as http_client:
+            client = Client(http_client)
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = {
+                        "scenario": scenario,
+                        **await _drive(
+                            getattr(client, scenario),
+                            agent_ids,
+                            args.requests,
+                            concurrency,
+                        ),
+                    }
+                    print(json.dumps(result), flush=True)
+                    results.append(result)
+    finally:
+        server.should_exit = True
+        await serving
+        workers.cancel()
+        await asyncio.gather(workers, return_exceptions=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "agents": [profile._asdict() for profile in profiles],
+                    "workers": args.workers,
+                    "results": results,
+                    "rss growth (MB)": round((_rss_bytes() - rss_start) / 2**20, 1),
+                },
+                f,
+                indent=2,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--agents",
+        default='[{"latency": 0.01, "output_bytes": 100, "steps": 1, "interrupt_rate": 0}]',
+        help="JSON list of mock agents: latency, output_bytes, steps, interrupt_rate",
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write the report, as JSON, to this file")
+    args = parser.parse_args()
+
+    asyncio.run(_bench(args))
+
+
+if __name__ == "__main__":
+    main()
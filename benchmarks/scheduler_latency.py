@@ -0,0 +1,95 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of the queue latency of runs (queue_s) under skewed load: one agent
+floods the queue with a burst of runs while other agents submit runs steadily.
+Compares the plain FIFO asyncio.Queue with the RunScheduler.
+
+Run with: `AGWS_STORAGE_PERSIST=False poetry run python -m benchmarks.scheduler_latency`
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from agent_workflow_server.services.scheduler import RunScheduler
+
+FLOOD_AGENT = "flood"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _simulate(queue: asyncio.Queue, runs: Dict[str, dict], args) -> Dict:
+    enqueued_at: Dict[str, float] = {}
+    queue_s: Dict[str, List[float]] = {}
+
+    async def worker():
+        while True:
+            run_id = await queue.get()
+            agent_id = runs[run_id]["agent_id"]
+            queue_s.setdefault(agent_id, []).append(
+                time.perf_counter() - enqueued_at[run_id]
+            )
+            await asyncio.sleep(args.service_ms / 1000)
+            queue.task_done()
+
+    async def submit(agent_id: str, n_runs: int, interval_s: float):
+        for i in range(n_runs):
+            run_id = f"{agent_id}-{i}"
+            runs[run_id] = {"run_id": run_id, "agent_id": agent_id, "metadata": None}
+            enqueued_at[run_id] = time.perf_counter()
+            await queue.put(run_id)
+            if interval_s:
+                await asyncio.sleep(interval_s)
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.workers)]
+    await asyncio.gather(
+        submit(FLOOD_AGENT, args.flood_runs, 0),
+        *[
+            submit(f"agent-{i}", args.steady_runs, args.steady_interval_ms / 1000)
+            for i in range(args.steady_agents)
+        ],
+    )
+    await queue.join()
+    for task in workers:
+        task.cancel()
+
+    results = {}
+    for agent_id, values in sorted(queue_s.items()):
+        key = "flood" if agent_id == FLOOD_AGENT else "steady"
+        results.setdefault(key, []).extend(values)
+    return {
+        key: {
+            "p50 (ms)": round(statistics.median(values) * 1000, 1),
+            "p99 (ms)": round(_percentile(values, 0.99) * 1000, 1),
+            "max (ms)": round(max(values) * 1000, 1),
+        }
+        for key, values in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--service-ms", type=float, default=2.0)
+    parser.add_argument("--flood-runs", type=int, default=2000)
+    parser.add_argument("--steady-agents", type=int, default=3)
+    parser.add_argument("--steady-runs", type=int, default=50)
+    parser.add_argument("--steady-interval-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    for name in ("fifo", "scheduler"):
+        runs: Dict[str, dict] = {}
+        queue = asyncio.Queue() if name == "fifo" else RunScheduler(runs.get)
+        results = asyncio.run(_simulate(queue, runs, args))
+        print(json.dumps({"queue": name, **results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of the conversion of the streamed messages by the worker, on the
+state of a LangGraph agent whose list of messages grows at each step: with the
+previous make_serializable, which rebuilt every list and dict, and the current
+one, which converts by type and only copies the containers holding converted
+values.
+
+The messages are either plain dicts or langchain_core message models.
+
+Run with: `poetry run python -m benchmarks.serialization_cost --steps 200`
+"""
+
+import argparse
+import json
+import time
+from enum import Enum
+from typing import Any, Callable, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from agent_workflow_server.utils.tools import make_serializable, serialize_json
+
+
+def _previous(v: Any):
+    if isinstance(v, list):
+        return [_previous(vv) for vv in v]
+    elif isinstance(v, dict):
+        return {kk: _previous(vv) for kk, vv in v.items()}
+    elif (
+        isinstance(v, BaseModel) and hasattr(v, "model_dump") and callable(v.model_dump)
+    ):
+        return v.model_dump(mode="json")
+    elif isinstance(v, BaseModel) and hasattr(v, "dict") and callable(v.dict):
+        return v.dict()
+    elif isinstance(v, Enum):
+        return v.value
+    else:
+        return v
+
+
+def _message(i: int, models: bool):
+    content = f"Message {i}: " + "lorem ipsum dolor sit amet " * 10
+    if models:
+        cls = HumanMessage if i % 2 == 0 else AIMessage
+        return cls(content=content, id=str(i))
+    return {
+        "type": "human" if i % 2 == 0 else "ai",
+        "content": content,
+        "id": str(i),
+        "additional_kwargs": {},
+        "response_metadata": {"model": "gpt", "tokens": {"input": i, "output": 10}},
+    }
+
+
+def _states(n_steps: int, models: bool) -> List[dict]:
+    """State update streamed at each step of the agent"""
+    messages = []
+    states = []
+    for i in range(n_steps):
+        messages = messages + [_message(i, models)]
+        states.append({"chatbot": {"messages": messages, "summary": None, "step": i}})
+    return states
+
+
+def _time(convert: Callable[[Any], Any], states: List[dict]) -> float:
+    started_at = time.perf_counter()
+    for state in states:
+        convert(state)
+    return (time.perf_counter() - started_at) / len(states)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    for models in (False, True):
+        states = _states(args.steps, models)
+        for name, convert in (
+            ("previous", _previous),
+            ("make_serializable", make_serializable),
+            ("serialize_json", serialize_json),
+        ):
+            print(
+                json.dumps(
+                    {
+                        "messages": "models" if models else "dicts",
+                        "conversion": name,
+                        "per message (us)": round(_time(convert, states) * 1e6, 1),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of the streaming throughput of a run to several SSE connections:
+the worker publishes messages while each connection serializes them.
+
+Compares serializing the API models for each connection ("models", as done
+before SSE frames were shared) with the SSE frames built once per message and
+shared by all the connections ("frames").
+
+Run with: `AGWS_STORAGE_PERSIST=False poetry run python -m benchmarks.sse_throughput`
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import AsyncIterator
+
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.runs import Runs, stream_manager
+from agent_workflow_server.storage.storage import DB
+
+
+def _payload(i: int) -> dict:
+    return {
+        "messages": [
+            {"type": "ai", "content": f"chunk {i} " + "lorem ipsum " * 20, "id": i}
+        ],
+        "step": i,
+        "metadata": {"node": "agent", "tags": ["a", "b"]},
+    }
+
+
+async def _models(run_id: str) -> AsyncIterator[bytes]:
+    event_id = 0
+    async for event in Runs.stream_events(run_id):
+        if event is None:
+            yield b":"
+        else:
+            event_id += 1
+            yield f"id: {event_id}\nevent: agent_event\ndata: {event.to_json()}\n\n".encode()
+
+
+async def _bench(mode: str, n_connections: int, n_messages: int) -> dict:
+    now = datetime.now()
+    run_id = f"{mode}-{n_connections}"
+    DB.create_run(
+        {
+            "run_id": run_id,
+            "agent_id": "agent",
+            "thread_id": None,
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": now,
+            "updated_at": now,
+            "status": "pending",
+        }
+    )
+    # Nothing dropped
+    stream_manager.max_size = n_messages + 1
+
+    async def connection() -> int:
+        stream = _models(run_id) if mode == "models" else Runs.stream_frames(run_id)
+        sent = 0
+        async for chunk in stream:
+            sent += len(chunk)
+        return sent
+
+    connections = [asyncio.create_task(connection()) for _ in range(n_connections)]
+    await asyncio.sleep(0)
+    started_at = time.perf_counter()
+    for i in range(n_messages):
+        await Runs.Stream.publish(run_id, Message(type="message", data=_payload(i)))
+    await Runs.Stream.publish(run_id, Message(type="control", data="done"))
+    await asyncio.gather(*connections)
+    elapsed = time.perf_counter() - started_at
+    return {
+        "mode": mode,
+        "connections": n_connections,
+        "messages/s per connection": round(n_messages / elapsed),
+        "events/s": round(n_messages * n_connections / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    for n_connections in args.connections:
+        for mode in ("models", "frames"):
+            result = asyncio.run(_bench(mode, n_connections, args.messages))
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
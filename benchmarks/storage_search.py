@@ -0,0 +1,98 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of DBOperations.search_run with secondary indexes.
+
+Run with: `poetry run python -m benchmarks.storage_search --sizes 10000 100000 1000000`
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+from uuid import uuid4
+
+from agent_workflow_server.storage.service import DBOperations, _matches
+
+
+def _populate(db: DBOperations, n_runs: int, n_agents: int, runs_per_thread: int):
+    agent_ids = [str(uuid4()) for _ in range(n_agents)]
+    thread_id = None
+    now = datetime.now()
+    for i in range(n_runs):
+        if i % runs_per_thread == 0:
+            thread_id = str(uuid4())
+        db.create_run(
+            {
+                "run_id": str(uuid4()),
+                "agent_id": agent_ids[i % n_agents],
+                "thread_id": thread_id,
+                "input": {},
+                "config": None,
+                "metadata": None,
+                "webhook": None,
+                "created_at": now,
+                "updated_at": now,
+                "status": "success" if i % 100 else "pending",
+            }
+        )
+    return agent_ids
+
+
+def _linear_search(db: DBOperations, filters: dict) -> List:
+    """The full scan DBOperations.search_run used to perform"""
+    return [run for run in db._runs.values() if _matches(run, filters)]
+
+
+def _time(fn: Callable, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(n_runs: int, n_agents: int, runs_per_thread: int, repeat: int) -> Dict:
+    db = DBOperations({}, {}, {}, {})
+    agent_ids = _populate(db, n_runs, n_agents, runs_per_thread)
+    runs = db.list_runs()
+    thread_ids = [random.choice(runs)["thread_id"] for _ in range(repeat)]
+
+    queries = {
+        "thread_id+status": lambda: db.search_run(
+            {"thread_id": random.choice(thread_ids), "status": "pending"}
+        ),
+        "thread_id": lambda: db.search_run({"thread_id": random.choice(thread_ids)}),
+        "agent_id+status": lambda: db.search_run(
+            {"agent_id": agent_ids[0], "status": "pending"}
+        ),
+        "linear thread_id+status": lambda: _linear_search(
+            db, {"thread_id": thread_ids[0], "status": "pending"}
+        ),
+    }
+
+    results = {"runs": n_runs}
+    for name, query in queries.items():
+        # The linear scan is orders of magnitude slower, keep it short
+        n = 3 if name.startswith("linear") else repeat
+        results[f"{name} (us)"] = round(_time(query, n) * 1e6, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--runs-per-thread", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    for n_runs in args.sizes:
+        print(json.dumps(bench(n_runs, args.agents, args.runs_per_thread, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
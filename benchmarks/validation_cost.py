@@ -0,0 +1,88 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of the per-request cost of validating a run input: with
+jsonschema.validate, which checks the schema and builds a validator on every
+call, and with the validator compiled once when the agent is loaded, by the
+jsonschema and codegen engines (AGWS_VALIDATION_ENGINE).
+
+Run with: `poetry run python -m benchmarks.validation_cost --requests 10000`
+"""
+
+import argparse
+import json
+import time
+
+import jsonschema
+
+from agent_workflow_server.agents.validators import compile_validator, validate
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "messages": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["human", "ai", "tool"]},
+                    "content": {"type": "string"},
+                },
+                "required": ["type", "content"],
+            },
+        },
+        "is_completed": {"type": "boolean"},
+        "options": {
+            "type": "object",
+            "properties": {
+                "temperature": {"type": "number", "minimum": 0, "maximum": 2},
+                "max_tokens": {"type": "integer", "minimum": 1},
+                "language": {"type": "string", "pattern": "^[a-z]{2}$"},
+            },
+        },
+    },
+    "required": ["messages"],
+}
+
+INSTANCE = {
+    "messages": [
+        {"type": "human", "content": "Write an email to Bob"},
+        {"type": "ai", "content": "Dear Bob, ..."},
+    ]
+    * 5,
+    "is_completed": False,
+    "options": {"temperature": 0.7, "max_tokens": 256, "language": "en"},
+}
+
+
+def _time(fn, n_requests: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(n_requests):
+        fn()
+    return (time.perf_counter() - started_at) / n_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    validator = compile_validator(SCHEMA, "jsonschema")
+    generated = compile_validator(SCHEMA, "codegen")
+    results = {
+        "jsonschema.validate": _time(
+            lambda: jsonschema.validate(INSTANCE, SCHEMA), args.requests
+        ),
+        "compiled": _time(lambda: validate(validator, INSTANCE), args.requests),
+        "codegen": _time(lambda: validate(generated, INSTANCE), args.requests),
+    }
+    for name, seconds in results.items():
+        print(
+            json.dumps(
+                {"validation": name, "per request (us)": round(seconds * 1e6, 1)}
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Benchmark of the storage overhead of the worker for each run: the DB operations
+performed by services/queue.py around the execution of the agent.
+
+Run with: `poetry run python -m benchmarks.worker_overhead --runs 100000`
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict
+from uuid import uuid4
+
+from agent_workflow_server.storage.models import Interrupt
+from agent_workflow_server.storage.service import DBOperations
+from agent_workflow_server.storage.sqlite import SqliteDB
+
+
+def _create(db: DBOperations, n_runs: int):
+    now = datetime.now()
+    run_ids = []
+    for _ in range(n_runs):
+        run_id = str(uuid4())
+        db.create_run(
+            {
+                "run_id": run_id,
+                "agent_id": "agent",
+                "thread_id": str(uuid4()),
+                "input": {},
+                "config": None,
+                "metadata": None,
+                "webhook": None,
+                "created_at": now,
+                "updated_at": now,
+                "status": "pending",
+            }
+        )
+        db.create_run_info(
+            {
+                "run_id": run_id,
+                "queued_at": now,
+                "attempts": 0,
+                "started_at": None,
+                "ended_at": None,
+                "exec_s": 0,
+                "queue_s": 0,
+            }
+        )
+        run_ids.append(run_id)
+    return run_ids
+
+
+def _process(db: DBOperations, run_id: str, interrupt: bool):
+    """The DB operations of the worker for a run, see services.queue.worker"""
+    db.get_run(run_id)
+    run_info = db.get_run_info(run_id)
+    db.update_run_status(run_id, "pending")
+
+    run_info["attempts"] += 1
+    run_info["started_at"] = 0.0
+    run_info["exec_s"] = 0
+    db.update_run_info(run_id, run_info)
+
+    run_info["ended_at"] = 1.0
+    run_info["exec_s"] = 1.0
+    run_info["queue_s"] = 1.0
+    db.update_run_info(run_id, run_info)
+
+    db.add_run_output(run_id, {"messages": []})
+    if interrupt:
+        db.update_run(run_id, {"interrupt": Interrupt(event="e", name="n")})
+        db.update_run_status(run_id, "interrupted")
+    else:
+        db.update_run_status(run_id, "success")
+
+
+def bench(backend: str, n_runs: int) -> Dict:
+    db = SqliteDB(":memory:") if backend == "sqlite" else DBOperations({}, {}, {}, {})
+    run_ids = _create(db, n_runs)
+
+    start = time.perf_counter()
+    for i, run_id in enumerate(run_ids):
+        _process(db, run_id, interrupt=i % 10 == 0)
+    elapsed = time.perf_counter() - start
+
+    # Allocations retained by a second pass over the same runs
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for run_id in run_ids[:1000]:
+        _process(db, run_id, interrupt=False)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    if backend == "sqlite":
+        db.close()
+    return {
+        "backend": backend,
+        "runs": n_runs,
+        "per run (us)": round(elapsed / n_runs * 1e6, 2),
+        "retained per run (bytes)": round(retained / min(n_runs, 1000), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=100_000)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["memory", "sqlite"],
+        choices=["memory", "sqlite"],
+    )
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        print(json.dumps(bench(backend, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
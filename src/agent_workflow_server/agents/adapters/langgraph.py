@@ -1,6 +1,7 @@
 # Copyright AGNTCY Contributors (https://github.com/agntcy)
 # SPDX-License-Identifier: Apache-2.0
 
+import time
 from typing import Optional
 
 from langchain_core.runnables import RunnableConfig
@@ -72,22 +73,37 @@ class LangGraphAgent(BaseAgent):
         if "recursion_limit" in config:
             runconfig["recursion_limit"] = config["recursion_limit"]
 
-        async for event in self.agent.astream(
+        # Time of each node, from the start of its task until its update. The
+        # tasks of a superstep run in parallel and each one reports on its own
+        started_at = time.perf_counter()
+        tasks_started_at = {}
+        async for mode, event in self.agent.astream(
             input=input,
             config=runconfig,
+            stream_mode=["updates", "debug"],
         ):
+            if mode == "debug":
+                if event["type"] == "task":
+                    started_at = time.perf_counter()
+                    tasks_started_at[event["payload"]["name"]] = started_at
+                continue
             for k, v in event.items():
+                duration = time.perf_counter() - tasks_started_at.pop(k, started_at)
                 if k == INTERRUPT:
                     yield Message(
                         type="interrupt",
                         event=k,
                         data=v[0].value,
+                        step=k,
+                        duration=duration,
                     )
                 else:
                     yield Message(
                         type="message",
                         event=k,
                         data=v,
+                        step=k,
+                        duration=duration,
                     )
 
     async def get_agent_state(self, thread_id):
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import inspect
+import time
 from typing import Any, Dict, List, Optional
 from uuid import UUID, uuid4
 
@@ -86,11 +87,11 @@ class LlamaIndexAgent(BaseAgent):
             )
         return interrupts_dict
 
-    def _is_known_interrupt(self, event: Any):
-        for interrupt_info in self.interrupts_dict.values():
+    def _interrupt_name(self, event: Any) -> Optional[str]:
+        for interrupt_name, interrupt_info in self.interrupts_dict.items():
             if isinstance(event, interrupt_info.interrupt_event):
-                return True
-        return False
+                return interrupt_name
+        return None
 
     async def astream(self, run: Run):
         input = run["input"]
@@ -113,7 +114,11 @@ class LlamaIndexAgent(BaseAgent):
             event = self.interrupts_dict[interrupt_name].resume_event
             handler.ctx.send_event(event.model_validate(user_data))
 
+        # Time of each step, until its event, not counting the consumer's time
+        started_at = time.perf_counter()
         async for event in handler.stream_events():
+            duration = time.perf_counter() - started_at
+            step = type(event).__name__
             if checkpoints is None:
                 checkpoints = []
 
@@ -124,15 +129,25 @@ class LlamaIndexAgent(BaseAgent):
                 )
             )
             self.checkpoints[run["thread_id"]] = checkpoints
-            if self._is_known_interrupt(event):
-                # Send the interrupt
+            interrupt_name = self._interrupt_name(event)
+            if interrupt_name is not None:
+                # Send the interrupt, its name is the one in the descriptor
                 await handler.cancel_run()
-                yield Message(type="interrupt", data=event.model_dump(mode="json"))
+                yield Message(
+                    type="interrupt",
+                    data=event.model_dump(mode="json"),
+                    interrupt_name=interrupt_name,
+                    step=step,
+                    duration=duration,
+                )
             else:
                 yield Message(
                     type="message",
                     data=event.model_dump(mode="json"),
+                    step=step,
+                    duration=duration,
                 )
+            started_at = time.perf_counter()
         final_result = await handler
         checkpoints.append(
             LlamaIndexCheckpoint(
@@ -141,6 +156,7 @@ class LlamaIndexAgent(BaseAgent):
             )
         )
         self.checkpoints[run["thread_id"]] = checkpoints
+        # The result is not a step of its own, its StopEvent was timed above
         yield Message(
             type="message",
             data=final_result,
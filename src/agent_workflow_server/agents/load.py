@@ -27,6 +27,7 @@ from agent_workflow_server.generated.models.agent_search_request import (
 from agent_workflow_server.storage.storage import DB
 
 from .base import BaseAdapter, BaseAgent
+from .validators import AgentValidators
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +56,8 @@ class AgentInfo(NamedTuple):
     acp_descriptor: AgentACPDescriptor
     schema: Mapping[Hashable, Any]
     deployment: AgentDeployment
+    # Compiled at load time, None if the AgentInfo was built elsewhere
+    validators: Optional[AgentValidators] = None
 
 
 def _load_adapters() -> List[BaseAdapter]:
@@ -152,6 +155,11 @@ Check that file path in 'AGENTS_REF' env variable is correct."""
     except Exception as e:
         raise ImportError("Failed to generate OAPI schema:", e)
 
+    try:
+        validators = AgentValidators.from_specs(acp_descriptor.specs)
+    except Exception as e:
+        raise ImportError("Invalid JSON schema in the agent manifest:", e)
+
     # Check if the variable exists in the module
     if hasattr(module, export_symbol):
         resolved = getattr(module, export_symbol)
@@ -175,7 +183,11 @@ Check that the module name and export symbol in 'AGENTS_REF' env variable are co
     logger.info(f"Agent Type: {type(agent).__name__}")
 
     return AgentInfo(
-        agent=agent, acp_descriptor=acp_descriptor, deployment=deployment, schema=schema
+        agent=agent,
+        acp_descriptor=acp_descriptor,
+        deployment=deployment,
+        schema=schema,
+        validators=validators,
     )
 
 
@@ -0,0 +1,336 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compiles JSON schemas into Python functions checking whether an instance is
+valid, for the keywords commonly used in ACP descriptors. The generated code
+follows the semantics of the jsonschema library (Draft 6 and later), which
+remains used for the schemas with other keywords and to report errors.
+"""
+
+import re
+from collections.abc import Mapping, Sequence
+from numbers import Number
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import unquote
+
+import jsonschema
+
+# Validation keywords the generated code implements. Other keywords of the draft
+# make the schema unsupported; keywords unknown to the draft are ignored, as
+# jsonschema does.
+SUPPORTED_KEYWORDS = {
+    "$ref",  # JSON pointers in the same schema, e.g. "#/$defs/Message"
+    "type",
+    "enum",
+    "const",
+    "properties",
+    "required",
+    "additionalProperties",
+    "items",
+    "minItems",
+    "maxItems",
+    "minLength",
+    "maxLength",
+    "pattern",
+    "minimum",
+    "maximum",
+    "exclusiveMinimum",
+    "exclusiveMaximum",
+    "allOf",
+    "anyOf",
+    "oneOf",
+    "not",
+    # Not checked by jsonschema without a format checker
+    "format",
+}
+
+# Drafts whose type checker and keywords the generated code matches
+SUPPORTED_DRAFTS = (
+    jsonschema.Draft6Validator,
+    jsonschema.Draft7Validator,
+    jsonschema.Draft201909Validator,
+    jsonschema.Draft202012Validator,
+)
+
+_TYPE_CHECKS = {
+    "string": "isinstance(x, str)",
+    "object": "isinstance(x, dict)",
+    "array": "isinstance(x, list)",
+    "boolean": "isinstance(x, bool)",
+    "null": "x is None",
+    "number": "(isinstance(x, Number) and not isinstance(x, bool))",
+    "integer": "((isinstance(x, int) and not isinstance(x, bool)) or (isinstance(x, float) and x.is_integer()))",
+}
+
+
+class UnsupportedSchemaError(Exception):
+    """Raised when a schema uses keywords the generated code does not implement"""
+
+
+def _unbool(value: Any, true=object(), false=object()) -> Any:
+    if value is True:
+        return true
+    if value is False:
+        return false
+    return value
+
+
+def equal(one: Any, two: Any) -> bool:
+    """Equality of JSON values as in jsonschema: booleans are not numbers"""
+    if one is two:
+        return True
+    if isinstance(one, str) or isinstance(two, str):
+        return one == two
+    if isinstance(one, Sequence) and isinstance(two, Sequence):
+        return len(one) == len(two) and all(equal(i, j) for i, j in zip(one, two))
+    if isinstance(one, Mapping) and isinstance(two, Mapping):
+        return len(one) == len(two) and all(
+            key in two and equal(value, two[key]) for key, value in one.items()
+        )
+    return _unbool(one) == _unbool(two)
+
+
+class _Generator:
+    def __init__(self, root: Any, cls: type):
+        self.root = root
+        self.keywords = set(cls.VALIDATORS)
+        # Before 2019-09, keywords next to $ref are ignored
+        self.ref_overrides = cls in (
+            jsonschema.Draft6Validator,
+            jsonschema.Draft7Validator,
+        )
+        self._refs: Dict[str, str] = {}
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {
+            "Number": Number,
+            "equal": equal,
+            "_true": lambda x: True,
+            "_false": lambda x: False,
+        }
+        self._count = 0
+
+    def _name(self, prefix: str) -> str:
+        self._count += 1
+        return f"{prefix}{self._count}"
+
+    def constant(self, value: Any) -> str:
+        name = self._name("_c")
+        self.namespace[name] = value
+        return name
+
+    def function(self, schema: Any, name: Optional[str] = None) -> str:
+        """Generate the function checking the schema, returns its name"""
+        if isinstance(schema, bool):
+            if name is None:
+                return "_true" if schema else "_false"
+            self.lines += [f"def {name}(x):", f"    return {schema}", ""]
+            return name
+        if not isinstance(schema, dict):
+            raise UnsupportedSchemaError(f"Invalid schema {schema!r}")
+
+        unsupported = (set(schema) & self.keywords) - SUPPORTED_KEYWORDS
+        if "$id" in schema and schema is not self.root:
+            # Would change the base URI of the references
+            unsupported.add("$id")
+        if unsupported:
+            raise UnsupportedSchemaError(
+                f"Unsupported keywords: {', '.join(sorted(unsupported))}"
+            )
+
+        name = name or self._name("_v")
+        body: List[str] = []
+        if "$ref" in schema:
+            check = self._ref(schema["$ref"])
+            body += [f"    if not {check}(x):", "        return False"]
+            if self.ref_overrides:
+                self.lines += [f"def {name}(x):", *body, "    return True", ""]
+                return name
+        self._type(schema, body)
+        self._values(schema, body)
+        self._object(schema, body)
+        self._array(schema, body)
+        self._string(schema, body)
+        self._number(schema, body)
+        self._combinators(schema, body)
+        self.lines += [f"def {name}(x):", *body, "    return True", ""]
+        return name
+
+    def _ref(self, ref: str) -> str:
+        """Generate the function checking the referenced schema, once"""
+        name = self._refs.get(ref)
+        if name is not None:
+            return name
+        if ref != "#" and not ref.startswith("#/"):
+            raise UnsupportedSchemaError(f"Unsupported reference {ref}")
+        target = self.root
+        for part in ref[2:].split("/") if ref != "#" else []:
+            part = unquote(part).replace("~1", "/").replace("~0", "~")
+            try:
+                target = target[int(part) if isinstance(target, list) else part]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise UnsupportedSchemaError(f"Unresolvable reference {ref}")
+        # Named before generated, for recursive schemas
+        name = self._refs[ref] = self._name("_v")
+        self.function(target, name)
+        return name
+
+    def _type(self, schema: dict, body: List[str]) -> None:
+        if "type" not in schema:
+            return
+        types = schema["type"]
+        if isinstance(types, str):
+            types = [types]
+        checks = " or ".join(_TYPE_CHECKS[t] for t in types) or "False"
+        body += [f"    if not ({checks}):", "        return False"]
+
+    def _values(self, schema: dict, body: List[str]) -> None:
+        if "enum" in schema:
+            enum = schema["enum"]
+            if enum and all(isinstance(value, str) for value in enum):
+                values = self.constant(frozenset(enum))
+                body += [
+                    f"    if not (isinstance(x, str) and x in {values}):",
+                    "        return False",
+                ]
+            else:
+                values = self.constant(list(enum))
+                body += [
+                    f"    if not any(equal(x, value) for value in {values}):",
+                    "        return False",
+                ]
+        if "const" in schema:
+            const = self.constant(schema["const"])
+            body += [f"    if not equal(x, {const}):", "        return False"]
+
+    def _object(self, schema: dict, body: List[str]) -> None:
+        checks: List[str] = []
+        properties = schema.get("properties", {})
+        if "required" in schema:
+            required = self.constant(tuple(schema["required"]))
+            checks += [
+                f"        for key in {required}:",
+                "            if key not in x:",
+                "                return False",
+            ]
+        for key, subschema in properties.items():
+            check = self.function(subschema)
+            if check == "_true":
+                continue
+            if check == "_false":
+                checks += [f"        if {key!r} in x:", "            return False"]
+            else:
+                checks += [
+                    f"        if {key!r} in x and not {check}(x[{key!r}]):",
+                    "            return False",
+                ]
+        if "additionalProperties" in schema:
+            check = self.function(schema["additionalProperties"])
+            if check != "_true":
+                names = self.constant(frozenset(properties))
+                condition = "True" if check == "_false" else f"not {check}(value)"
+                checks += [
+                    "        for key, value in x.items():",
+                    f"            if key not in {names} and {condition}:",
+                    "                return False",
+                ]
+        if checks:
+            body += ["    if isinstance(x, dict):", *checks]
+
+    def _array(self, schema: dict, body: List[str]) -> None:
+        checks: List[str] = []
+        if "items" in schema:
+            if isinstance(schema["items"], list):
+                raise UnsupportedSchemaError("Unsupported keywords: items (array)")
+            check = self.function(schema["items"])
+            if check == "_false":
+                checks += ["        if x:", "            return False"]
+            elif check != "_true":
+                checks += [
+                    "        for item in x:",
+                    f"            if not {check}(item):",
+                    "                return False",
+                ]
+        if "minItems" in schema:
+            checks += [
+                f"        if len(x) < {int(schema['minItems'])}:",
+                "            return False",
+            ]
+        if "maxItems" in schema:
+            checks += [
+                f"        if len(x) > {int(schema['maxItems'])}:",
+                "            return False",
+            ]
+        if checks:
+            body += ["    if isinstance(x, list):", *checks]
+
+    def _string(self, schema: dict, body: List[str]) -> None:
+        checks: List[str] = []
+        if "minLength" in schema:
+            checks += [
+                f"        if len(x) < {int(schema['minLength'])}:",
+                "            return False",
+            ]
+        if "maxLength" in schema:
+            checks += [
+                f"        if len(x) > {int(schema['maxLength'])}:",
+                "            return False",
+            ]
+        if "pattern" in schema:
+            pattern = self.constant(re.compile(schema["pattern"]))
+            checks += [
+                f"        if not {pattern}.search(x):",
+                "            return False",
+            ]
+        if checks:
+            body += ["    if isinstance(x, str):", *checks]
+
+    def _number(self, schema: dict, body: List[str]) -> None:
+        checks: List[str] = []
+        for keyword, operator in (
+            ("minimum", "<"),
+            ("maximum", ">"),
+            ("exclusiveMinimum", "<="),
+            ("exclusiveMaximum", ">="),
+        ):
+            if keyword in schema:
+                limit = self.constant(schema[keyword])
+                checks += [
+                    f"        if x {operator} {limit}:",
+                    "            return False",
+                ]
+        if checks:
+            body += [
+                "    if isinstance(x, Number) and not isinstance(x, bool):",
+                *checks,
+            ]
+
+    def _combinators(self, schema: dict, body: List[str]) -> None:
+        if "allOf" in schema:
+            checks = [self.function(s) for s in schema["allOf"]]
+            condition = " and ".join(f"{check}(x)" for check in checks)
+            body += [f"    if not ({condition}):", "        return False"]
+        if "anyOf" in schema:
+            checks = [self.function(s) for s in schema["anyOf"]]
+            condition = " or ".join(f"{check}(x)" for check in checks)
+            body += [f"    if not ({condition}):", "        return False"]
+        if "oneOf" in schema:
+            checks = [self.function(s) for s in schema["oneOf"]]
+            results = ", ".join(f"{check}(x)" for check in checks)
+            body += [f"    if [{results}].count(True) != 1:", "        return False"]
+        if "not" in schema:
+            check = self.function(schema["not"])
+            body += [f"    if {check}(x):", "        return False"]
+
+
+def generate(schema: Any, cls: type) -> tuple[Callable[[Any], bool], str]:
+    """Generate the function checking whether an instance is valid against the
+    schema, with its source code. Raises UnsupportedSchemaError if the schema
+    uses keywords the generated code does not implement."""
+    if cls not in SUPPORTED_DRAFTS:
+        raise UnsupportedSchemaError(f"Unsupported draft {cls.__name__}")
+    generator = _Generator(schema, cls)
+    name = generator.function(schema)
+    source = "\n".join(generator.lines)
+    namespace = generator.namespace
+    exec(compile(source, "<jsonschema>", "exec"), namespace)
+    return namespace[name], source
@@ -0,0 +1,238 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import os
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Tuple,
+)
+
+import jsonschema
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.protocols import Validator
+
+from agent_workflow_server.generated.models.agent_acp_spec import AgentACPSpec
+
+from .schema_codegen import UnsupportedSchemaError, generate
+
+logger = logging.getLogger(__name__)
+
+ValidationEngine = Literal["jsonschema", "codegen"]
+
+
+class SchemaValidator(Protocol):
+    def is_valid(self, instance: Any) -> bool: ...
+
+    def iter_errors(self, instance: Any) -> Iterator[ValidationError]: ...
+
+
+class CodegenValidator:
+    """Validator running code generated from the schema. Errors are reported by
+    the jsonschema validator, only run on invalid instances."""
+
+    def __init__(self, check: Callable[[Any], bool], source: str, fallback: Validator):
+        self.check = check
+        self.source = source
+        self.fallback = fallback
+
+    def is_valid(self, instance: Any) -> bool:
+        return self.check(instance)
+
+    def iter_errors(self, instance: Any) -> Iterator[ValidationError]:
+        if self.check(instance):
+            return iter(())
+        return self.fallback.iter_errors(instance)
+
+
+def get_validation_engine() -> ValidationEngine:
+    engine = os.getenv("AGWS_VALIDATION_ENGINE", "jsonschema").lower()
+    if engine not in ("jsonschema", "codegen"):
+        raise ValueError(
+            f"Invalid AGWS_VALIDATION_ENGINE {engine}, must be one of: jsonschema, codegen"
+        )
+    return engine
+
+
+def compile_validator(
+    schema: Optional[dict], engine: Optional[ValidationEngine] = None
+) -> Optional[SchemaValidator]:
+    """Check the schema and build its validator, once, with the given engine
+    (AGWS_VALIDATION_ENGINE by default). Returns None for empty schemas, which
+    accept anything.
+
+    The "codegen" engine falls back to jsonschema for the schemas using keywords
+    it does not implement."""
+    if not schema:
+        return None
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    validator = cls(schema)
+    if (engine or get_validation_engine()) == "codegen":
+        try:
+            return CodegenValidator(*generate(schema, cls), fallback=validator)
+        except UnsupportedSchemaError as e:
+            logger.info(f"Validating schema with jsonschema: {e}")
+    return validator
+
+
+def validate(validator: Optional[SchemaValidator], instance: Any) -> None:
+    """Raise the best matching jsonschema.ValidationError if the instance is not
+    valid, as jsonschema.validate does"""
+    if validator is None:
+        return
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
+
+class _InterruptCandidate(NamedTuple):
+    interrupt_type: str
+    validator: Optional[SchemaValidator]
+    # Required keys of the payload, when it must be an object
+    required: Optional[FrozenSet[str]]
+    # Constant string values of the required properties
+    consts: Dict[str, str]
+
+
+def _interrupt_candidate(
+    interrupt_type: str, schema: Optional[dict], validator: Optional[SchemaValidator]
+) -> _InterruptCandidate:
+    required, consts = None, {}
+    # Keywords next to a top-level $ref are ignored by some drafts
+    if (
+        isinstance(schema, dict)
+        and schema.get("type") == "object"
+        and "$ref" not in schema
+    ):
+        required = frozenset(schema.get("required") or ())
+        for key, subschema in (schema.get("properties") or {}).items():
+            if key not in required or not isinstance(subschema, dict):
+                continue
+            if isinstance(subschema.get("const"), str):
+                consts[key] = subschema["const"]
+            elif (
+                isinstance(subschema.get("enum"), list)
+                and len(subschema["enum"]) == 1
+                and isinstance(subschema["enum"][0], str)
+            ):
+                consts[key] = subschema["enum"][0]
+    return _InterruptCandidate(interrupt_type, validator, required, consts)
+
+
+class InterruptIndex:
+    """Finds the type of an interrupt from its payload, as the first interrupt of
+    the descriptor whose payload schema validates it.
+
+    The schemas are analysed once: if they all require a property with a
+    different constant string value (e.g. {"kind": {"const": "approval"}}), that
+    discriminator selects the only possible interrupt. Otherwise, only the
+    interrupts whose required keys are in the payload are validated, in order.
+    """
+
+    def __init__(
+        self,
+        interrupts: List[
+            Tuple[str, Optional[dict], Optional[SchemaValidator]]
+        ],  # (interrupt type, payload schema, payload validator)
+    ):
+        self.candidates = [_interrupt_candidate(*interrupt) for interrupt in interrupts]
+        self.by_type = {c.interrupt_type: c for c in reversed(self.candidates)}
+        self.discriminator: Optional[str] = None
+        self.by_value: Dict[str, _InterruptCandidate] = {}
+        if self.candidates:
+            keys = set.intersection(*(set(c.consts) for c in self.candidates))
+            for key in sorted(keys):
+                values = {c.consts[key] for c in self.candidates}
+                if len(values) == len(self.candidates):
+                    self.discriminator = key
+                    self.by_value = {c.consts[key]: c for c in self.candidates}
+                    break
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def __iter__(self) -> Iterator[Tuple[str, Optional[SchemaValidator]]]:
+        return ((c.interrupt_type, c.validator) for c in self.candidates)
+
+    def _possible(self, payload: Any) -> Iterator[_InterruptCandidate]:
+        if not isinstance(payload, dict):
+            return (c for c in self.candidates if c.required is None)
+        if self.discriminator is not None:
+            value = payload.get(self.discriminator)
+            candidate = self.by_value.get(value) if isinstance(value, str) else None
+            return iter(() if candidate is None else (candidate,))
+        return (
+            c
+            for c in self.candidates
+            if c.required is None or c.required.issubset(payload.keys())
+        )
+
+    def match(
+        self, payload: Any, interrupt_type: Optional[str] = None
+    ) -> Optional[str]:
+        """Type of the interrupt the payload is valid for, None if there is none.
+        If a type of the descriptor is given, e.g. known by the agent adapter,
+        only its payload schema is checked."""
+        candidate = self.by_type.get(interrupt_type) if interrupt_type else None
+        candidates = self._possible(payload) if candidate is None else (candidate,)
+        for candidate in candidates:
+            if candidate.validator is None or candidate.validator.is_valid(payload):
+                return candidate.interrupt_type
+        return None
+
+
+class AgentValidators(NamedTuple):
+    """Validators of the schemas of an agent's ACP descriptor"""
+
+    input: Optional[SchemaValidator]
+    output: Optional[SchemaValidator]
+    config: Optional[SchemaValidator]
+    # Interrupt payload validators, in the descriptor order
+    interrupt_payloads: InterruptIndex
+    # Resume payload validators, by interrupt type
+    resume_payloads: Dict[str, Optional[SchemaValidator]]
+
+    @classmethod
+    def compile(cls, schemas: Dict[str, Any]) -> "AgentValidators":
+        """Compile the validators of the schemas returned by get_agent_schemas"""
+        interrupts = schemas.get("interrupts") or []
+        return cls(
+            input=compile_validator(schemas.get("input")),
+            output=compile_validator(schemas.get("output")),
+            config=compile_validator(schemas.get("config")),
+            interrupt_payloads=InterruptIndex(
+                [
+                    (
+                        interrupt.interrupt_type,
+                        interrupt.interrupt_payload,
+                        compile_validator(interrupt.interrupt_payload),
+                    )
+                    for interrupt in interrupts
+                ]
+            ),
+            resume_payloads={
+                interrupt.interrupt_type: compile_validator(interrupt.resume_payload)
+                for interrupt in interrupts
+            },
+        )
+
+    @classmethod
+    def from_specs(cls, specs: AgentACPSpec) -> "AgentValidators":
+        return cls.compile(
+            {
+                "input": specs.input,
+                "output": specs.output,
+                "config": specs.config,
+                "interrupts": specs.interrupts,
+            }
+        )
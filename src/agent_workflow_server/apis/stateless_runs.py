@@ -3,12 +3,13 @@
 
 # coding: utf-8
 
-from typing import Any, AsyncIterator, List, Optional, Union
+from typing import Any, Dict, List, Optional
 
 from fastapi import (
     APIRouter,
     Body,
     Depends,
+    Header,
     HTTPException,
     Path,
     Query,
@@ -35,9 +36,6 @@ from agent_workflow_server.generated.models.run_stateless import RunStateless
 from agent_workflow_server.generated.models.run_wait_response_stateless import (
     RunWaitResponseStateless,
 )
-from agent_workflow_server.generated.models.stream_event_payload import (
-    StreamEventPayload,
-)
 from agent_workflow_server.generated.models.streaming_mode import StreamingMode
 from agent_workflow_server.services.runs import Runs
 from agent_workflow_server.services.validation import (
@@ -158,22 +156,6 @@ async def _wait_and_return_run_output(run_id: str) -> RunWaitResponseStateless:
         )
 
 
-async def _stream_sse_events(
-    stream: AsyncIterator[StreamEventPayload | None],
-) -> AsyncIterator[Union[str, bytes]]:
-    last_event_id = 0
-    async for event in stream:
-        if event is None:
-            yield ":"
-        else:
-            last_event_id += 1
-            yield f"""id: {last_event_id}
-event: agent_event
-data: {event.to_json()}
-
-"""
-
-
 @router.post(
     "/runs/{run_id}/cancel",
     responses={
@@ -229,7 +211,7 @@ async def create_and_stream_stateless_run_output(
     try:
         new_run = await Runs.put(run_create_stateless)
         return StreamingResponse(
-            _stream_sse_events(Runs.stream_events(new_run.run_id)),
+            Runs.stream_frames(new_run.run_id),
             media_type="text/event-stream",
         )
     except HTTPException:
@@ -334,6 +316,30 @@ async def get_stateless_run(
     return run
 
 
+@router.get(
+    "/runs/{run_id}/profile",
+    responses={
+        200: {"model": Dict[str, Any], "description": "Success"},
+        404: {"model": str, "description": "Not Found"},
+    },
+    tags=["Stateless Runs"],
+    summary="Get Run Profile",
+)
+async def get_stateless_run_profile(
+    run_id: Annotated[StrictStr, Field(description="The ID of the run.")] = Path(
+        ..., description="The ID of the run."
+    ),
+) -> Dict[str, Any]:
+    """Get the timings of the steps of a run (graph nodes, workflow events), to find the slow ones."""
+    profile = Runs.get_profile(run_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Run with ID {run_id} not found",
+        )
+    return profile
+
+
 @router.post(
     "/runs/search",
     responses={
@@ -406,8 +412,13 @@ async def stream_stateless_run_output(
     run_id: Annotated[StrictStr, Field(description="The ID of the run.")] = Path(
         ..., description="The ID of the run."
     ),
+    last_event_id: Optional[StrictStr] = Header(
+        None,
+        alias="Last-Event-ID",
+        description="ID of the last event received, to resume the stream after it.",
+    ),
 ) -> RunOutputStream:
-    """Join the output stream of an existing run. This endpoint streams output in real-time from a run. Only output produced after this endpoint is called will be streamed."""
+    """Join the output stream of an existing run. This endpoint streams output in real-time from a run. Only output produced after this endpoint is called will be streamed, unless the Last-Event-ID header is set: the stream then resumes after that event, replaying the recent output."""
     try:
         run = Runs.get(run_id)
         if run is None:
@@ -415,8 +426,15 @@ async def stream_stateless_run_output(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Run with ID {run_id} not found",
             )
+        if last_event_id is not None and not last_event_id.isdigit():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid Last-Event-ID {last_event_id}",
+            )
         return StreamingResponse(
-            _stream_sse_events(Runs.stream_events(run_id)),
+            Runs.stream_frames(
+                run_id, int(last_event_id) if last_event_id is not None else None
+            ),
             media_type="text/event-stream",
         )
     except HTTPException:
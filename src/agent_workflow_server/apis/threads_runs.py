@@ -275,6 +275,38 @@ async def get_thread_run(
     return run
 
 
+@router.get(
+    "/threads/{thread_id}/runs/{run_id}/profile",
+    responses={
+        200: {"model": Dict[str, Any], "description": "Success"},
+        404: {"model": str, "description": "Not Found"},
+        422: {"model": str, "description": "Validation Error"},
+    },
+    tags=["Thread Runs"],
+    summary="Get Run Profile",
+)
+async def get_thread_run_profile(
+    thread_id: Annotated[StrictStr, Field(description="The ID of the thread.")] = Path(
+        ..., description="The ID of the thread."
+    ),
+    run_id: Annotated[StrictStr, Field(description="The ID of the run.")] = Path(
+        ..., description="The ID of the run."
+    ),
+) -> Dict[str, Any]:
+    """Get the timings of the steps of a run (graph nodes, workflow events), to find the slow ones."""
+    try:
+        profile = await ThreadRuns.get_profile(thread_id, run_id)
+    except ThreadNotFoundError as e:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    if profile is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Run not found")
+
+    return profile
+
+
 @router.get(
     "/threads/{thread_id}/runs",
     responses={
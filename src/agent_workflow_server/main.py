@@ -18,9 +18,11 @@ from agent_workflow_server.apis.authentication import (
     authentication_with_api_key,
     setup_api_key_auth,
 )
+from agent_workflow_server.apis.metrics import router as MetricsApiRouter
 from agent_workflow_server.apis.stateless_runs import router as StatelessRunsApiRouter
 from agent_workflow_server.apis.threads import router as ThreadsApiRouter
 from agent_workflow_server.apis.threads_runs import router as ThreadRunsApiRouter
+from agent_workflow_server.services.executor import configure as configure_executor
 from agent_workflow_server.services.queue import start_workers
 
 load_dotenv(dotenv_path=find_dotenv(usecwd=True))
@@ -46,6 +48,10 @@ app.include_router(
 app.include_router(
     router=PublicAgentsApiRouter,
 )
+app.include_router(
+    router=MetricsApiRouter,
+    dependencies=[Depends(authentication_with_api_key)],
+)
 app.include_router(
     router=StatelessRunsApiRouter,
     dependencies=[Depends(authentication_with_api_key)],
@@ -85,6 +91,7 @@ def start():
             "AGENT_MANIFEST_PATH", DEFAULT_AGENT_MANIFEST_PATH
         )
         load_agents(agents_ref, [agent_manifest_path])
+        configure_executor(agents_ref, [agent_manifest_path])
         n_workers = int(os.getenv("NUM_WORKERS", DEFAULT_NUM_WORKERS))
 
         try:
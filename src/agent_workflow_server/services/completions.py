@@ -0,0 +1,62 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agent_workflow_server.storage.models import Run
+
+
+class _Completion:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class RunCompletions:
+    """Registry of the pending runs being waited for.
+
+    Each waited run has one future, resolved with the final run and its output
+    when the run leaves the pending status, and awaited by all its waiters. The
+    entry is removed once the run is resolved and its last waiter left, or when
+    its last waiter gives up: only runs with waiters are tracked.
+    """
+
+    def __init__(self):
+        self._completions: Dict[str, _Completion] = {}
+
+    def __len__(self) -> int:
+        return len(self._completions)
+
+    async def wait(
+        self, run_id: str, timeout: Optional[float] = None
+    ) -> Tuple[Run, Any]:
+        """Wait for the run to complete, returns the run and its output. Raises
+        asyncio.TimeoutError if it does not complete within the timeout."""
+        completion = self._completions.get(run_id)
+        if completion is None:
+            future = asyncio.get_running_loop().create_future()
+            completion = self._completions[run_id] = _Completion(future)
+        completion.waiters += 1
+        try:
+            # Unlike wait_for, wait does not cancel the future shared by waiters
+            await asyncio.wait((completion.future,), timeout=timeout)
+            if not completion.future.done():
+                raise asyncio.TimeoutError
+            return completion.future.result()
+        finally:
+            completion.waiters -= 1
+            if completion.waiters == 0 and self._completions.get(run_id) is completion:
+                del self._completions[run_id]
+
+    def resolve(self, run: Run, get_output: Callable[[str], Any]) -> None:
+        """Wake up the waiters of a completed run. The output is only read if
+        the run is waited for."""
+        completion = self._completions.pop(run["run_id"], None)
+        if completion is not None and not completion.future.done():
+            completion.future.set_result((run, get_output(run["run_id"])))
+
+
+COMPLETIONS = RunCompletions()
@@ -0,0 +1,313 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import zlib
+from itertools import count
+from multiprocessing.connection import Connection
+from typing import AsyncIterator, Dict, List, Literal, Optional
+
+from agent_workflow_server.agents.load import load_agents
+from agent_workflow_server.storage.models import Run
+from agent_workflow_server.utils.tools import make_serializable
+
+from .message import Message
+from .stream import stream_run
+
+logger = logging.getLogger(__name__)
+
+ExecutionMode = Literal["inline", "process"]
+
+# Seconds to wait for a child process to exit before killing it
+STOP_TIMEOUT = 5.0
+
+
+class ExecutorError(Exception):
+    """Raised when the run fails in the child process, or the child process dies"""
+
+
+def _child_main(conn: Connection, agents_ref: str, manifest_paths: List[str]):
+    """Entry point of a child process: loads the agents then runs the runs sent by
+    the parent, streaming their messages back"""
+    load_agents(agents_ref, manifest_paths)
+    asyncio.run(_serve(conn))
+
+
+async def _serve(conn: Connection):
+    loop = asyncio.get_running_loop()
+    tasks: Dict[str, asyncio.Task] = {}
+    send_lock = threading.Lock()
+    stopped = loop.create_future()
+
+    def send(*message) -> None:
+        with send_lock:
+            conn.send(message)
+
+    async def run(stream_id: str, run: Run) -> None:
+        try:
+            async for message in stream_run(run):
+                # Converted in the child, so that the data can be pickled
+                send(
+                    "message",
+                    stream_id,
+                    message.type,
+                    make_serializable(message.data),
+                    message.event,
+                    message.interrupt_name,
+                    message.step,
+                    message.duration,
+                )
+            send("done", stream_id)
+        except asyncio.CancelledError:
+            send("done", stream_id)
+        except Exception as error:
+            send("error", stream_id, f"{type(error).__name__}: {error}")
+        finally:
+            tasks.pop(stream_id, None)
+
+    def dispatch(request) -> None:
+        command, payload = request
+        if command == "run":
+            stream_id, run_payload = payload
+            tasks[stream_id] = loop.create_task(run(stream_id, run_payload))
+        elif command == "cancel":
+            task = tasks.get(payload)
+            if task is not None:
+                task.cancel()
+        elif command == "stop" and not stopped.done():
+            stopped.set_result(None)
+
+    def read() -> None:
+        # Blocking reads, in a thread not to block the event loop
+        try:
+            while True:
+                loop.call_soon_threadsafe(dispatch, conn.recv())
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(dispatch, ("stop", None))
+
+    threading.Thread(target=read, name="agws-child-reader", daemon=True).start()
+    await stopped
+    for task in list(tasks.values()):
+        task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+class _Child:
+    """A child process and the runs it is executing"""
+
+    def __init__(self, index: int, agents_ref: str, manifest_paths: List[str]):
+        self.index = index
+        self.conn, child_conn = multiprocessing.Pipe()
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=_child_main,
+            args=(child_conn, agents_ref, manifest_paths),
+            name=f"agws-executor-{index}",
+            daemon=True,
+        )
+        self.streams: Dict[str, asyncio.Queue] = {}
+        self._send_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # The storage of the child is not persisted, see storage._persist
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def start_reader(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        threading.Thread(
+            target=self._read, name=f"agws-executor-{self.index}-reader", daemon=True
+        ).start()
+
+    def send(self, *request) -> None:
+        with self._send_lock:
+            self.conn.send(request)
+
+    def _read(self) -> None:
+        try:
+            try:
+                while True:
+                    message = self.conn.recv()
+                    self._loop.call_soon_threadsafe(self._dispatch, message)
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._fail_all)
+        except RuntimeError:
+            # The event loop was closed
+            pass
+
+    def _dispatch(self, message) -> None:
+        queue = self.streams.get(message[1])
+        if queue is not None:
+            # Messages of runs no longer streamed (e.g. closed after an interrupt)
+            # are dropped
+            queue.put_nowait(message)
+
+    def _fail_all(self) -> None:
+        for stream_id, queue in self.streams.items():
+            queue.put_nowait(
+                ("error", stream_id, f"Executor process {self.index} exited")
+            )
+
+    def stop(self) -> None:
+        try:
+            self.send("stop", None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessExecutor:
+    """Executes the runs in a pool of child processes, each loading the agents.
+
+    Runs with a thread_id always go to the same process, which keeps the state
+    of the thread for the agents storing it in memory. This includes stateless
+    runs, which get a thread_id of their own: a resumed run must go to the process
+    holding its checkpoint. Other runs go to the process executing the fewest
+    runs. Messages are streamed back over a pipe.
+    """
+
+    def __init__(
+        self,
+        agents_ref: str,
+        manifest_paths: List[str],
+        n_processes: Optional[int] = None,
+    ):
+        self.agents_ref = agents_ref
+        self.manifest_paths = manifest_paths
+        self.n_processes = n_processes or os.cpu_count() or 1
+        self._children: List[Optional[_Child]] = [None] * self.n_processes
+        self._stream_ids = count()
+
+    def start(self) -> None:
+        logger.info(f"Starting {self.n_processes} executor processes")
+        for index in range(self.n_processes):
+            self._spawn(index)
+
+    async def stop(self) -> None:
+        """Stop the child processes, waiting for them in threads not to block the
+        event loop"""
+        children = [child for child in self._children if child is not None]
+        self._children = [None] * self.n_processes
+        await asyncio.gather(*(asyncio.to_thread(child.stop) for child in children))
+
+    def _spawn(self, index: int) -> _Child:
+        child = _Child(index, self.agents_ref, self.manifest_paths)
+        child.start_reader(asyncio.get_running_loop())
+        self._children[index] = child
+        return child
+
+    def _select(self, run: Run) -> _Child:
+        thread_id = run.get("thread_id")
+        if thread_id:
+            index = zlib.crc32(str(thread_id).encode()) % self.n_processes
+        else:
+            index = min(
+                range(self.n_processes),
+                key=lambda i: len(self._children[i].streams)
+                if self._children[i] is not None
+                else 0,
+            )
+        child = self._children[index]
+        if child is None or not child.alive:
+            if child is not None:
+                logger.error(f"Executor process {index} exited, restarting it")
+            child = self._spawn(index)
+        return child
+
+    async def stream(self, run: Run) -> AsyncIterator[Message]:
+        """Execute the run in a child process, streaming its messages"""
+        # A resumed run is streamed again under the same run_id, while the child
+        # may still be stopping its previous attempt
+        stream_id = f"{run['run_id']}:{next(self._stream_ids)}"
+        child = self._select(run)
+        queue: asyncio.Queue = asyncio.Queue()
+        child.streams[stream_id] = queue
+        finished = False
+        try:
+            child.send("run", (stream_id, dict(run)))
+            while True:
+                kind, _, *payload = await queue.get()
+                if kind == "message":
+                    message_type, data, event, interrupt_name, step, duration = payload
+                    yield Message(
+                        type=message_type,
+                        data=data,
+                        event=event,
+                        interrupt_name=interrupt_name,
+                        step=step,
+                        duration=duration,
+                    )
+                elif kind == "error":
+                    finished = True
+                    raise ExecutorError(payload[0])
+                else:
+                    finished = True
+                    return
+        finally:
+            child.streams.pop(stream_id, None)
+            if not finished and child.alive:
+                # The stream was closed early, stop the run in the child
+                child.send("cancel", stream_id)
+
+
+def get_execution_mode() -> ExecutionMode:
+    mode = os.getenv("AGWS_EXECUTION_MODE", "inline").lower()
+    if mode not in ("inline", "process"):
+        raise ValueError(
+            f"Invalid AGWS_EXECUTION_MODE {mode}, must be one of: inline, process"
+        )
+    return mode
+
+
+EXECUTOR: Optional[ProcessExecutor] = None
+
+_agents_config: Optional[tuple] = None
+
+
+def configure(agents_ref: Optional[str], manifest_paths: List[str]) -> None:
+    """Record how the agents were loaded, for the child processes to do the same"""
+    global _agents_config
+    _agents_config = (agents_ref, manifest_paths)
+
+
+def start_executor() -> Optional[ProcessExecutor]:
+    """Start the process executor if AGWS_EXECUTION_MODE is "process" """
+    global EXECUTOR
+    if get_execution_mode() != "process":
+        return None
+    if _agents_config is None or not _agents_config[0]:
+        logger.warning(
+            "Process execution mode requires agents loaded from AGENTS_REF, running them inline"
+        )
+        return None
+    n_processes = int(os.getenv("AGWS_EXECUTOR_PROCESSES") or 0) or None
+    EXECUTOR = ProcessExecutor(*_agents_config, n_processes=n_processes)
+    EXECUTOR.start()
+    return EXECUTOR
+
+
+async def stop_executor() -> None:
+    global EXECUTOR
+    if EXECUTOR is not None:
+        executor, EXECUTOR = EXECUTOR, None
+        await executor.stop()
+
+
+def execute(run: Run) -> AsyncIterator[Message]:
+    """Stream the messages of the run, from the process executor if started or
+    from the agent in this process"""
+    if EXECUTOR is not None:
+        return EXECUTOR.stream(run)
+    return stream_run(run)
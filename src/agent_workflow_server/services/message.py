@@ -13,8 +13,20 @@ class Message:
         data: Any,
         event: Optional[str] = None,
         interrupt_name: Optional[str] = None,
+        id: Optional[int] = None,
+        step: Optional[str] = None,
+        duration: Optional[float] = None,
     ):
         self.type = type
         self.data = data
         self.event = event
         self.interrupt_name = interrupt_name
+        # Step of the agent (graph node, workflow event) which produced the
+        # message, and the seconds it took, when timed by the adapter
+        self.step = step
+        self.duration = duration
+        # Sequence number of the message in its run, set when published
+        self.id = id
+        # Status of the run when the message was published, and its SSE frame
+        self.run_status: Optional[str] = None
+        self.frame: Optional[bytes] = None
@@ -0,0 +1,240 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Metrics of the server, exposed in the Prometheus text format on /metrics.
+
+Counters and histograms are updated in place by the event loop, without locks.
+Live values (queue depth, busy workers, subscribers...) are read from the
+objects holding them by callbacks, when the metrics are scraped.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Literal, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+MetricType = Literal["counter", "gauge", "histogram"]
+
+# Seconds, from fast validations to long agent runs
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type: MetricType
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in list(self.values.items())
+        ]
+
+
+class _Observations:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        # Observations per bucket, the last one for those above all bounds
+        self.counts = [0] * (n_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Labels, _Observations] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        observations = self.values.get(labels)
+        if observations is None:
+            observations = self.values[labels] = _Observations(len(self.buckets))
+        observations.counts[bisect_left(self.buckets, value)] += 1
+        observations.sum += value
+        observations.count += 1
+
+    def samples(self) -> List[str]:
+        samples = []
+        for labels, observations in list(self.values.items()):
+            cumulative = 0
+            bounds = self.buckets + (float("inf"),)
+            for bound, count in zip(bounds, observations.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                samples.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            labelset = _labels(self.labelnames, labels)
+            samples.append(f"{self.name}_sum{labelset} {_number(observations.sum)}")
+            samples.append(f"{self.name}_count{labelset} {observations.count}")
+        return samples
+
+
+class Callback(Metric):
+    """Metric whose values are read when scraped: the callback returns the value,
+    or the values by label values"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        callback: Callable[[], float | Dict[Labels, float]],
+        labelnames: Sequence[str] = (),
+        type: MetricType = "gauge",
+    ):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+        self.type = type
+
+    def samples(self) -> List[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add the metric, replacing the one with the same name"""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        callback: Callable[[], float | Dict[Labels, float]],
+        labelnames: Sequence[str] = (),
+        type: MetricType = "gauge",
+    ) -> Callback:
+        return self.register(Callback(name, help, callback, labelnames, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RUN_QUEUE_SECONDS = REGISTRY.histogram(
+    "agws_run_queue_seconds",
+    "Time runs waited in the queue before being processed",
+    ["agent_id"],
+)
+RUN_EXEC_SECONDS = REGISTRY.histogram(
+    "agws_run_exec_seconds", "Time spent executing runs", ["agent_id"]
+)
+RUNS_ENDED = REGISTRY.counter(
+    "agws_runs_ended_total",
+    "Runs leaving the pending status, by the status they end in",
+    ["agent_id", "status"],
+)
+STEP_SECONDS = REGISTRY.histogram(
+    "agws_step_seconds",
+    "Duration of the steps of the agents (graph nodes, workflow events)",
+    ["agent_id", "step"],
+)
+WEBHOOK_SECONDS = REGISTRY.histogram(
+    "agws_webhook_seconds", "Duration of the webhook calls"
+)
+VALIDATION_SECONDS = REGISTRY.histogram(
+    "agws_validation_seconds",
+    "Duration of the validations of run inputs, outputs and resume payloads",
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "agws_loop_lag_seconds",
+    "Delay of the event loop in running a scheduled callback",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "agws_loop_blocked_total",
+    "Calls blocking the event loop longer than AGWS_LOOP_BLOCK_THRESHOLD, by the agent of the run executed",
+    ["agent_id"],
+)
@@ -0,0 +1,76 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from agent_workflow_server.storage.models import Run, RunInfo
+
+from .message import Message
+from .metrics import STEP_SECONDS
+from .tracing import TRACER
+
+# Step names totalled in the run info of a run, later ones are totalled as OTHER_STEPS
+MAX_PROFILE_STEPS = 100
+OTHER_STEPS = "(other)"
+# Last steps kept in the timeline of a run being executed
+MAX_TIMELINE_STEPS = 100
+
+# Timelines of the attempts in progress, dropped when they end: only the totals
+# by step name are kept in the run info
+_TIMELINES: Dict[str, Deque[Tuple[str, float]]] = {}
+
+
+def start_timeline(run_id: str) -> None:
+    _TIMELINES[run_id] = deque(maxlen=MAX_TIMELINE_STEPS)
+
+
+def end_timeline(run_id: str) -> None:
+    _TIMELINES.pop(run_id, None)
+
+
+def record_step(run: Run, run_info: RunInfo, message: Message) -> None:
+    """Add the timing of the step which produced the message, if the adapter
+    timed it, to the profile of the run, to the metrics of its agent and to the
+    current trace"""
+    if message.duration is None:
+        return
+    step = message.step or message.event or ""
+    STEP_SECONDS.observe(message.duration, run["agent_id"], step)
+    TRACER.record("agent.step", message.duration, step=step)
+
+    timeline = _TIMELINES.get(run["run_id"])
+    if timeline is not None:
+        timeline.append((step, message.duration))
+    totals = run_info.get("step_totals")
+    if totals is None:
+        totals = run_info["step_totals"] = {}
+    if step not in totals and len(totals) >= MAX_PROFILE_STEPS:
+        step = OTHER_STEPS
+    total = totals.get(step)
+    if total is None:
+        total = totals[step] = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+    total["count"] += 1
+    total["total_s"] += message.duration
+    total["max_s"] = max(total["max_s"], message.duration)
+
+
+def run_profile(run: Run, run_info: RunInfo) -> Dict[str, Any]:
+    """Timings of the last attempt of a run: its totals by step name, slowest
+    first, and while it is executed, its last steps in order"""
+    timeline = _TIMELINES.get(run["run_id"]) or ()
+    totals = run_info.get("step_totals") or {}
+    return {
+        "run_id": run["run_id"],
+        "agent_id": run["agent_id"],
+        "status": run["status"],
+        "attempts": run_info.get("attempts"),
+        "queue_s": run_info.get("queue_s"),
+        "exec_s": run_info.get("exec_s"),
+        "steps": [
+            {"step": step, "duration_s": duration} for step, duration in timeline
+        ],
+        "by_step": dict(
+            sorted(totals.items(), key=lambda item: item[1]["total_s"], reverse=True)
+        ),
+    }
@@ -2,10 +2,13 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import asyncio
-import json
 import logging
+import math
+import os
+from contextlib import aclosing
 from datetime import datetime
-from typing import Literal
+from itertools import count
+from typing import Dict, List, Literal, Optional, Set
 
 from agent_workflow_server.services.validation import (
     InvalidFormatException,
@@ -13,13 +16,23 @@ from agent_workflow_server.services.validation import (
 )
 from agent_workflow_server.storage.models import Interrupt, RunInfo
 from agent_workflow_server.storage.storage import DB
-from agent_workflow_server.utils.tools import make_serializable
+from agent_workflow_server.utils.tools import make_serializable, serialize_json
 
+from .executor import execute, start_executor, stop_executor
 from .message import Message
-from .runs import RUNS_QUEUE, Runs
-from .stream import stream_run
-
-MAX_RETRY_ATTEMPTS = 3
+from .metrics import REGISTRY, RUN_EXEC_SECONDS, RUN_QUEUE_SECONDS
+from .profile import end_timeline, record_step, start_timeline
+from .retention import start_sweeper
+from .runs import RUNS_QUEUE, Runs, stream_manager
+from .scheduler import (
+    MAX_RETRY_ATTEMPTS,
+    RunScheduler,
+    load_concurrency,
+    load_weights,
+)
+from .tracing import TRACER
+from .watchdog import WATCHDOG, start_watchdog
+from .webhooks import WEBHOOKS
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +43,267 @@ class RunError(Exception): ...
 class AttemptsExceededError(Exception): ...
 
 
+DEFAULT_POOL = "default"
+
+# Weight of the last run in the moving averages of queue_s and exec_s
+EWMA_ALPHA = 0.2
+
+_worker_ids = count(1)
+
+
+class WorkerPool:
+    """Workers processing the runs of a queue. The number of workers can be
+    changed while running, idle workers are stopped first."""
+
+    def __init__(self, name: str, size: int, queue: RunScheduler):
+        self.name = name
+        self.initial_size = size
+        self.queue = queue
+        self.busy = 0
+        self.workers: Dict[int, asyncio.Task] = {}
+        self.idle: Set[int] = set()
+        # Moving averages of the queue and execution times of the runs
+        self.queue_s = 0.0
+        self.exec_s = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    def utilization(self) -> float:
+        """Share of the workers of the pool processing a run"""
+        return self.busy / self.size if self.size else 0.0
+
+    def observe(self, run_info: RunInfo) -> None:
+        """Update the moving averages with the stats of a processed run"""
+        if run_info.get("queue_s") is not None:
+            self.queue_s += EWMA_ALPHA * (run_info["queue_s"] - self.queue_s)
+        if run_info.get("exec_s") is not None:
+            self.exec_s += EWMA_ALPHA * (run_info["exec_s"] - self.exec_s)
+
+    def grow(self, n: int) -> None:
+        for _ in range(n):
+            worker_id = next(_worker_ids)
+            task = asyncio.create_task(worker(worker_id, self))
+            task.add_done_callback(
+                lambda task, worker_id=worker_id: self._exited(worker_id, task)
+            )
+            self.workers[worker_id] = task
+
+    def shrink(self, n: int) -> int:
+        """Stop up to n idle workers, returns the number stopped"""
+        stopped = 0
+        for worker_id in list(self.idle)[:n]:
+            self.idle.discard(worker_id)
+            self.workers.pop(worker_id).cancel()
+            stopped += 1
+        return stopped
+
+    def resize(self, size: int) -> None:
+        if size > self.size:
+            self.grow(size - self.size)
+        elif size < self.size:
+            self.shrink(self.size - size)
+        logger.info(f"Pool {self.name} resized to {self.size} workers")
+
+    def _exited(self, worker_id: int, task: asyncio.Task) -> None:
+        if self.workers.get(worker_id) is not task:
+            return
+        del self.workers[worker_id]
+        self.idle.discard(worker_id)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                f"(Worker {worker_id}) Crashed, restarting it",
+                exc_info=task.exception(),
+            )
+            self.grow(1)
+
+    async def run(self) -> None:
+        """Start the workers and keep them running until cancelled"""
+        logger.info(f"Starting {self.initial_size} workers in pool {self.name}")
+        self.grow(self.initial_size)
+        try:
+            await asyncio.Future()
+        finally:
+            tasks = list(self.workers.values())
+            self.workers.clear()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class Autoscaler:
+    """Grows and shrinks a pool between min and max workers.
+
+    The pool is overloaded when runs are queued, no worker is idle and the
+    expected queue time (queued runs x average exec_s / workers) or the average
+    observed queue_s exceeds the target. It is underloaded when nothing is queued
+    and less than half of the workers are busy. Each state must hold for several
+    consecutive checks before resizing (hysteresis). The pool is not grown while
+    the event loop lags, as measured by the loop watchdog: the loop, not the
+    number of workers, is then the limit.
+    """
+
+    def __init__(
+        self,
+        pool: WorkerPool,
+        min_workers: int,
+        max_workers: int,
+        interval: float = 1.0,
+        target_queue_s: float = 1.0,
+        max_loop_lag: float = 0.1,
+        up_checks: int = 2,
+        down_checks: int = 30,
+    ):
+        self.pool = pool
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.interval = interval
+        self.target_queue_s = target_queue_s
+        self.max_loop_lag = max_loop_lag
+        self.up_checks = up_checks
+        self.down_checks = down_checks
+        self._overloaded = 0
+        self._underloaded = 0
+
+    def decide(self, loop_lag: float) -> int:
+        """Return the number of workers the pool should have"""
+        pool = self.pool
+        size = pool.size
+        queued = pool.queue.qsize()
+        expected_queue_s = queued * pool.exec_s / size if size else float("inf")
+
+        overloaded = (
+            queued > 0
+            and not pool.idle
+            and max(expected_queue_s, pool.queue_s) > self.target_queue_s
+            and loop_lag <= self.max_loop_lag
+        )
+        underloaded = queued == 0 and pool.busy < size / 2
+
+        self._overloaded = self._overloaded + 1 if overloaded else 0
+        self._underloaded = self._underloaded + 1 if underloaded else 0
+
+        if self._overloaded >= self.up_checks:
+            self._overloaded = 0
+            # Enough workers to drain the queue within the target, at most doubling
+            needed = (
+                math.ceil(queued * pool.exec_s / self.target_queue_s)
+                if pool.exec_s
+                else queued
+            )
+            return min(self.max_workers, size + max(1, min(needed, size)))
+        if self._underloaded >= self.down_checks:
+            self._underloaded = 0
+            return max(self.min_workers, size - 1)
+        return max(self.min_workers, min(self.max_workers, size))
+
+    async def run(self) -> None:
+        logger.info(
+            f"Autoscaling pool {self.pool.name} between {self.min_workers} and {self.max_workers} workers"
+        )
+        while True:
+            await asyncio.sleep(self.interval)
+            size = self.decide(WATCHDOG.lag)
+            if size != self.pool.size:
+                self.pool.resize(size)
+
+
+POOLS: List[WorkerPool] = []
+
+
+def make_pools(n_workers: int) -> List[WorkerPool]:
+    """Create the default pool, processing the RUNS_QUEUE, and the pools
+    dedicated to agents configured in AGENTS_CONCURRENCY"""
+    weights = load_weights()
+    concurrency = load_concurrency()
+    limits = {
+        agent_id: values["max_concurrency"]
+        for agent_id, values in concurrency.items()
+        if "max_concurrency" in values
+    }
+
+    RUNS_QUEUE.set_weights(weights)
+    RUNS_QUEUE.set_limits(limits)
+    pools = [WorkerPool(DEFAULT_POOL, n_workers, RUNS_QUEUE)]
+    routes = {}
+    for agent_id, values in concurrency.items():
+        if values.get("workers", 0) > 0:
+            queue = RunScheduler(weights=weights, limits=limits)
+            routes[agent_id] = queue
+            pools.append(WorkerPool(agent_id, values["workers"], queue))
+    RUNS_QUEUE.set_routes(routes)
+    return pools
+
+
+def make_autoscaler(pool: WorkerPool, n_workers: int) -> Optional[Autoscaler]:
+    """Create the autoscaler of the default pool, if AGWS_MAX_WORKERS allows
+    more workers than AGWS_MIN_WORKERS (both default to NUM_WORKERS)"""
+    min_workers = int(os.getenv("AGWS_MIN_WORKERS") or n_workers)
+    max_workers = int(os.getenv("AGWS_MAX_WORKERS") or n_workers)
+    if max_workers <= min_workers:
+        return None
+    pool.initial_size = max(min_workers, min(max_workers, n_workers))
+    return Autoscaler(
+        pool,
+        min_workers,
+        max_workers,
+        interval=float(os.getenv("AGWS_AUTOSCALE_INTERVAL", 1.0)),
+        target_queue_s=float(os.getenv("AGWS_AUTOSCALE_TARGET_QUEUE_S", 1.0)),
+        max_loop_lag=float(os.getenv("AGWS_AUTOSCALE_MAX_LOOP_LAG", 0.1)),
+    )
+
+
+def _by_pool(value) -> Dict[tuple, float]:
+    return {(pool.name,): value(pool) for pool in POOLS}
+
+
+REGISTRY.callback(
+    "agws_queued_runs",
+    "Runs waiting for a worker",
+    lambda: _by_pool(lambda pool: pool.queue.qsize()),
+    ["pool"],
+)
+REGISTRY.callback(
+    "agws_workers",
+    "Workers of the pools",
+    lambda: _by_pool(lambda pool: pool.size),
+    ["pool"],
+)
+REGISTRY.callback(
+    "agws_busy_workers",
+    "Workers processing a run",
+    lambda: _by_pool(lambda pool: pool.busy),
+    ["pool"],
+)
+
+
+def worker_count() -> int:
+    """Current number of workers, in all pools"""
+    return sum(pool.size for pool in POOLS)
+
+
 async def start_workers(n_workers: int):
-    logger.info(f"Starting {n_workers} workers")
-    tasks = [asyncio.create_task(worker(i + 1)) for i in range(n_workers)]
+    POOLS[:] = make_pools(n_workers)
+    WEBHOOKS.configure()
+    stream_manager.configure()
+    TRACER.configure()
+    start_executor()
+    tasks = [asyncio.create_task(pool.run()) for pool in POOLS]
+    autoscaler = make_autoscaler(POOLS[0], n_workers)
+    if autoscaler is not None:
+        tasks.append(asyncio.create_task(autoscaler.run()))
+    tasks.append(asyncio.create_task(start_sweeper()))
+    tasks.append(asyncio.create_task(start_watchdog()))
     try:
         await asyncio.gather(*tasks)
     finally:
         for task in tasks:
             task.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
+        RUNS_QUEUE.set_routes({})
+        await stop_executor()
+        await WEBHOOKS.aclose()
 
 
 def log_run(
@@ -74,20 +339,57 @@ def run_stats(run_info: RunInfo):
     return {key: run_info[key] for key in ["exec_s", "queue_s", "attempts"]}
 
 
-async def worker(worker_id: int):
+async def worker(worker_id: int, pool: WorkerPool):
+    queue = pool.queue
     while True:
-        run_id = await RUNS_QUEUE.get()
+        pool.idle.add(worker_id)
+        run_id = await queue.get()
         run = DB.get_run(run_id)
         run_info = DB.get_run_info(run_id)
+        if run is None or run_info is None:
+            logger.warning(
+                f"(Worker {worker_id}) Background Run {run_id} deleted while queued, skipping it"
+            )
+            queue.release(run_id)
+            queue.task_done()
+            continue
+        pool.idle.discard(worker_id)
+        pool.busy += 1
 
         started_at = datetime.now().timestamp()
 
         await Runs.set_status(run["run_id"], "pending")
+        if run.get("resume_pending"):
+            DB.update_run(run_id, {"resume_pending": False})
 
         run_info["attempts"] += 1
         run_info["started_at"] = started_at
         run_info["exec_s"] = 0
+        run_info["step_totals"] = {}
+        run_info["pool"] = pool.name
+        run_info["pool_utilization"] = pool.utilization()
         DB.update_run_info(run_id, run_info)
+        start_timeline(run_id)
+
+        # The phases of the run are traced in the trace of its creation
+        traceparent = run.get("traceparent")
+        TRACER.record(
+            "run.queue",
+            started_at - run_info["queued_at"].timestamp(),
+            traceparent,
+            end_ns=int(started_at * 1e9),
+            run_id=run_id,
+        )
+        span = TRACER.start_span(
+            "run.execute",
+            traceparent,
+            run_id=run_id,
+            agent_id=run["agent_id"],
+            attempt=run_info["attempts"],
+            pool=pool.name,
+        )
+        failure: Optional[Exception] = None
+        retry = False
 
         try:
             if run_info["attempts"] > MAX_RETRY_ATTEMPTS:
@@ -95,22 +397,24 @@ async def worker(worker_id: int):
 
             log_run(worker_id, run_id, "started")
 
-            await Runs.Stream.subscribe(run_id)  # to create a queue
-            stream = stream_run(run)
             last_message = None
-            async for message in stream:
-                message.data = make_serializable(message.data)
-                last_message = message
-                if last_message.type == "interrupt":
-                    log_run(
-                        worker_id,
-                        run_id,
-                        "interrupted",
-                        message_data=json.dumps(message.data),
-                    )
-                    break
-                else:
-                    await Runs.Stream.publish(run_id, message)
+            # Closed at the interrupt: the process executor then stops the run
+            # before it can be resumed
+            async with aclosing(execute(run)) as stream:
+                async for message in stream:
+                    message.data = make_serializable(message.data)
+                    record_step(run, run_info, message)
+                    last_message = message
+                    if last_message.type == "interrupt":
+                        log_run(
+                            worker_id,
+                            run_id,
+                            "interrupted",
+                            message_data=serialize_json(message.data).decode(),
+                        )
+                        break
+                    else:
+                        await Runs.Stream.publish(run_id, message)
 
             ended_at = datetime.now().timestamp()
 
@@ -121,16 +425,18 @@ async def worker(worker_id: int):
             DB.update_run_info(run_id, run_info)
 
             try:
-                log_run(
-                    worker_id,
-                    run_id,
-                    "got message",
-                    message_data=json.dumps(last_message.data),
-                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    log_run(
+                        worker_id,
+                        run_id,
+                        "got message",
+                        message_data=serialize_json(last_message.data).decode(),
+                    )
 
                 # Validate only if not interrupt (implicticly validated by _insert_interrupt_name)
                 if last_message.type != "interrupt":
-                    validate_output(run_id, run["agent_id"], last_message.data)
+                    with TRACER.span("run.validate_output"):
+                        validate_output(run_id, run["agent_id"], last_message.data)
 
                 DB.add_run_output(run_id, last_message.data)
                 if last_message.type == "interrupt":
@@ -150,7 +456,8 @@ async def worker(worker_id: int):
                 log_run(worker_id, run_id, "failed")
                 raise RunError(str(error))
 
-        except AttemptsExceededError:
+        except AttemptsExceededError as error:
+            failure = error
             ended_at = datetime.now().timestamp()
             run_info.update(
                 {
@@ -165,6 +472,7 @@ async def worker(worker_id: int):
             log_run(worker_id, run_id, "exceeded attempts")
 
         except Exception as error:
+            failure = error
             ended_at = datetime.now().timestamp()
             run_info.update(
                 {
@@ -175,8 +483,8 @@ async def worker(worker_id: int):
             )
 
             DB.update_run_info(run_id, run_info)
-            await Runs.set_status(run_id, "error")
             DB.add_run_output(run_id, str(error))
+            await Runs.set_status(run_id, "error", retried=True)
             log_run(
                 worker_id,
                 run_id,
@@ -185,7 +493,19 @@ async def worker(worker_id: int):
             )
 
             await Runs.Stream.publish(run_id, Message(type="message", data=str(error)))
-            await RUNS_QUEUE.put(run_id)  # Re-queue for retry
+            retry = True
 
         finally:
-            RUNS_QUEUE.task_done()
+            TRACER.end_span(span, failure)
+            end_timeline(run_id)
+            queue.release(run_id)
+            if retry:
+                # Re-queued once its concurrency slot is released
+                await RUNS_QUEUE.put(run_id)
+            pool.busy -= 1
+            pool.observe(run_info)
+            if run_info.get("queue_s") is not None:
+                RUN_QUEUE_SECONDS.observe(run_info["queue_s"], run["agent_id"])
+            if run_info.get("exec_s") is not None:
+                RUN_EXEC_SECONDS.observe(run_info["exec_s"], run["agent_id"])
+            queue.task_done()
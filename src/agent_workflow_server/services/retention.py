@@ -0,0 +1,241 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from agent_workflow_server.storage.models import Run
+from agent_workflow_server.storage.storage import DB
+
+from .metrics import REGISTRY
+from .scheduler import MAX_RETRY_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# Only finished runs are evicted: pending runs are queued or executing, and
+# interrupted runs are waiting to be resumed. Runs in error are finished once
+# they used all their attempts, before that they are queued again.
+EVICTABLE_STATUSES = ("success", "error", "timeout")
+
+DEFAULT_SWEEP_INTERVAL = 60.0
+
+# Number of runs processed between two yields to the event loop
+SWEEP_BATCH_SIZE = 1000
+
+
+@dataclass
+class RetentionPolicy:
+    """Retention limits of the finished runs of an agent. None means unlimited."""
+
+    ttl: Optional[float] = None  # seconds since the last update or read of the run
+    max_runs: Optional[int] = None
+    max_bytes: Optional[int] = None  # size of the serialized outputs
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            limit is not None for limit in (self.ttl, self.max_runs, self.max_bytes)
+        )
+
+
+@dataclass
+class RetentionStats:
+    sweeps: int = 0
+    evicted_runs: int = 0
+    evicted_bytes: int = 0
+    last_sweep_s: float = 0.0
+    evicted_runs_by_agent: Dict[str, int] = field(
+        default_factory=lambda: defaultdict(int)
+    )
+
+
+def _finished(run_id: str) -> bool:
+    """Whether the run is finished, and will not be executed again unless resumed"""
+    status = DB.get_run_status(run_id)
+    if status == "error":
+        run_info = DB.get_run_info(run_id) or {}
+        return (run_info.get("attempts") or 0) > MAX_RETRY_ATTEMPTS
+    return status in EVICTABLE_STATUSES
+
+
+def _optional_number(value: Optional[str | float | int], cast=float):
+    if value is None or value == "":
+        return None
+    number = cast(value)
+    return number if number > 0 else None
+
+
+def _parse_policy(values: dict, default: RetentionPolicy) -> RetentionPolicy:
+    return RetentionPolicy(
+        ttl=_optional_number(values.get("ttl", default.ttl)),
+        max_runs=_optional_number(values.get("max_runs", default.max_runs), int),
+        max_bytes=_optional_number(values.get("max_bytes", default.max_bytes), int),
+    )
+
+
+def load_policies() -> Tuple[RetentionPolicy, Dict[str, RetentionPolicy]]:
+    """Read the default and per-agent retention policies from the environment"""
+    default = RetentionPolicy(
+        ttl=_optional_number(os.getenv("AGWS_RETENTION_TTL")),
+        max_runs=_optional_number(os.getenv("AGWS_RETENTION_MAX_RUNS"), int),
+        max_bytes=_optional_number(os.getenv("AGWS_RETENTION_MAX_BYTES"), int),
+    )
+    overrides = json.loads(os.getenv("AGWS_RETENTION_AGENTS") or "{}")
+    agents = {
+        agent_id: _parse_policy(values, default)
+        for agent_id, values in overrides.items()
+    }
+    return default, agents
+
+
+class Retention:
+    """Evicts the finished runs (with their info and output) exceeding the
+    retention policy of their agent: expired runs first, then the least recently
+    used ones until the count and size limits are met."""
+
+    def __init__(
+        self,
+        default: Optional[RetentionPolicy] = None,
+        agents: Optional[Dict[str, RetentionPolicy]] = None,
+    ):
+        self.default = default or RetentionPolicy()
+        self.agents = agents or {}
+        self.stats = RetentionStats()
+        self._last_used: Dict[str, float] = {}
+        self._output_sizes: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.default.enabled or any(p.enabled for p in self.agents.values())
+
+    def policy(self, agent_id: str) -> RetentionPolicy:
+        return self.agents.get(agent_id, self.default)
+
+    def touch(self, run_id: str) -> None:
+        """Record a read of the run output, which delays its eviction"""
+        if self.enabled:
+            self._last_used[run_id] = datetime.now().timestamp()
+
+    def _last_use(self, run: Run) -> float:
+        updated_at = run["updated_at"].timestamp()
+        return max(updated_at, self._last_used.get(run["run_id"], updated_at))
+
+    def _output_size(self, run_id: str) -> int:
+        # Outputs of finished runs do not change, their size is computed once
+        size = self._output_sizes.get(run_id)
+        if size is None:
+            size = DB.get_run_output_size(run_id) or 0
+            self._output_sizes[run_id] = size
+        return size
+
+    def _candidates(self) -> Dict[str, List[Run]]:
+        runs_by_agent: Dict[str, List[Run]] = defaultdict(list)
+        for status in EVICTABLE_STATUSES:
+            for run in DB.search_run({"status": status}):
+                if status == "error" and not _finished(run["run_id"]):
+                    continue
+                runs_by_agent[run["agent_id"]].append(run)
+        return runs_by_agent
+
+    def _select(self, runs: List[Run], policy: RetentionPolicy, now: float):
+        """Select the runs to evict, yielding them with their output size"""
+        runs.sort(key=self._last_use)
+        kept = len(runs)
+        kept_bytes = (
+            sum(self._output_size(run["run_id"]) for run in runs)
+            if policy.max_bytes is not None
+            else 0
+        )
+        for run in runs:
+            expired = policy.ttl is not None and self._last_use(run) < now - policy.ttl
+            too_many = policy.max_runs is not None and kept > policy.max_runs
+            too_big = policy.max_bytes is not None and kept_bytes > policy.max_bytes
+            if not (expired or too_many or too_big):
+                # Runs are sorted by last use, the next ones are kept too
+                break
+            size = self._output_size(run["run_id"])
+            kept -= 1
+            kept_bytes -= size
+            yield run, size
+
+    async def sweep(self) -> int:
+        """Evict the runs exceeding their agent's policy, returns the number evicted"""
+        started_at = datetime.now().timestamp()
+        evicted = 0
+        for agent_id, runs in self._candidates().items():
+            policy = self.policy(agent_id)
+            if not policy.enabled:
+                continue
+            for run, size in self._select(runs, policy, started_at):
+                run_id = run["run_id"]
+                # The run may have been resumed, retried or deleted while yielding
+                if not _finished(run_id):
+                    continue
+                DB.delete_run(run_id)
+                self.forget(run_id)
+                self.stats.evicted_runs += 1
+                self.stats.evicted_bytes += size
+                self.stats.evicted_runs_by_agent[agent_id] += 1
+                evicted += 1
+                if evicted % SWEEP_BATCH_SIZE == 0:
+                    await asyncio.sleep(0)
+
+        self.stats.sweeps += 1
+        self.stats.last_sweep_s = datetime.now().timestamp() - started_at
+        if evicted:
+            logger.info(
+                "Retention sweep evicted %d runs in %.3fs (total: %d runs, %d bytes)",
+                evicted,
+                self.stats.last_sweep_s,
+                self.stats.evicted_runs,
+                self.stats.evicted_bytes,
+            )
+        return evicted
+
+    def forget(self, run_id: str) -> None:
+        """Drop the state kept for a deleted run"""
+        self._last_used.pop(run_id, None)
+        self._output_sizes.pop(run_id, None)
+
+    async def run(self, interval: float) -> None:
+        """Sweep periodically, until cancelled"""
+        logger.info(f"Starting retention sweeper (every {interval}s)")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Retention sweep failed")
+
+
+RETENTION = Retention()
+
+REGISTRY.callback(
+    "agws_retention_evicted_runs_total",
+    "Runs evicted by the retention policies",
+    lambda: {
+        (agent_id,): n for agent_id, n in RETENTION.stats.evicted_runs_by_agent.items()
+    },
+    ["agent_id"],
+    type="counter",
+)
+REGISTRY.callback(
+    "agws_retention_evicted_bytes_total",
+    "Output bytes of the runs evicted by the retention policies",
+    lambda: RETENTION.stats.evicted_bytes,
+    type="counter",
+)
+
+
+async def start_sweeper() -> None:
+    RETENTION.default, RETENTION.agents = load_policies()
+    if not RETENTION.enabled:
+        return
+    interval = float(os.getenv("AGWS_RETENTION_SWEEP_INTERVAL", DEFAULT_SWEEP_INTERVAL))
+    await RETENTION.run(interval)
@@ -3,14 +3,11 @@
 
 import asyncio
 import logging
-from collections import defaultdict
 from datetime import datetime
 from itertools import islice
 from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
 from uuid import uuid4
 
-import httpx
-
 from agent_workflow_server.generated.models.run_create_stateless import (
     RunCreateStateless as ApiRunCreate,
 )
@@ -23,17 +20,26 @@ from agent_workflow_server.generated.models.run_stateless import (
 from agent_workflow_server.generated.models.stream_event_payload import (
     StreamEventPayload,
 )
-from agent_workflow_server.generated.models.value_run_error_update import (
-    ValueRunErrorUpdate,
-)
-from agent_workflow_server.generated.models.value_run_interrupt_update import (
-    ValueRunInterruptUpdate,
-)
-from agent_workflow_server.generated.models.value_run_result_update import (
-    ValueRunResultUpdate,
+from agent_workflow_server.services.completions import COMPLETIONS
+from agent_workflow_server.services.metrics import REGISTRY, RUNS_ENDED
+from agent_workflow_server.services.profile import run_profile
+from agent_workflow_server.services.retention import RETENTION
+from agent_workflow_server.services.scheduler import RunScheduler
+from agent_workflow_server.services.sse import KEEPALIVE, event_frame, event_payload
+from agent_workflow_server.services.subscriptions import (
+    DEFAULT_MAX_SIZE,
+    DEFAULT_OVERFLOW_POLICY,
+    EventLog,
+    OverflowPolicy,
+    SlowConsumerError,
+    Subscription,
+    load_replay_settings,
+    load_stream_settings,
 )
 from agent_workflow_server.services.threads import Threads
+from agent_workflow_server.services.tracing import TRACER
 from agent_workflow_server.services.utils import check_run_is_interrupted
+from agent_workflow_server.services.webhooks import WEBHOOKS
 from agent_workflow_server.storage.models import Interrupt, Run, RunInfo, RunStatus
 from agent_workflow_server.storage.storage import DB
 
@@ -104,9 +110,9 @@ def _to_api_model(run: Run) -> ApiRun:
     )
 
 
-async def _call_webhook(run: Run) -> None:
+def _call_webhook(run: Run) -> None:
     """
-    Call the webhook URL with the Run data.
+    Queue a call of the webhook URL with the Run data, delivered in the background.
 
     Args:
         run (Run): The Run to send to the webhook.
@@ -114,65 +120,99 @@ async def _call_webhook(run: Run) -> None:
     if not run.get("webhook"):
         return
 
-    try:
-        run_data = _to_api_model(run).model_dump_json(by_alias=True, exclude_unset=True)
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                run["webhook"],
-                content=run_data,
-                headers={"Content-Type": "application/json"},
-            )
-
-        response.raise_for_status()
-
-        logger.info(f"Webhook called successfully for run {run['run_id']}")
-    except httpx.RequestError as e:
-        logger.error(f"Error calling webhook for run {run['run_id']}: {e}")
+    run_data = _to_api_model(run).model_dump_json(by_alias=True, exclude_unset=True)
+    WEBHOOKS.enqueue(
+        str(run["run_id"]), run["webhook"], run_data.encode(), run.get("traceparent")
+    )
 
 
 class StreamManager:
-    def __init__(self):
-        self.queues: Dict[str, List[asyncio.Queue]] = {}
-
-    def get_queues(self, run_id: str) -> List[asyncio.Queue]:
-        return self.queues.get(run_id, [])
-
-    async def add_queue(self, run_id: str) -> asyncio.Queue:
-        queue = asyncio.Queue()
-        self.queues.setdefault(run_id, []).append(queue)
-        return queue
-
-    async def remove_queue(self, run_id: str, queue: asyncio.Queue):
-        self.queues[run_id].remove(queue)
+    """Subscriptions to the messages of the runs. Subscriptions are bounded, see
+    Subscription for the overflow policies. The last messages of each run are
+    kept in an EventLog, for subscribers to catch up."""
 
-    async def put_message(self, run_id: str, message: Message) -> None:
-        queues = self.get_queues(run_id)
-        num = len(queues)
-        if not queues:
-            logger.warning(f"No queues found for run_id {run_id}")
-        await asyncio.gather(*(queue.put(message) for queue in queues))
-        logger.debug(f"Message put on {num} queues for run_id {run_id}")
+    def __init__(self):
+        self.subscriptions: Dict[str, List[Subscription]] = {}
+        self.max_size = DEFAULT_MAX_SIZE
+        self.policy: OverflowPolicy = DEFAULT_OVERFLOW_POLICY
+        self.events = EventLog()
+
+    def configure(self) -> None:
+        """Read the settings from the environment"""
+        self.max_size, self.policy = load_stream_settings()
+        self.events.size, self.events.ttl = load_replay_settings()
+
+    def get_subscriptions(self, run_id: str) -> List[Subscription]:
+        return self.subscriptions.get(run_id, [])
+
+    def subscribe(self, run_id: str) -> Subscription:
+        subscription = Subscription(self.max_size, self.policy)
+        self.subscriptions.setdefault(run_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, run_id: str, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(run_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.remove(subscription)
+        if not subscriptions:
+            del self.subscriptions[run_id]
+
+    def put_message(self, run_id: str, message: Message) -> int:
+        """Publish the message to the subscribers of the run, returns their number"""
+        self.events.record(run_id, message)
+        subscriptions = self.get_subscriptions(run_id)
+        if not subscriptions:
+            return 0
+        for subscription in subscriptions:
+            subscription.put_nowait(message)
+            if subscription.closed:
+                logger.warning(
+                    f"Disconnected slow subscriber of run {run_id} ({subscription.dropped} messages dropped)"
+                )
+        if message.type == "control" and message.data == "done":
+            # The subscribers drain their queued messages, no more will come
+            self.subscriptions.pop(run_id, None)
+        elif any(subscription.closed for subscription in subscriptions):
+            self.subscriptions[run_id] = [s for s in subscriptions if not s.closed]
+            if not self.subscriptions[run_id]:
+                del self.subscriptions[run_id]
+        logger.debug(
+            f"Message put on {len(subscriptions)} subscriptions for run_id {run_id}"
+        )
+        return len(subscriptions)
 
 
 stream_manager = StreamManager()
-cvs_pending_run = defaultdict(asyncio.Condition)
-RUNS_QUEUE = asyncio.Queue()
+RUNS_QUEUE = RunScheduler()
+
+REGISTRY.callback(
+    "agws_stream_subscribers",
+    "Clients subscribed to the streams of runs",
+    lambda: sum(len(s) for s in list(stream_manager.subscriptions.values())),
+)
+REGISTRY.callback(
+    "agws_stream_replay_runs",
+    "Runs whose last messages are kept for replay",
+    lambda: len(stream_manager.events),
+)
 
 
 class Runs:
     @staticmethod
     async def put(run_create: ApiRunCreate) -> ApiRun:
-        new_run = _make_run(run_create)
-        run_info = RunInfo(
-            run_id=new_run["run_id"],
-            queued_at=datetime.now(),
-            attempts=0,
-        )
-        DB.create_run(new_run)
-        DB.create_run_info(run_info)
+        with TRACER.span("run.create", agent_id=run_create.agent_id) as span:
+            new_run = _make_run(run_create)
+            new_run["traceparent"] = TRACER.traceparent(span)
+            run_info = RunInfo(
+                run_id=new_run["run_id"],
+                queued_at=datetime.now(),
+                attempts=0,
+            )
+            DB.create_run(new_run)
+            DB.create_run_info(run_info)
 
-        await RUNS_QUEUE.put(new_run["run_id"])
+            await RUNS_QUEUE.put(new_run["run_id"])
         return _to_api_model(new_run)
 
     @staticmethod
@@ -183,10 +223,20 @@ class Runs:
 
         return _to_api_model(run)
 
+    @staticmethod
+    def get_profile(run_id: str) -> Optional[Dict[str, Any]]:
+        """Timings of the steps of the last attempt of the run"""
+        run = DB.get_run(run_id)
+        if run is None:
+            return None
+        return run_profile(run, DB.get_run_info(run_id) or {})
+
     @staticmethod
     def delete(run_id: str):
         if not DB.delete_run(run_id):
             raise Exception("Run not found")
+        RETENTION.forget(run_id)
+        stream_manager.events.forget(run_id)
 
     @staticmethod
     def get_all() -> List[ApiRun]:
@@ -224,10 +274,9 @@ class Runs:
         run = DB.get_run(run_id)
         check_run_is_interrupted(run)
 
-        interrupt = run["interrupt"]
-        interrupt["user_data"] = user_input
+        interrupt = {**run["interrupt"], "user_data": user_input}
 
-        DB.update_run(run_id, {"interrupt": interrupt})
+        DB.update_run(run_id, {"interrupt": interrupt, "resume_pending": True})
         DB.update_run_info(run_id, {"attempts": 0, "queued_at": datetime.now()})
         updated = DB.update_run_status(run_id, "pending")
 
@@ -235,17 +284,19 @@ class Runs:
         return _to_api_model(updated)
 
     @staticmethod
-    async def set_status(run_id: str, status: RunStatus):
-        run = DB.get_run(run_id)
+    async def set_status(run_id: str, status: RunStatus, retried: bool = False):
+        """Set the status of the run, retried if the attempt failed and the run
+        is queued again: the status is then not final"""
+        run = DB.update_run_status(run_id, status)
         if not run:
             raise Exception("Run not found")
 
-        run = DB.update_run_status(run_id, status)
-        await _call_webhook(run)
+        _call_webhook(run)
 
         if status != "pending":
-            async with cvs_pending_run[run_id]:
-                cvs_pending_run[run_id].notify_all()
+            if not retried:
+                RUNS_ENDED.inc(run["agent_id"], status)
+            COMPLETIONS.resolve(run, DB.get_run_output)
 
     @staticmethod
     async def wait(run_id: str):
@@ -272,79 +323,50 @@ class Runs:
 
         if run["status"] != "pending":
             # If the run is already completed, return the stored output immediately
+            RETENTION.touch(run_id)
             return _to_api_model(run), DB.get_run_output(run_id)
 
-        # TODO: handle removing cvs when run is completed and there are no more subscribers
         try:
-            async with cvs_pending_run[run_id]:
-                await asyncio.wait_for(
-                    cvs_pending_run[run_id].wait_for(
-                        lambda: DB.get_run_status(run_id) != "pending"
-                    ),
-                    timeout=timeout,
-                )
-                run = DB.get_run(run_id)
-                return _to_api_model(run), DB.get_run_output(run_id)
+            run, output = await COMPLETIONS.wait(run_id, timeout)
+            return _to_api_model(run), output
         except asyncio.TimeoutError:
             logger.warning(f"Timeout reached while waiting for run {run_id}")
             raise TimeoutError
 
-        return None, None
-
     @staticmethod
     async def stream_events(run_id: str) -> AsyncIterator[StreamEventPayload | None]:
-        async for message in Runs.Stream.join(run_id):
-            msg_data = message.data
+        """Stream the events of the run as API models, None for keep-alives"""
+        async for message in Runs._stream_messages(run_id):
+            yield None if message is None else event_payload(run_id, message)
+
+    @staticmethod
+    async def stream_frames(
+        run_id: str, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream the events of the run as SSE frames, resuming after
+        last_event_id if given"""
+        async for message in Runs._stream_messages(run_id, last_event_id):
+            yield KEEPALIVE if message is None else event_frame(run_id, message)
 
-            if message.type == "control":
-                if message.data == "done":
+    @staticmethod
+    async def _stream_messages(
+        run_id: str, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[Message | None]:
+        try:
+            async for message in Runs.Stream.join(run_id, last_event_id):
+                if message.type != "control":
+                    yield message
+                elif message.data == "done":
                     break
                 elif message.data == "timeout":
                     yield None
-                    continue
                 else:
                     logger.error(
                         f'received unknown control message "{message.data}" in stream events for run: {run_id}'
                     )
-                    continue
-
-            # We need to get the latest value to return
-            run = DB.get_run(run_id)
-            if run is None:
-                raise ValueError(f"Run {run_id} not found")
-
-            run_status = run["status"]
-            if run_status == "interrupted":
-                yield StreamEventPayload(
-                    ValueRunInterruptUpdate(
-                        type="interrupt",
-                        run_id=run["run_id"],
-                        status=run_status,
-                        interrupt=msg_data,
-                    )
-                )
-            elif run_status == "success" or run_status == "pending":
-                yield StreamEventPayload(
-                    ValueRunResultUpdate(
-                        type="values",
-                        run_id=run["run_id"],
-                        status=run_status,
-                        values=msg_data,
-                    )
-                )
-            elif run_status == "error":
-                yield StreamEventPayload(
-                    ValueRunErrorUpdate(
-                        type="error",
-                        run_id=run["run_id"],
-                        status=run_status,
-                        description=msg_data,
-                        # FIXME: we have not defined the errcodes
-                        errcode=0,
-                    )
-                )
-            else:
-                raise ValueError(f"Run status {run_status} unknown")
+        except SlowConsumerError as error:
+            # The client may reconnect to the stream
+            logger.warning(f"Closing stream of run {run_id}: {error}")
 
     class Interrupts:
         @staticmethod
@@ -356,34 +378,66 @@ class Runs:
     class Stream:
         @staticmethod
         async def publish(run_id: str, message: Message) -> None:
-            await stream_manager.put_message(run_id, message)
+            if message.type != "control":
+                # Streamed with the message, also when replayed later
+                message.run_status = DB.get_run_status(run_id)
+            if stream_manager.put_message(run_id, message):
+                # Let the subscribers handle the message while the run is pending
+                await asyncio.sleep(0)
 
         @staticmethod
-        async def subscribe(run_id: str) -> asyncio.Queue:
-            queue = await stream_manager.add_queue(run_id)
+        async def subscribe(run_id: str) -> Subscription:
+            subscription = stream_manager.subscribe(run_id)
             logger.debug(f"Subscribed to queue for run_id {run_id}")
-            return queue
+            return subscription
 
         @staticmethod
         async def join(
             run_id: str,
+            last_event_id: Optional[int] = None,
         ) -> AsyncGenerator[Message, None]:
-            queue = await Runs.Stream.subscribe(run_id)
+            """Stream the messages of the run published from now on or, if
+            last_event_id is given, the ones published after that message"""
+            subscription = await Runs.Stream.subscribe(run_id)
+            replayed = (
+                stream_manager.events.replay(run_id, last_event_id)
+                if last_event_id is not None
+                else []
+            )
+            try:
+                # Check after subscribe whether the run is completed to
+                # avoid race condition.
+                run = DB.get_run(run_id)
+                if run is None:
+                    raise ValueError(f"Run {run_id} not found")
 
-            # Check after subscribe whether the run is completed to
-            # avoid race condition.
-            run = DB.get_run(run_id)
-            if run is None:
-                raise ValueError(f"Run {run_id} not found")
-            if run["status"] != "pending" and queue.empty():
-                return
-
-            while True:
-                try:
-                    message: Message = await asyncio.wait_for(queue.get(), timeout=10)
+                last_id = last_event_id or 0
+                if replayed and replayed[0].id > last_id + 1:
+                    logger.warning(
+                        f"Messages {last_id + 1} to {replayed[0].id - 1} of run {run_id} are no longer available"
+                    )
+                for message in replayed:
                     yield message
+                    last_id = message.id
                     if message.type == "control" and message.data == "done":
-                        break
-                except TimeoutError as error:
-                    logger.error(f"Timeout waiting for run {run_id}: {error}")
-                    yield Message(type="control", data="timeout")
+                        return
+
+                if run["status"] != "pending" and subscription.empty():
+                    return
+
+                while True:
+                    try:
+                        message: Message = await asyncio.wait_for(
+                            subscription.get(), timeout=10
+                        )
+                        if message.id <= last_id:
+                            # Already replayed
+                            continue
+                        yield message
+                        if message.type == "control" and message.data == "done":
+                            break
+                    except TimeoutError as error:
+                        logger.error(f"Timeout waiting for run {run_id}: {error}")
+                        yield Message(type="control", data="timeout")
+            finally:
+                stream_manager.unsubscribe(run_id, subscription)
@@ -0,0 +1,274 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent_workflow_server.storage.models import Run
+from agent_workflow_server.storage.storage import DB
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHT = 1.0
+
+# Attempts of a run: a run failing an earlier attempt is queued again
+MAX_RETRY_ATTEMPTS = 3
+
+# Scheduling classes, lower first
+RESUME = 0
+NEW = 1
+
+
+def run_priority(run: Run) -> int:
+    """Priority of a run, from its metadata or configurable (higher first)"""
+    for values in (
+        run.get("metadata"),
+        (run.get("config") or {}).get("configurable"),
+    ):
+        if isinstance(values, dict) and "priority" in values:
+            try:
+                return int(values["priority"])
+            except (TypeError, ValueError):
+                logger.warning(
+                    f"Ignoring invalid priority {values['priority']!r} of run {run['run_id']}"
+                )
+    return 0
+
+
+def run_class(run: Run) -> int:
+    """Resumed runs are scheduled before new ones, until their first attempt
+    starts: their retries are scheduled as new runs"""
+    if run.get("resume_pending"):
+        return RESUME
+    return NEW
+
+
+def load_weights() -> Dict[str, float]:
+    """Read the per-agent scheduling weights from the environment"""
+    weights = json.loads(os.getenv("AGWS_SCHEDULER_WEIGHTS") or "{}")
+    return {agent_id: float(weight) for agent_id, weight in weights.items()}
+
+
+def load_concurrency() -> Dict[str, Dict[str, int]]:
+    """Read the per-agent concurrency settings from the environment: the max
+    number of concurrent runs ("max_concurrency") and the size of a dedicated
+    pool of workers ("workers")"""
+    config = json.loads(os.getenv("AGENTS_CONCURRENCY") or "{}")
+    return {
+        agent_id: {key: int(value) for key, value in values.items()}
+        for agent_id, values in config.items()
+    }
+
+
+class _Flow:
+    """Runs queued for one agent, highest class and priority first"""
+
+    __slots__ = ("key", "weight", "runs", "finish", "entry")
+
+    def __init__(self, key: str, weight: float):
+        self.key = key
+        self.weight = weight
+        self.runs: List[Tuple[int, int, int, str]] = []
+        # Virtual finish time of the last run served, or of the head run when active
+        self.finish = 0.0
+        # Entry of the flow in the active heap, None when idle
+        self.entry: Optional[list] = None
+
+
+class _FairQueue:
+    """Weighted fair queue of run IDs (start-time fair queuing across agents).
+
+    Each agent has a flow ordered by (class, -priority, arrival). The flow of the
+    run to serve next is the one whose head has the lowest (class, -priority,
+    virtual finish time): resumes and higher priorities go first, and agents with
+    the same head priority share the workers in proportion to their weights.
+
+    Flows of agents running as many runs as their concurrency limit are parked,
+    out of the active heap, until one of their runs is released.
+    """
+
+    def __init__(self, weights: Dict[str, float], limits: Dict[str, int]):
+        self.weights = weights
+        self.limits = limits
+        self.running: Dict[str, int] = {}
+        self._flows: Dict[str, _Flow] = {}
+        self._active: List[list] = []
+        self._n_active = 0
+        self._seq = count()
+        self._virtual_time = 0.0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        # Whether a run can be served, parked runs cannot
+        return self._n_active > 0
+
+    def at_limit(self, key: str) -> bool:
+        limit = self.limits.get(key)
+        return limit is not None and self.running.get(key, 0) >= limit
+
+    def push(self, run_id: str, key: str, run_cls: int, priority: int) -> None:
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._flows[key] = _Flow(key, self.weights.get(key, DEFAULT_WEIGHT))
+        idle = not flow.runs
+        heapq.heappush(flow.runs, (run_cls, -priority, next(self._seq), run_id))
+        self._size += 1
+
+        if flow.entry is not None:
+            if flow.runs[0][3] == run_id:
+                # The new run is the head of the flow, re-rank the flow
+                self._activate(flow)
+        elif not self.at_limit(key):
+            if idle:
+                flow.finish = max(self._virtual_time, flow.finish) + 1.0 / flow.weight
+            self._activate(flow)
+
+    def pop(self) -> Tuple[str, str]:
+        """Pop the next run, returning its ID and the key of its flow"""
+        while True:
+            entry = heapq.heappop(self._active)
+            flow = entry[-1]
+            if flow is not None:
+                break
+        flow.entry = None
+        self._n_active -= 1
+        _, _, _, run_id = heapq.heappop(flow.runs)
+        self._size -= 1
+        self._virtual_time = flow.finish
+        self.running[flow.key] = self.running.get(flow.key, 0) + 1
+
+        if flow.runs:
+            flow.finish += 1.0 / flow.weight
+            if not self.at_limit(flow.key):
+                self._activate(flow)
+        return run_id, flow.key
+
+    def release(self, key: str) -> bool:
+        """Release a run of the flow, returns whether a parked flow was resumed"""
+        running = self.running.get(key, 0) - 1
+        if running > 0:
+            self.running[key] = running
+        else:
+            self.running.pop(key, None)
+        return self.unpark(key)
+
+    def unpark(self, key: str) -> bool:
+        flow = self._flows.get(key)
+        if flow is None or not flow.runs or flow.entry is not None:
+            return False
+        if self.at_limit(key):
+            return False
+        # No credit is accumulated while parked
+        flow.finish = max(self._virtual_time, flow.finish)
+        self._activate(flow)
+        return True
+
+    def _activate(self, flow: _Flow) -> None:
+        if flow.entry is not None:
+            flow.entry[-1] = None
+        else:
+            self._n_active += 1
+        run_cls, neg_priority, _, _ = flow.runs[0]
+        flow.entry = [run_cls, neg_priority, flow.finish, next(self._seq), flow]
+        heapq.heappush(self._active, flow.entry)
+
+
+class RunScheduler(asyncio.Queue):
+    """Queue of run IDs with priorities and weighted fair sharing between agents.
+
+    Keeps the asyncio.Queue contract (put/get/task_done/join) but, instead of
+    FIFO, runs are served by class (resumed runs first), then by priority (from
+    the "priority" of the run metadata or configurable), then fairly across
+    agents, weighted by their weight (1 by default). Runs of an agent with the same
+    class and priority are served in FIFO order.
+
+    Agents may have a concurrency limit: once they have as many runs got and not
+    released, their queued runs are skipped (empty() is True if only those are
+    queued). Agents may also be routed to another scheduler, serving a dedicated
+    pool of workers: their runs are put in that scheduler instead.
+    """
+
+    def __init__(
+        self,
+        get_run: Optional[Callable[[str], Optional[Run]]] = None,
+        weights: Optional[Dict[str, float]] = None,
+        limits: Optional[Dict[str, int]] = None,
+    ):
+        self._get_run = get_run or DB.get_run
+        self._weights = weights or {}
+        self._limits = limits or {}
+        self._routes: Dict[str, "RunScheduler"] = {}
+        self._acquired: Dict[str, str] = {}
+        # Run looked up by put_nowait, for _put
+        self._put_run: Optional[Tuple[str, Optional[Run]]] = None
+        super().__init__()
+
+    def _init(self, maxsize: int) -> None:
+        self._queue = _FairQueue(self._weights, self._limits)
+
+    def put_nowait(self, run_id: str) -> None:
+        run = self._get_run(run_id)
+        queue = self._routes.get(run["agent_id"], self) if run else self
+        if queue is not self:
+            return queue.put_nowait(run_id)
+        self._put_run = (run_id, run)
+        try:
+            super().put_nowait(run_id)
+        finally:
+            self._put_run = None
+
+    def _put(self, run_id: str) -> None:
+        if self._put_run is not None and self._put_run[0] == run_id:
+            run = self._put_run[1]
+        else:
+            run = self._get_run(run_id)
+        if run is None:
+            # Unknown run (e.g. deleted while queued), the worker skips it:
+            # schedule it as a new run
+            self._queue.push(run_id, "", NEW, 0)
+            return
+        self._queue.push(run_id, run["agent_id"], run_class(run), run_priority(run))
+
+    def _get(self) -> Any:
+        run_id, key = self._queue.pop()
+        self._acquired[run_id] = key
+        if self._queue:
+            # Several runs may have become available at once (e.g. limits raised)
+            self._wakeup_next(self._getters)
+        return run_id
+
+    def release(self, run_id: str) -> None:
+        """Release the concurrency slot taken by a run got from the queue. Must be
+        called once the run is processed, calling it again is a no-op."""
+        key = self._acquired.pop(run_id, None)
+        if key is not None and self._queue.release(key):
+            self._wakeup_next(self._getters)
+
+    def running(self, agent_id: str) -> int:
+        """Number of runs of the agent got and not released"""
+        return self._queue.running.get(agent_id, 0)
+
+    def set_weights(self, weights: Dict[str, float]) -> None:
+        """Update the agent weights, applied to the runs queued afterwards"""
+        self._queue.weights = weights
+        for key, flow in self._queue._flows.items():
+            flow.weight = weights.get(key, DEFAULT_WEIGHT)
+
+    def set_limits(self, limits: Dict[str, int]) -> None:
+        """Update the agent concurrency limits"""
+        self._queue.limits = limits
+        for key in list(self._queue._flows):
+            if self._queue.unpark(key):
+                self._wakeup_next(self._getters)
+
+    def set_routes(self, routes: Dict[str, "RunScheduler"]) -> None:
+        """Route the runs of agents to other schedulers"""
+        self._routes = routes
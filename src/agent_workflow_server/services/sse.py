@@ -0,0 +1,75 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Any, Dict, Optional
+
+from pydantic_core import to_json
+
+from agent_workflow_server.generated.models.stream_event_payload import (
+    StreamEventPayload,
+)
+from agent_workflow_server.generated.models.value_run_error_update import (
+    ValueRunErrorUpdate,
+)
+from agent_workflow_server.generated.models.value_run_interrupt_update import (
+    ValueRunInterruptUpdate,
+)
+from agent_workflow_server.generated.models.value_run_result_update import (
+    ValueRunResultUpdate,
+)
+
+from .message import Message
+
+# Sent when no message was published for a while
+KEEPALIVE = b":"
+
+_MODELS = {
+    "values": ValueRunResultUpdate,
+    "interrupt": ValueRunInterruptUpdate,
+    "error": ValueRunErrorUpdate,
+}
+
+
+def event_dict(run_id: str, status: Optional[str], data: Any) -> Dict[str, Any]:
+    """Stream event of a message published while the run had the given status,
+    with the fields of the API models in their order"""
+    if status == "interrupted":
+        return {
+            "type": "interrupt",
+            "interrupt": data,
+            "run_id": run_id,
+            "status": status,
+        }
+    if status == "success" or status == "pending":
+        return {"type": "values", "run_id": run_id, "status": status, "values": data}
+    if status == "error":
+        return {
+            "type": "error",
+            "run_id": run_id,
+            # FIXME: we have not defined the errcodes
+            "errcode": 0,
+            "description": data,
+            "status": status,
+        }
+    if status is None:
+        raise ValueError(f"Run {run_id} not found")
+    raise ValueError(f"Run status {status} unknown")
+
+
+def event_payload(run_id: str, message: Message) -> StreamEventPayload:
+    """API model of the stream event of a message"""
+    event = event_dict(run_id, message.run_status, message.data)
+    return StreamEventPayload(_MODELS[event["type"]](**event))
+
+
+def event_frame(run_id: str, message: Message) -> bytes:
+    """SSE frame of the stream event of a message. Built once, the same bytes are
+    sent to all the subscribers of the run."""
+    frame = message.frame
+    if frame is None:
+        data = to_json(event_dict(run_id, message.run_status, message.data))
+        frame = message.frame = b"id: %d\nevent: agent_event\ndata: %b\n\n" % (
+            message.id,
+            data,
+        )
+    return frame
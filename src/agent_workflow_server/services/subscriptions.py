@@ -0,0 +1,222 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Literal, Optional, Tuple, get_args
+
+from .message import Message
+
+OverflowPolicy = Literal["drop_oldest", "latest", "disconnect"]
+
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_OVERFLOW_POLICY: OverflowPolicy = "drop_oldest"
+DEFAULT_REPLAY_SIZE = 100
+DEFAULT_REPLAY_TTL = 300.0
+# Seconds after the expiry of the oldest run log to check the logs again
+EXPIRY_SLACK = 0.1
+
+
+class SlowConsumerError(Exception):
+    """Raised to a subscriber disconnected for not keeping up with the run"""
+
+
+def load_stream_settings() -> tuple[int, OverflowPolicy]:
+    """Read the size and overflow policy of the subscriptions from the environment"""
+    max_size = int(os.getenv("AGWS_STREAM_QUEUE_SIZE") or DEFAULT_MAX_SIZE)
+    policy = os.getenv("AGWS_STREAM_OVERFLOW") or DEFAULT_OVERFLOW_POLICY
+    if policy not in get_args(OverflowPolicy):
+        raise ValueError(
+            f"Invalid AGWS_STREAM_OVERFLOW {policy}, must be one of: "
+            + ", ".join(get_args(OverflowPolicy))
+        )
+    return max_size, policy
+
+
+def load_replay_settings() -> tuple[int, float]:
+    """Read the number of messages kept per run for replay, and for how long"""
+    size = int(os.getenv("AGWS_STREAM_REPLAY_SIZE") or DEFAULT_REPLAY_SIZE)
+    ttl = float(os.getenv("AGWS_STREAM_REPLAY_TTL") or DEFAULT_REPLAY_TTL)
+    return size, ttl
+
+
+class Subscription:
+    """Bounded queue of the messages of a run, for a single consumer.
+
+    Once max_size messages are queued, a new message is handled according to the
+    overflow policy:
+    - "drop_oldest": the oldest queued message is dropped
+    - "latest": all queued messages are dropped, only the latest value is kept
+    - "disconnect": the subscription is closed, get() raises SlowConsumerError
+
+    Control messages are never dropped and do not count against the limit.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        policy: OverflowPolicy = DEFAULT_OVERFLOW_POLICY,
+    ):
+        self.max_size = max_size
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._messages: Deque[Message] = deque()
+        self._size = 0  # number of queued messages other than control ones
+        self._waiter: Optional[asyncio.Future] = None
+
+    def empty(self) -> bool:
+        return not self._messages
+
+    def qsize(self) -> int:
+        return len(self._messages)
+
+    def put_nowait(self, message: Message) -> None:
+        if self.closed:
+            return
+        if message.type != "control":
+            if self._size >= self.max_size:
+                self._overflow()
+                if self.closed:
+                    return
+            self._size += 1
+        self._messages.append(message)
+        self._wakeup()
+
+    def _overflow(self) -> None:
+        if self.policy == "disconnect":
+            self.dropped += self._size
+            self.close()
+        elif self.policy == "latest":
+            self.dropped += self._size
+            self._messages = deque(m for m in self._messages if m.type == "control")
+            self._size = 0
+        else:
+            for index, queued in enumerate(self._messages):
+                if queued.type != "control":
+                    del self._messages[index]
+                    break
+            self.dropped += 1
+            self._size -= 1
+
+    def close(self) -> None:
+        """Close the subscription, dropping its queued messages"""
+        self.closed = True
+        self._messages.clear()
+        self._size = 0
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self) -> Message:
+        while not self._messages:
+            if self.closed:
+                raise SlowConsumerError("Subscriber too slow, disconnected")
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        message = self._messages.popleft()
+        if message.type != "control":
+            self._size -= 1
+        return message
+
+
+class _RunLog:
+    __slots__ = ("messages", "next_id", "updated_at")
+
+    def __init__(self):
+        self.messages: Deque[Tuple[float, Message]] = deque()
+        self.next_id = 1
+        self.updated_at = 0.0
+
+
+class EventLog:
+    """Ring buffers of the last messages published for each run, numbered in
+    order, for subscribers to catch up from a message ID.
+
+    Each run keeps its last `size` messages, for `ttl` seconds. Runs without
+    messages for `ttl` seconds are forgotten, which restarts their numbering:
+    when a message is recorded and, in an event loop, by a timer set for the
+    expiry of the oldest run, so the logs of finished runs do not wait for
+    other runs to publish.
+    """
+
+    def __init__(
+        self, size: int = DEFAULT_REPLAY_SIZE, ttl: float = DEFAULT_REPLAY_TTL
+    ):
+        self.size = size
+        self.ttl = ttl
+        # Ordered by last update, the runs to forget first
+        self._logs: OrderedDict[str, _RunLog] = OrderedDict()
+        self._expiry: Optional[asyncio.TimerHandle] = None
+        self._expiry_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def record(self, run_id: str, message: Message) -> None:
+        """Number the message and keep it for replay"""
+        now = time.monotonic()
+        log = self._logs.get(run_id)
+        if log is None:
+            log = self._logs[run_id] = _RunLog()
+        else:
+            self._logs.move_to_end(run_id)
+        message.id = log.next_id
+        log.next_id += 1
+        log.updated_at = now
+        if self.size > 0:
+            log.messages.append((now, message))
+            if len(log.messages) > self.size:
+                log.messages.popleft()
+        self._expire(now)
+        self._schedule_expiry(now)
+
+    def _expire(self, now: float) -> None:
+        while self._logs:
+            log = next(iter(self._logs.values()))
+            if now - log.updated_at <= self.ttl:
+                break
+            self._logs.popitem(last=False)
+
+    def _schedule_expiry(self, now: float) -> None:
+        if not self._logs:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Expired when the next message is recorded
+            return
+        if self._expiry is not None and self._expiry_loop is loop:
+            return
+        oldest = next(iter(self._logs.values()))
+        delay = max(0.0, oldest.updated_at + self.ttl - now) + EXPIRY_SLACK
+        self._expiry = loop.call_later(delay, self._on_expiry)
+        self._expiry_loop = loop
+
+    def _on_expiry(self) -> None:
+        self._expiry = None
+        now = time.monotonic()
+        self._expire(now)
+        self._schedule_expiry(now)
+
+    def replay(self, run_id: str, after_id: int) -> List[Message]:
+        """Messages of the run kept after the given ID, in order"""
+        log = self._logs.get(run_id)
+        if log is None:
+            return []
+        oldest = time.monotonic() - self.ttl
+        return [
+            message
+            for published_at, message in log.messages
+            if message.id > after_id and published_at >= oldest
+        ]
+
+    def forget(self, run_id: str) -> None:
+        self._logs.pop(run_id, None)
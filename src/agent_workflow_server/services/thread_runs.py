@@ -4,7 +4,7 @@
 import asyncio
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
 from agent_workflow_server.generated.models.run_create_stateful import (
@@ -13,8 +13,12 @@ from agent_workflow_server.generated.models.run_create_stateful import (
 from agent_workflow_server.generated.models.run_stateful import (
     RunStateful as ApiRunStateful,
 )
-from agent_workflow_server.services.runs import RUNS_QUEUE, cvs_pending_run
+from agent_workflow_server.services.completions import COMPLETIONS
+from agent_workflow_server.services.profile import run_profile
+from agent_workflow_server.services.retention import RETENTION
+from agent_workflow_server.services.runs import RUNS_QUEUE, stream_manager
 from agent_workflow_server.services.threads import PendingRunError, Threads
+from agent_workflow_server.services.tracing import TRACER
 from agent_workflow_server.storage.models import Run, RunInfo
 from agent_workflow_server.storage.storage import DB
 
@@ -105,6 +109,13 @@ class ThreadRuns:
             )
         return _to_api_model(run)
 
+    @staticmethod
+    async def get_profile(thread_id: str, run_id: str) -> Optional[Dict[str, Any]]:
+        """Timings of the steps of the last attempt of a run of the thread"""
+        if await ThreadRuns.get_thread_run_by_ids(thread_id, run_id) is None:
+            return None
+        return run_profile(DB.get_run(run_id), DB.get_run_info(run_id) or {})
+
     @staticmethod
     async def get_thread_runs(thread_id: str) -> List[ApiRunStateful]:
         """Get all runs for a given thread ID."""
@@ -139,17 +150,21 @@ class ThreadRuns:
             logger.error(f"Thread with ID {thread_id} has pending runs.")
             raise PendingRunError(f"Thread with ID {thread_id} has pending runs.")
 
-        new_run = _make_run(run_create)
-        run_info = RunInfo(
-            run_id=new_run["run_id"],
-            queued_at=datetime.now(),
-            attempts=0,
-        )
-        new_run["thread_id"] = thread_id
-        DB.create_run(new_run)
-        DB.create_run_info(run_info)
+        with TRACER.span(
+            "run.create", agent_id=run_create.agent_id, thread_id=thread_id
+        ) as span:
+            new_run = _make_run(run_create)
+            new_run["traceparent"] = TRACER.traceparent(span)
+            run_info = RunInfo(
+                run_id=new_run["run_id"],
+                queued_at=datetime.now(),
+                attempts=0,
+            )
+            new_run["thread_id"] = thread_id
+            DB.create_run(new_run)
+            DB.create_run_info(run_info)
 
-        await RUNS_QUEUE.put(new_run["run_id"])
+            await RUNS_QUEUE.put(new_run["run_id"])
 
         return _to_api_model(new_run)
 
@@ -162,25 +177,16 @@ class ThreadRuns:
 
         if run["status"] != "pending":
             # If the run is already completed, return the stored output immediately
+            RETENTION.touch(run_id)
             return _to_api_model(run), DB.get_run_output(run_id)
 
-        # TODO: handle removing cvs when run is completed and there are no more subscribers
         try:
-            async with cvs_pending_run[run_id]:
-                await asyncio.wait_for(
-                    cvs_pending_run[run_id].wait_for(
-                        lambda: DB.get_run_status(run_id) != "pending"
-                    ),
-                    timeout=timeout,
-                )
-                run = DB.get_run(run_id)
-                return _to_api_model(run), DB.get_run_output(run_id)
+            run, output = await COMPLETIONS.wait(run_id, timeout)
+            return _to_api_model(run), output
         except asyncio.TimeoutError:
             logger.warning(f"Timeout reached while waiting for run {run_id}")
             raise TimeoutError
 
-        return None, None
-
     @staticmethod
     async def delete(thread_id: str, run_id: str):
         """Delete a run by thread ID and run ID."""
@@ -204,3 +210,5 @@ class ThreadRuns:
 
         # Delete the run from the database
         DB.delete_run(run_id)
+        RETENTION.forget(run_id)
+        stream_manager.events.forget(run_id)
@@ -0,0 +1,284 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Optional tracing of the runs, enabled with AGWS_TRACING:
+- "otel": spans are created with the OpenTelemetry API, exported as configured
+  for the OpenTelemetry SDK (requires the opentelemetry-api package)
+- "memory": spans are kept in memory, in TRACER.exporter.spans (for tests)
+- "file": spans are appended as JSON lines to AGWS_TRACING_FILE
+
+A run is traced as: run.create (the API request), run.queue, run.execute with
+an agent.step child per step timed by the adapter and run.validate_output, and
+webhook.deliver. The trace context is kept in the "traceparent" of the run
+record (W3C Trace Context), so the phases of a run share its trace.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Literal, Optional, Protocol, Union
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TracingMode = Literal["none", "otel", "memory", "file"]
+
+MEMORY_MAX_SPANS = 10000
+
+
+class Span:
+    """Span of the built-in tracer, exported when ended"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        start_ns: int,
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class MemoryExporter:
+    def __init__(self, max_spans: int = MEMORY_MAX_SPANS):
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, span: Span) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _parse_traceparent(traceparent: str) -> Optional[tuple[str, str]]:
+    parts = traceparent.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+class ActiveSpan:
+    """Span started by the tracer, with the context to restore when it ends"""
+
+    __slots__ = ("span", "token")
+
+    def __init__(self, span: Any, token: Any):
+        self.span = span
+        self.token = token
+
+
+# The parent of a span: a started span, or the traceparent of a remote one
+Parent = Union[ActiveSpan, str, None]
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "agws_current_span", default=None
+)
+
+
+class Tracer:
+    def __init__(self):
+        self.mode: TracingMode = "none"
+        self.exporter: Optional[SpanExporter] = None
+        self._otel = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+    def configure(
+        self, mode: Optional[TracingMode] = None, path: Optional[str] = None
+    ) -> None:
+        """Select the tracing mode, by default from the environment"""
+        mode = mode or os.getenv("AGWS_TRACING") or "none"
+        if mode not in ("none", "otel", "memory", "file"):
+            raise ValueError(
+                f"Invalid AGWS_TRACING {mode}, must be one of: none, otel, memory, file"
+            )
+        self.exporter, self._otel = None, None
+        if mode == "otel":
+            if trace is None:
+                logger.warning(
+                    "AGWS_TRACING=otel requires the opentelemetry-api package, tracing disabled"
+                )
+                mode = "none"
+            else:
+                self._otel = trace.get_tracer("agent_workflow_server")
+        elif mode == "memory":
+            self.exporter = MemoryExporter()
+        elif mode == "file":
+            path = path or os.getenv("AGWS_TRACING_FILE") or "traces.jsonl"
+            self.exporter = FileExporter(path)
+        self.mode = mode
+
+    def start_span(
+        self,
+        name: str,
+        parent: Parent = None,
+        start_ns: Optional[int] = None,
+        current: bool = True,
+        **attributes: Any,
+    ) -> Optional[ActiveSpan]:
+        """Start a span, child of the given parent or else of the current span.
+        If current, it becomes the current span until it ends."""
+        if not self.enabled:
+            return None
+        attributes = {k: v for k, v in attributes.items() if v is not None}
+        if self._otel is not None:
+            return self._start_otel(name, parent, start_ns, current, attributes)
+
+        trace_id, parent_id = None, None
+        if isinstance(parent, ActiveSpan):
+            trace_id, parent_id = parent.span.trace_id, parent.span.span_id
+        elif isinstance(parent, str):
+            trace_id, parent_id = _parse_traceparent(parent) or (None, None)
+        elif _current.get() is not None:
+            trace_id, parent_id = _current.get().trace_id, _current.get().span_id
+        span = Span(
+            name,
+            trace_id or secrets.token_hex(16),
+            parent_id,
+            start_ns or time.time_ns(),
+            attributes,
+        )
+        return ActiveSpan(span, _current.set(span) if current else None)
+
+    def _start_otel(self, name, parent, start_ns, current, attributes) -> ActiveSpan:
+        if isinstance(parent, ActiveSpan):
+            ctx = trace.set_span_in_context(parent.span)
+        elif isinstance(parent, str):
+            ctx = propagate.extract({"traceparent": parent})
+        else:
+            ctx = None
+        span = self._otel.start_span(
+            name, context=ctx, start_time=start_ns, attributes=attributes
+        )
+        token = (
+            otel_context.attach(trace.set_span_in_context(span)) if current else None
+        )
+        return ActiveSpan(span, token)
+
+    def end_span(
+        self,
+        active: Optional[ActiveSpan],
+        error: Optional[BaseException] = None,
+        end_ns: Optional[int] = None,
+    ) -> None:
+        if active is None:
+            return
+        span, token = active.span, active.token
+        active.token = None
+        if self._otel is not None:
+            if error is not None:
+                span.record_exception(error)
+                span.set_status(Status(StatusCode.ERROR, str(error)))
+            span.end(end_time=end_ns)
+            if token is not None:
+                otel_context.detach(token)
+            return
+        if span.end_ns is not None:
+            return
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        span.end_ns = end_ns or time.time_ns()
+        if token is not None:
+            _current.reset(token)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def span(
+        self, name: str, parent: Parent = None, **attributes: Any
+    ) -> Iterator[Optional[ActiveSpan]]:
+        """Trace the block in a span, current in the block"""
+        active = self.start_span(name, parent, **attributes)
+        try:
+            yield active
+        except BaseException as error:
+            self.end_span(active, error)
+            raise
+        self.end_span(active)
+
+    def record(
+        self,
+        name: str,
+        duration_s: float,
+        parent: Parent = None,
+        end_ns: Optional[int] = None,
+        **attributes: Any,
+    ) -> None:
+        """Record a span which already happened, ending now or at end_ns"""
+        if not self.enabled:
+            return
+        end_ns = end_ns or time.time_ns()
+        start_ns = end_ns - int(duration_s * 1e9)
+        active = self.start_span(name, parent, start_ns, current=False, **attributes)
+        self.end_span(active, end_ns=end_ns)
+
+    def traceparent(self, active: Optional[ActiveSpan]) -> Optional[str]:
+        """W3C traceparent of a started span, to propagate its context"""
+        if active is None:
+            return None
+        if self._otel is not None:
+            carrier: Dict[str, str] = {}
+            propagate.inject(carrier, context=trace.set_span_in_context(active.span))
+            return carrier.get("traceparent")
+        return active.span.traceparent
+
+
+TRACER = Tracer()
@@ -2,13 +2,17 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging
-from typing import Any, List
+import time
+from typing import Any, Optional
 
 import jsonschema
 
 from agent_workflow_server.agents.load import AGENTS
-from agent_workflow_server.generated.models.agent_acp_spec_interrupts_inner import (
-    AgentACPSpecInterruptsInner,
+from agent_workflow_server.agents.validators import (
+    AgentValidators,
+    SchemaValidator,
+    compile_validator,
+    validate,
 )
 from agent_workflow_server.generated.models.run_create_stateful import (
     RunCreateStateful,
@@ -16,6 +20,7 @@ from agent_workflow_server.generated.models.run_create_stateful import (
 from agent_workflow_server.generated.models.run_create_stateless import (
     RunCreateStateless,
 )
+from agent_workflow_server.services.metrics import VALIDATION_SECONDS
 from agent_workflow_server.services.utils import check_run_is_interrupted
 from agent_workflow_server.storage.storage import DB
 
@@ -32,6 +37,13 @@ def validate_against_schema(
     instance: Any, schema: dict, error_prefix: str = ""
 ) -> None:
     """Validate an instance against a JSON schema"""
+    validate_with(compile_validator(schema), instance, error_prefix)
+
+
+def validate_with(
+    validator: Optional[SchemaValidator], instance: Any, error_prefix: str = ""
+) -> None:
+    """Validate an instance with a compiled validator (None accepts anything)"""
     # Convert Pydantic models to dict if needed
     if hasattr(instance, "model_dump"):
         # For Pydantic v2
@@ -45,11 +57,14 @@ def validate_against_schema(
         # This is a workaround for the Pydantic v1 issue where the instance is wrapped
         instance = instance.actual_instance
 
+    started_at = time.perf_counter()
     try:
-        jsonschema.validate(instance=instance, schema=schema)
+        validate(validator, instance)
     except jsonschema.ValidationError as e:
         logger.error(f"{error_prefix}: {str(e)}")
         raise InvalidFormatException(f"{error_prefix}: {str(e)}")
+    finally:
+        VALIDATION_SECONDS.observe(time.perf_counter() - started_at)
 
 
 def get_agent_schemas(agent_id: str):
@@ -67,13 +82,19 @@ def get_agent_schemas(agent_id: str):
     }
 
 
+def get_agent_validators(agent_id: str) -> AgentValidators:
+    """Get the validators of an agent, compiled when the agent was loaded"""
+    agent_info = AGENTS.get(agent_id)
+    if agent_info is not None and agent_info.validators is not None:
+        return agent_info.validators
+    return AgentValidators.compile(get_agent_schemas(agent_id))
+
+
 def validate_output(run_id, agent_id: str, output: Any) -> None:
     if output:
-        schemas = get_agent_schemas(agent_id)
-
-        validate_against_schema(
+        validate_with(
+            get_agent_validators(agent_id).output,
             instance=output,
-            schema=schemas["output"],
             error_prefix=f"Output validation failed for run {run_id}",
         )
 
@@ -82,17 +103,17 @@ def validate_run_create(
     run_create: RunCreateStateless | RunCreateStateful,
 ) -> RunCreateStateless | RunCreateStateful:
     """Validate RunCreate input against agent's descriptor schema"""
-    schemas = get_agent_schemas(run_create.agent_id)
-    if schemas["input"] and not run_create.input:
+    validators = get_agent_validators(run_create.agent_id)
+    if validators.input is not None and not run_create.input:
         raise InvalidFormatException('"input" is required for this agent')
-    if schemas["config"] and not run_create.config:
+    if validators.config is not None and not run_create.config:
         raise InvalidFormatException('"config" is required for this agent')
 
     if run_create.input:
-        validate_against_schema(run_create.input, schemas["input"])
+        validate_with(validators.input, run_create.input)
 
     if run_create.config and run_create.config.configurable:
-        validate_against_schema(run_create.config.configurable, schemas["config"])
+        validate_with(validators.config, run_create.config.configurable)
 
     return run_create
 
@@ -102,17 +123,8 @@ def validate_resume_run(run_id: str, body: Any):
     check_run_is_interrupted(run)
 
     interrupt_name = run["interrupt"]["name"]
-    interrupts_schemas: List[AgentACPSpecInterruptsInner] = get_agent_schemas(
-        run["agent_id"]
-    )["interrupts"]
-
-    # Get interrupt_schema given the interrupt_name
-    for interrupt_schema in interrupts_schemas:
-        if interrupt_schema.interrupt_type == interrupt_name:
-            break
-    else:
+    resume_payloads = get_agent_validators(run["agent_id"]).resume_payloads
+    if interrupt_name not in resume_payloads:
         raise ValueError(f"Interrupt {interrupt_name} not found")
 
-    validate_against_schema(
-        body, interrupt_schema.resume_payload, "Resume payload not valid"
-    )
+    validate_with(resume_payloads[interrupt_name], body, "Resume payload not valid")
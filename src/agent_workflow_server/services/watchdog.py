@@ -0,0 +1,145 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+from typing import List, NamedTuple, Optional
+
+from .metrics import LOOP_BLOCKED, LOOP_LAG_SECONDS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_BLOCK_THRESHOLD = 0.5
+# Frames of the blocking call reported, innermost last
+MAX_STACK_FRAMES = 20
+# Last blocked calls kept in WATCHDOG.blocked
+MAX_BLOCKED_CALLS = 100
+
+
+class BlockedCall(NamedTuple):
+    blocked_s: float  # when detected, the call may block longer
+    stack: List[str]
+    run_id: Optional[str]
+    agent_id: Optional[str]
+
+
+def _find_run(frame: Optional[FrameType]) -> tuple[Optional[str], Optional[str]]:
+    """The run processed by the worker whose stack holds the frame"""
+    while frame is not None:
+        if (
+            frame.f_code.co_name == "worker"
+            and frame.f_globals.get("__name__")
+            == "agent_workflow_server.services.queue"
+        ):
+            run = frame.f_locals.get("run")
+            if isinstance(run, dict):
+                return run.get("run_id"), run.get("agent_id")
+        frame = frame.f_back
+    return None, None
+
+
+class LoopWatchdog:
+    """Measures the lag of the event loop, and reports the calls blocking it.
+
+    A task on the loop sleeps for `interval` and measures how late it wakes up.
+    A thread checks that the task keeps running: when it has not run for longer
+    than `threshold`, the stack of the loop thread is captured, showing the
+    blocking call and, if it is executing a run, its agent. Each blocked call
+    is logged once, and counted when the loop resumes.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        threshold: float = DEFAULT_BLOCK_THRESHOLD,
+    ):
+        self.interval = interval
+        self.threshold = threshold  # 0 only measures the lag
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.blocked: List[BlockedCall] = []
+        self._beat = time.monotonic()
+        self._reported: Optional[BlockedCall] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stopped = threading.Event()
+
+    def configure(self) -> None:
+        """Read the settings from the environment"""
+        self.interval = float(
+            os.getenv("AGWS_LOOP_WATCHDOG_INTERVAL", DEFAULT_INTERVAL)
+        )
+        self.threshold = float(
+            os.getenv("AGWS_LOOP_BLOCK_THRESHOLD", DEFAULT_BLOCK_THRESHOLD)
+        )
+
+    async def run(self) -> None:
+        """Measure the lag until cancelled"""
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        if self.threshold > 0:
+            threading.Thread(
+                target=self._monitor, name="agws-loop-watchdog", daemon=True
+            ).start()
+        try:
+            while True:
+                started_at = loop.time()
+                self._beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self.lag = max(0.0, loop.time() - started_at - self.interval)
+                self.max_lag = max(self.max_lag, self.lag)
+                LOOP_LAG_SECONDS.observe(self.lag)
+                reported, self._reported = self._reported, None
+                if reported is not None:
+                    self.blocked.append(reported)
+                    del self.blocked[:-MAX_BLOCKED_CALLS]
+                    LOOP_BLOCKED.inc(reported.agent_id or "")
+        finally:
+            self._stopped.set()
+
+    def _monitor(self) -> None:
+        beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            blocked_s = time.monotonic() - self._beat - self.interval
+            # Reported once per blocked call, the beat changes when it returns
+            if blocked_s > self.threshold and self._beat != beat:
+                beat = self._beat
+                self._report(blocked_s)
+
+    def _report(self, blocked_s: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame)[-MAX_STACK_FRAMES:]
+        run_id, agent_id = _find_run(frame)
+        self._reported = BlockedCall(blocked_s, stack, run_id, agent_id)
+        where = f" executing run {run_id} of agent {agent_id}" if run_id else ""
+        logger.warning(
+            f"Event loop blocked for {blocked_s:.3f}s{where}, by:\n{''.join(stack)}"
+        )
+
+
+WATCHDOG = LoopWatchdog()
+
+REGISTRY.callback(
+    "agws_loop_max_lag_seconds",
+    "Longest delay of the event loop measured",
+    lambda: WATCHDOG.max_lag,
+)
+
+
+async def start_watchdog() -> None:
+    WATCHDOG.configure()
+    if WATCHDOG.interval <= 0:
+        return
+    logger.info(
+        f"Starting event loop watchdog (blocking threshold {WATCHDOG.threshold}s)"
+    )
+    await WATCHDOG.run()
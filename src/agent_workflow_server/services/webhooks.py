@@ -0,0 +1,289 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import logging
+import os
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+from .metrics import REGISTRY, WEBHOOK_SECONDS
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = 8
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_S = 0.5
+DEFAULT_TIMEOUT_S = 10.0
+DEFAULT_BATCH_SIZE = 100
+
+# Responses worth retrying, other errors are final
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class Delivery(NamedTuple):
+    target: str  # what is delivered, for logging: "run <ID>" or "<N> runs"
+    url: str
+    payload: bytes
+    traceparent: Optional[str] = None  # trace context of the run
+
+
+class WebhookDispatcher:
+    """Delivers webhook calls in the background, off the run hot path.
+
+    Deliveries are put in one of several bounded queues, chosen by run ID, each
+    drained by its own task: the calls of a run are made in order, while the
+    calls of different runs proceed concurrently. The tasks share a long-lived
+    client: its pool holds at most a connection per task, whatever the number of
+    hosts called, and idle connections expire. Failed calls are retried with
+    exponential backoff.
+
+    In batched mode (a batch window > 0), calls to the same URL are coalesced
+    into a single call with a JSON array of runs, sent once the window elapsed
+    since the first call of the batch or the batch is full. A run appears once
+    in a batch, with its latest status. A batch is delivered in the trace of
+    its first run.
+
+    The tasks and client belong to the event loop the dispatcher was started
+    in, and are started again if used from another loop.
+    """
+
+    def __init__(
+        self,
+        shards: int = DEFAULT_SHARDS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_s: float = DEFAULT_BACKOFF_S,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        batch_window_s: float = 0.0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.shards = shards
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.timeout_s = timeout_s
+        self.batch_window_s = batch_window_s
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.failed = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._http: Optional[httpx.AsyncClient] = None
+        # Payloads and trace contexts of the pending batch of each URL, by run ID
+        self._batches: Dict[str, Dict[str, Tuple[bytes, Optional[str]]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+
+    @property
+    def batched(self) -> bool:
+        return self.batch_window_s > 0
+
+    def configure(self) -> None:
+        """Read the settings from the environment"""
+        self.shards = int(os.getenv("AGWS_WEBHOOK_WORKERS", DEFAULT_SHARDS))
+        self.queue_size = int(os.getenv("AGWS_WEBHOOK_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        self.max_attempts = int(
+            os.getenv("AGWS_WEBHOOK_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+        )
+        self.backoff_s = float(os.getenv("AGWS_WEBHOOK_BACKOFF", DEFAULT_BACKOFF_S))
+        self.timeout_s = float(os.getenv("AGWS_WEBHOOK_TIMEOUT", DEFAULT_TIMEOUT_S))
+        self.batch_window_s = float(os.getenv("AGWS_WEBHOOK_BATCH_WINDOW") or 0.0)
+        self.batch_size = int(
+            os.getenv("AGWS_WEBHOOK_BATCH_SIZE") or DEFAULT_BATCH_SIZE
+        )
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Tasks and client of a previous (closed) loop cannot be reused
+        self._loop = loop
+        self._http = None
+        self._batches, self._flush_handles = {}, {}
+        self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.shards)]
+        self._tasks = [loop.create_task(self._drain(queue)) for queue in self._queues]
+
+    def enqueue(
+        self, run_id: str, url: str, payload: bytes, traceparent: Optional[str] = None
+    ) -> bool:
+        """Queue a webhook call without waiting for it. Returns False if the
+        queue of the run is full and the call was dropped."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._start(loop)
+        if self.batched:
+            self._add_to_batch(loop, run_id, url, payload, traceparent)
+            return True
+        return self._put(run_id, Delivery(f"run {run_id}", url, payload, traceparent))
+
+    def _put(self, key: str, delivery: Delivery) -> bool:
+        queue = self._queues[zlib.crc32(key.encode()) % len(self._queues)]
+        try:
+            queue.put_nowait(delivery)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(
+                f"Webhook queue full, dropping webhook call for {delivery.target}"
+            )
+            return False
+        return True
+
+    def _add_to_batch(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        run_id: str,
+        url: str,
+        payload: bytes,
+        traceparent: Optional[str],
+    ) -> None:
+        batch = self._batches.setdefault(url, {})
+        # The previous status of the run is superseded, the latest one is sent
+        # in the order it happened
+        batch.pop(run_id, None)
+        batch[run_id] = (payload, traceparent)
+        if len(batch) >= self.batch_size:
+            self._flush(url)
+        elif url not in self._flush_handles:
+            self._flush_handles[url] = loop.call_later(
+                self.batch_window_s, self._flush, url
+            )
+
+    def _flush(self, url: str) -> None:
+        handle = self._flush_handles.pop(url, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._batches.pop(url, None)
+        if not batch:
+            return
+        payload = b"[" + b",".join(payload for payload, _ in batch.values()) + b"]"
+        _, traceparent = next(iter(batch.values()))
+        delivery = Delivery(f"{len(batch)} runs", url, payload, traceparent)
+        # Batches of a URL go to the same queue, which keeps them in order
+        if not self._put(url, delivery):
+            # The delivery counted once as dropped, count each run
+            self.dropped += len(batch) - 1
+
+    def flush(self) -> None:
+        """Send the pending batches now"""
+        for url in list(self._batches):
+            self._flush(url)
+
+    async def join(self) -> None:
+        """Wait until all the queued calls are delivered (or failed), sending the
+        pending batches"""
+        self.flush()
+        for queue in list(self._queues):
+            await queue.join()
+
+    async def aclose(self, timeout: float = DEFAULT_TIMEOUT_S) -> None:
+        """Send the pending batches and wait, up to `timeout` seconds, for the
+        queued calls to be delivered, then stop the delivery tasks and close the
+        client. The calls still queued are dropped."""
+        if self._loop is asyncio.get_running_loop():
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                queued = sum(queue.qsize() for queue in self._queues)
+                logger.warning(
+                    f"Webhook calls not delivered within {timeout}s on close, dropping {queued} queued calls"
+                )
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._http is not None:
+            await self._http.aclose()
+        self._loop, self._http = None, None
+        self._queues, self._tasks = [], []
+        self._batches, self._flush_handles = {}, {}
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            # Each task makes one call at a time
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout_s,
+                headers={"Content-Type": "application/json"},
+                limits=httpx.Limits(
+                    max_connections=self.shards,
+                    max_keepalive_connections=self.shards,
+                ),
+            )
+        return self._http
+
+    async def _drain(self, queue: asyncio.Queue) -> None:
+        while True:
+            delivery = await queue.get()
+            try:
+                with TRACER.span(
+                    "webhook.deliver",
+                    delivery.traceparent,
+                    url=delivery.url,
+                    target=delivery.target,
+                ) as span:
+                    await self._deliver(delivery, TRACER.traceparent(span))
+            except Exception:
+                logger.exception(f"Error calling webhook for {delivery.target}")
+            finally:
+                queue.task_done()
+
+    async def _deliver(
+        self, delivery: Delivery, traceparent: Optional[str] = None
+    ) -> None:
+        # The webhook receives the trace context of the call
+        headers = {"traceparent": traceparent} if traceparent else None
+        for attempt in range(1, self.max_attempts + 1):
+            started_at = time.perf_counter()
+            try:
+                response = await self._client().post(
+                    delivery.url, content=delivery.payload, headers=headers
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    logger.info(f"Webhook called successfully for {delivery.target}")
+                    return
+                error = f"status {response.status_code}"
+            except httpx.RequestError as e:
+                error = str(e) or type(e).__name__
+            except httpx.HTTPStatusError as e:
+                self.failed += 1
+                logger.error(f"Error calling webhook for {delivery.target}: {e}")
+                return
+            finally:
+                WEBHOOK_SECONDS.observe(time.perf_counter() - started_at)
+
+            if attempt < self.max_attempts:
+                delay = self.backoff_s * 2 ** (attempt - 1)
+                logger.warning(
+                    f"Error calling webhook for {delivery.target} ({error}), retrying in {delay}s"
+                )
+                await asyncio.sleep(delay)
+            else:
+                self.failed += 1
+                logger.error(
+                    f"Error calling webhook for {delivery.target} after {attempt} attempts: {error}"
+                )
+
+
+WEBHOOKS = WebhookDispatcher()
+
+REGISTRY.callback(
+    "agws_webhooks_queued",
+    "Webhook calls waiting to be delivered",
+    lambda: sum(queue.qsize() for queue in WEBHOOKS._queues),
+)
+REGISTRY.callback(
+    "agws_webhooks_dropped_total",
+    "Webhook calls dropped, queues full",
+    lambda: WEBHOOKS.dropped,
+    type="counter",
+)
+REGISTRY.callback(
+    "agws_webhooks_failed_total",
+    "Webhook calls failed after all their attempts",
+    lambda: WEBHOOKS.failed,
+    type="counter",
+)
@@ -0,0 +1,112 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator, List, Tuple
+
+from .records import encode_frame, read_frames, restore_fields
+
+logger = logging.getLogger(__name__)
+
+JournalRecord = Tuple[str, str, str, Any]
+
+
+def read_journal(path: str) -> Iterator[JournalRecord]:
+    """Read the records of a journal file. A crash while writing may leave a
+    truncated last record, which is ignored."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for op, table, key, value in read_frames(f):
+            yield op, table, key, restore_fields(table, value)
+
+
+class Journal:
+    """Append-only journal of database changes. Records are serialized on `append`
+    and written in batches (then fsynced) by a background thread, which also
+    periodically checkpoints the database into a snapshot and truncates the journal."""
+
+    def __init__(
+        self,
+        path: str,
+        take_state: Callable[[], Any],
+        write_snapshot: Callable[[Any], None],
+        flush_interval: float = 1.0,
+        compact_interval: float = 300.0,
+    ):
+        self.path = path
+        self._take_state = take_state
+        self._write_snapshot = write_snapshot
+        self._flush_interval = flush_interval
+        self._compact_interval = compact_interval
+
+        self._buffer: List[bytes] = []
+        self._buffer_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="agws-journal", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, record: JournalRecord) -> None:
+        """Queue a record to be written. Never blocks on disk."""
+        data = encode_frame(record)
+        with self._buffer_lock:
+            self._buffer.append(data)
+
+    def _write(self, buffer: List[bytes]) -> None:
+        if buffer:
+            self._file.write(b"".join(buffer))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def flush(self) -> None:
+        """Write and fsync the pending records"""
+        with self._io_lock:
+            with self._buffer_lock:
+                buffer, self._buffer = self._buffer, []
+            self._write(buffer)
+
+    def checkpoint(self) -> None:
+        """Write a snapshot of the database and truncate the journal.
+
+        The state is captured under the buffer lock, so that every change whose record
+        was appended before is part of it. Changes made while the snapshot is written
+        are appended to the buffer and land in the truncated journal. Records are
+        idempotent, so a change both in the snapshot and in the journal is harmless."""
+        with self._io_lock:
+            with self._buffer_lock:
+                buffer, self._buffer = self._buffer, []
+                state = self._take_state()
+            # Keep the journal complete until the snapshot is in place
+            self._write(buffer)
+            self._write_snapshot(state)
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _run(self) -> None:
+        last_checkpoint = time.monotonic()
+        while not self._stop.wait(self._flush_interval):
+            try:
+                if time.monotonic() - last_checkpoint >= self._compact_interval:
+                    self.checkpoint()
+                    last_checkpoint = time.monotonic()
+                    logger.debug("Database journal %s compacted", self.path)
+                else:
+                    self.flush()
+            except Exception as e:
+                logger.error("Failed to write database journal: %s", str(e))
+
+    def close(self) -> None:
+        """Stop the background thread and write the pending records"""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
@@ -36,6 +36,8 @@ class Run(TypedDict):
     updated_at: datetime
     status: RunStatus
     interrupt: Optional[Interrupt]  # last interrupt (if any)
+    resume_pending: Optional[bool]  # resumed, and its first attempt not started
+    traceparent: Optional[str]  # trace context of the run, when traced
 
 
 class RunInfo(TypedDict):
@@ -48,6 +50,10 @@ class RunInfo(TypedDict):
     ended_at: Optional[datetime]
     exec_s: Optional[float]
     queue_s: Optional[float]
+    pool: Optional[str]  # worker pool of the last attempt
+    pool_utilization: Optional[float]  # share of busy workers of the pool at start
+    # Count, total_s and max_s by step name, of the last attempt
+    step_totals: Optional[Dict[str, Dict[str, float]]]
 
 
 class Thread(TypedDict):
@@ -0,0 +1,84 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import struct
+from datetime import datetime
+from typing import Any, BinaryIO, Iterator, Set, Tuple
+
+import pydantic_core
+
+logger = logging.getLogger(__name__)
+
+# Each record is a JSON document prefixed by its length
+FRAME_HEADER = struct.Struct(">I")
+
+# Record fields holding datetimes, which JSON stores as ISO strings
+DATETIME_FIELDS = {
+    "runs": ("created_at", "updated_at"),
+    "runs_info": ("queued_at",),
+    "threads": ("created_at", "updated_at"),
+}
+
+
+# Types stored as their str(), warned about once
+_STRINGIFIED_TYPES: Set[type] = set()
+
+
+def _stringify(value: Any) -> str:
+    value_type = type(value)
+    if value_type not in _STRINGIFIED_TYPES:
+        _STRINGIFIED_TYPES.add(value_type)
+        logger.warning(
+            f"Storing values of type {value_type.__qualname__} as strings: they are not JSON serializable"
+        )
+    return str(value)
+
+
+def encode_frame(obj: Any) -> bytes:
+    """Encode an object as a length-prefixed JSON record.
+
+    JSON values (dicts with str keys, lists, str, int, float, bool, None) are
+    decoded as they are, and the datetimes of DATETIME_FIELDS are restored by
+    restore_fields. Other types supported by pydantic are decoded as their JSON
+    form: tuples and sets as lists, models and dataclasses as dicts, datetimes
+    (outside of DATETIME_FIELDS), UUIDs and bytes as strings. Any other type is
+    stored as its str(), with a warning.
+    """
+    data = pydantic_core.to_json(obj, fallback=_stringify)
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def decode_frame(buffer: bytes | memoryview, offset: int) -> Tuple[Any, int]:
+    """Decode the record at the given offset, returning it and the next offset"""
+    (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+    start = offset + FRAME_HEADER.size
+    if start + length > len(buffer):
+        raise EOFError("Truncated record")
+    return (
+        pydantic_core.from_json(buffer[start : start + length], cache_strings="keys"),
+        start + length,
+    )
+
+
+def read_frames(f: BinaryIO) -> Iterator[Any]:
+    """Read the records of a file, stopping at the first incomplete one"""
+    while True:
+        header = f.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        (length,) = FRAME_HEADER.unpack(header)
+        data = f.read(length)
+        if len(data) < length:
+            return
+        yield pydantic_core.from_json(data)
+
+
+def restore_fields(table: str, record: Any) -> Any:
+    """Restore the datetime fields of a (partial) record decoded from JSON"""
+    if isinstance(record, dict):
+        for field in DATETIME_FIELDS.get(table, ()):
+            value = record.get(field)
+            if isinstance(value, str):
+                record[field] = datetime.fromisoformat(value)
+    return record
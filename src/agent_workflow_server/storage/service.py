@@ -2,13 +2,181 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Literal, Mapping, Optional, Tuple
 
 from .models import Run, RunInfo, RunStatus, Thread
+from .records import encode_frame
+from .snapshot import LazyRecord
+
+# Fields (or combinations of fields) of the records that are hash indexed
+RUN_INDEXES: Tuple[Tuple[str, ...], ...] = (
+    ("thread_id",),
+    ("agent_id",),
+    ("status",),
+    ("thread_id", "status"),
+)
+THREAD_INDEXES: Tuple[Tuple[str, ...], ...] = (("status",),)
+
+ChangeOp = Literal["set", "patch", "delete"]
+
+
+def apply_change(
+    tables: Dict[str, Dict[str, Any]],
+    op: ChangeOp,
+    table: str,
+    key: str,
+    value: Any = None,
+) -> None:
+    """Apply a change recorded by DBOperations._record_change to the given tables"""
+    records = tables[table]
+    if op == "set":
+        records[key] = value
+    elif op == "patch":
+        if key in records:
+            records[key].update(value)
+    elif op == "delete":
+        if key in records:
+            del records[key]
+    else:
+        raise ValueError(f"Unknown change operation {op}")
+
+
+class HashIndex:
+    """Hash index mapping the values of one or more record fields to the IDs of
+    the records holding them. Postings are insertion-ordered dicts used as sets."""
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self._postings: Dict[Tuple, Dict[str, None]] = {}
+
+    def key(self, record: Mapping[str, Any]) -> Optional[Tuple]:
+        """Return the index key of a record, or None if it cannot be indexed"""
+        try:
+            key = tuple(record[field] for field in self.fields)
+            hash(key)
+        except (KeyError, TypeError):
+            return None
+        return key
+
+    def covers(self, updates: Mapping[str, Any]) -> bool:
+        """Whether updating these fields may change the index key of a record"""
+        for field in self.fields:
+            if field in updates:
+                return True
+        return False
+
+    def add(self, record_id: str, record: Mapping[str, Any]) -> None:
+        self._add_key(record_id, self.key(record))
+
+    def remove(self, record_id: str, record: Mapping[str, Any]) -> None:
+        self._remove_key(record_id, self.key(record))
+
+    def move(
+        self, record_id: str, old_key: Optional[Tuple], record: Mapping[str, Any]
+    ) -> None:
+        """Re-index a record updated in place, given its key before the update"""
+        key = self.key(record)
+        if key != old_key:
+            self._remove_key(record_id, old_key)
+            self._add_key(record_id, key)
+
+    def _add_key(self, record_id: str, key: Optional[Tuple]) -> None:
+        if key is not None:
+            self._postings.setdefault(key, {})[record_id] = None
+
+    def _remove_key(self, record_id: str, key: Optional[Tuple]) -> None:
+        if key is None:
+            return
+        posting = self._postings.get(key)
+        if posting is not None:
+            posting.pop(record_id, None)
+            if not posting:
+                del self._postings[key]
+
+    def lookup(self, filters: Mapping[str, Any]) -> Optional[Dict[str, None]]:
+        """Return the posting matching the filters, or None if the index does not apply"""
+        if not all(field in filters for field in self.fields):
+            return None
+        key = tuple(filters[field] for field in self.fields)
+        try:
+            return self._postings.get(key, {})
+        except TypeError:
+            # Unhashable filter value, cannot be answered by the index
+            return None
+
+
+def _build_indexes(
+    fields_list: Iterable[Tuple[str, ...]], records: Dict[str, Mapping[str, Any]]
+) -> List[HashIndex]:
+    indexes = [HashIndex(fields) for fields in fields_list]
+    for record_id, record in records.items():
+        for index in indexes:
+            index.add(record_id, record)
+    return indexes
+
+
+def _patch(
+    record_id: str,
+    record: Dict[str, Any],
+    updates: Mapping[str, Any],
+    indexes: List[HashIndex],
+) -> None:
+    """Update a record in place, re-indexing it only for the updated fields"""
+    stale = [(index, index.key(record)) for index in indexes if index.covers(updates)]
+    if updates is not record:
+        record.update(updates)
+    for index, old_key in stale:
+        index.move(record_id, old_key, record)
+
+
+def _matches(record: Mapping[str, Any], filters: Mapping[str, Any]) -> bool:
+    for key, value in filters.items():
+        if key not in record or record[key] != value:
+            return False
+    return True
+
+
+def _search(
+    records: Dict[str, Any], indexes: List[HashIndex], filters: Mapping[str, Any]
+) -> List[Any]:
+    """Search records by filters, scanning only the smallest matching index posting.
+    Every candidate is checked against all the filters, which intersects the postings
+    of the other indexes (and covers the non-indexed filters)."""
+    candidates = None
+    for index in indexes:
+        posting = index.lookup(filters)
+        if posting is not None and (
+            candidates is None or len(posting) < len(candidates)
+        ):
+            candidates = posting
+            if not candidates:
+                return []
+
+    results = []
+    if candidates is None:
+        # No index applies, fall back to a full scan
+        for record in records.values():
+            if _matches(record, filters):
+                results.append(record)
+        return results
+
+    for record_id in candidates:
+        record = records.get(record_id)
+        if record is not None and _matches(record, filters):
+            results.append(record)
+    return results
 
 
 class DBOperations:
-    """CRUD operations for Runs"""
+    """CRUD operations for Runs
+
+    The records returned by the getters are snapshots: depending on the backend,
+    the stored record itself (updated in place by later updates) or a copy.
+    Callers must not rely on either: a fetched record must not be modified to
+    change the stored state, changes are stored with the update_* methods. Each
+    Run and Thread has a version, incremented on every update, that can be used
+    to detect changes without comparing records.
+    """
 
     def __init__(
         self,
@@ -21,6 +189,24 @@ class DBOperations:
         self._runs_info: Dict[str, RunInfo] = runs_info
         self._runs_output: Dict[str, Any] = runs_output
         self._threads: Dict[str, Thread] = threads
+        self._runs_indexes: List[HashIndex] = _build_indexes(RUN_INDEXES, runs)
+        self._threads_indexes: List[HashIndex] = _build_indexes(THREAD_INDEXES, threads)
+        self._runs_versions: Dict[str, int] = dict.fromkeys(runs, 1)
+        self._threads_versions: Dict[str, int] = dict.fromkeys(threads, 1)
+
+    def _record_change(
+        self,
+        op: ChangeOp,
+        table: str,
+        key: str,
+        value: Any = None,
+        updated_at: Optional[datetime] = None,
+    ) -> None:
+        """Called after every change to a table, with the new record ("set"), the
+        updated fields ("patch") or nothing ("delete"). The updated_at set by a
+        patch is passed apart from its fields, so that nothing is allocated unless
+        the change is journaled."""
+        pass
 
     def create_run(self, run: Run) -> Run:
         """Create a new Run"""
@@ -28,6 +214,10 @@ class DBOperations:
         if run_id in self._runs:
             raise ValueError(f"Run with ID {run_id} already exists")
         self._runs[run_id] = run
+        self._runs_versions[run_id] = 1
+        for index in self._runs_indexes:
+            index.add(run_id, run)
+        self._record_change("set", "runs", run_id, run)
         return run
 
     def get_run(self, run_id: str) -> Optional[Run]:
@@ -38,38 +228,40 @@ class DBOperations:
         """List all Runs"""
         return list(self._runs.values())
 
+    def get_run_version(self, run_id: str) -> Optional[int]:
+        """Get the version of a Run, incremented on every update"""
+        return self._runs_versions.get(run_id)
+
     def update_run(self, run_id: str, updates: dict) -> Optional[Run]:
-        """Update a Run with the given updates"""
-        if run_id not in self._runs:
+        """Update a Run in place with the given updates"""
+        run = self._runs.get(run_id)
+        if run is None:
             return None
-        run = self._runs[run_id]
-        updated_run = {**run, **updates, "updated_at": datetime.now()}
-        self._runs[run_id] = updated_run
-        return updated_run
+        _patch(run_id, run, updates, self._runs_indexes)
+        run["updated_at"] = updated_at = datetime.now()
+        self._runs_versions[run_id] = self._runs_versions.get(run_id, 0) + 1
+        self._record_change("patch", "runs", run_id, updates, updated_at)
+        return run
 
     def delete_run(self, run_id: str) -> bool:
         """Delete a Run and its associated info and output"""
         if run_id not in self._runs:
             return False
-        del self._runs[run_id]
+        run = self._runs.pop(run_id)
+        self._runs_versions.pop(run_id, None)
+        for index in self._runs_indexes:
+            index.remove(run_id, run)
         if run_id in self._runs_info:
             del self._runs_info[run_id]
         if run_id in self._runs_output:
             del self._runs_output[run_id]
+        for table in ("runs", "runs_info", "runs_output"):
+            self._record_change("delete", table, run_id)
         return True
 
     def search_run(self, filters: dict) -> List[Run]:
         """Search Runs by filters"""
-        results = []
-        for run in self._runs.values():
-            matches = True
-            for key, value in filters.items():
-                if key not in run or run[key] != value:
-                    matches = False
-                    break
-            if matches:
-                results.append(run)
-        return results
+        return _search(self._runs, self._runs_indexes, filters)
 
     def get_run_status(self, run_id: str) -> Optional[RunStatus]:
         """Get the status of a Run"""
@@ -83,15 +275,27 @@ class DBOperations:
     def add_run_output(self, run_id: str, output: Any) -> None:
         """Add the output of a Run"""
         self._runs_output[run_id] = output
+        self._record_change("set", "runs_output", run_id, output)
 
     def get_run_output(self, run_id: str) -> Optional[Any]:
         """Get the output of a Run"""
         return self._runs_output.get(run_id)
 
+    def get_run_output_size(self, run_id: str) -> Optional[int]:
+        """Get the size in bytes of the serialized output of a Run"""
+        if run_id not in self._runs_output:
+            return None
+        # Read the raw value, not to load outputs paged out of a snapshot
+        output = dict.__getitem__(self._runs_output, run_id)
+        if isinstance(output, LazyRecord):
+            return output.length
+        return len(encode_frame(output))
+
     def create_run_info(self, run_info: RunInfo) -> RunInfo:
         """Create a new Run info in the database"""
         run_id = str(run_info["run_id"])
         self._runs_info[run_id] = run_info
+        self._record_change("set", "runs_info", run_id, run_info)
         return run_info
 
     def get_run_info(self, run_id: str) -> Optional[RunInfo]:
@@ -108,16 +312,18 @@ class DBOperations:
         if run_id not in self._runs_info:
             return False
         del self._runs_info[run_id]
+        self._record_change("delete", "runs_info", run_id)
         return True
 
     def update_run_info(self, run_id: str, updates: dict) -> Optional[RunInfo]:
-        """Update a Run info"""
-        if run_id not in self._runs_info:
+        """Update a Run info in place"""
+        run_info = self._runs_info.get(run_id)
+        if run_info is None:
             return None
-        run_info = self._runs_info[run_id]
-        updated_run_info = {**run_info, **updates}
-        self._runs_info[run_id] = updated_run_info
-        return updated_run_info
+        if updates is not run_info:
+            run_info.update(updates)
+        self._record_change("patch", "runs_info", run_id, updates)
+        return run_info
 
     def create_thread(self, thread: Thread) -> Thread:
         """Create a new Thread"""
@@ -125,6 +331,10 @@ class DBOperations:
         if thread_id in self._threads:
             raise ValueError(f"Thread with ID {thread_id} already exists")
         self._threads[thread_id] = thread
+        self._threads_versions[thread_id] = 1
+        for index in self._threads_indexes:
+            index.add(thread_id, thread)
+        self._record_change("set", "threads", thread_id, thread)
         return thread
 
     def get_thread(self, thread_id: str) -> Optional[Thread]:
@@ -135,31 +345,32 @@ class DBOperations:
         """List all Threads"""
         return list(self._threads.values())
 
+    def get_thread_version(self, thread_id: str) -> Optional[int]:
+        """Get the version of a Thread, incremented on every update"""
+        return self._threads_versions.get(thread_id)
+
     def update_thread(self, thread_id: str, updates: dict) -> Optional[Thread]:
-        """Update a Thread with the given updates"""
-        if thread_id not in self._threads:
+        """Update a Thread in place with the given updates"""
+        thread = self._threads.get(thread_id)
+        if thread is None:
             return None
-        thread = self._threads[thread_id]
-        updated_thread = {**thread, **updates, "updated_at": datetime.now()}
-        self._threads[thread_id] = updated_thread
-        return updated_thread
+        _patch(thread_id, thread, updates, self._threads_indexes)
+        thread["updated_at"] = updated_at = datetime.now()
+        self._threads_versions[thread_id] = self._threads_versions.get(thread_id, 0) + 1
+        self._record_change("patch", "threads", thread_id, updates, updated_at)
+        return thread
 
     def delete_thread(self, thread_id: str) -> bool:
         """Delete a Thread"""
         if thread_id not in self._threads:
             return False
-        del self._threads[thread_id]
+        thread = self._threads.pop(thread_id)
+        self._threads_versions.pop(thread_id, None)
+        for index in self._threads_indexes:
+            index.remove(thread_id, thread)
+        self._record_change("delete", "threads", thread_id)
         return True
 
     def search_thread(self, filters: dict) -> List[Thread]:
         """Search Threads by filters"""
-        results = []
-        for thread in self._threads.values():
-            matches = True
-            for key, value in filters.items():
-                if key not in thread or thread[key] != value:
-                    matches = False
-                    break
-            if matches:
-                results.append(thread)
-        return results
+        return _search(self._threads, self._threads_indexes, filters)
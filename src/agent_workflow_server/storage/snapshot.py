@@ -0,0 +1,157 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import gc
+import mmap
+import os
+import struct
+from typing import Any, Dict, Tuple
+
+import pydantic_core
+
+from .records import decode_frame, encode_frame, restore_fields
+
+# File layout:
+#   MAGIC
+#   chunks [table, [[key, value], ...]] of runs, runs_info and threads
+#   records [table, key, value] of runs_output
+#   index (JSON): offset of the runs_output section and of each output record
+#   index offset (8 bytes) + MAGIC
+MAGIC = b"AGWSNAP1"
+FOOTER = struct.Struct(">Q")
+CHUNK_SIZE = 1024
+
+EAGER_TABLES = ("runs", "runs_info", "threads")
+LAZY_TABLE = "runs_output"
+
+
+class _MappedFile:
+    """Read-only memory map of a snapshot, closed when no record refers to it"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __del__(self):
+        self.mmap.close()
+
+
+class LazyRecord:
+    """Reference to a record of a memory-mapped snapshot, decoded on access"""
+
+    __slots__ = ("_file", "offset", "length")
+
+    def __init__(self, file: _MappedFile, offset: int, length: int):
+        self._file = file
+        self.offset = offset
+        self.length = length
+
+    def raw(self) -> bytes:
+        return self._file.mmap[self.offset : self.offset + self.length]
+
+    def load(self) -> Any:
+        (_table, _key, value), _ = decode_frame(self._file.mmap, self.offset)
+        return value
+
+
+class LazyDict(dict):
+    """Dict whose values may be LazyRecords, loaded (and cached) when accessed.
+    Copying it with dict() keeps the references, without loading them."""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, LazyRecord):
+            value = value.load()
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *args):
+        value = super().pop(key, *args)
+        return value.load() if isinstance(value, LazyRecord) else value
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+def is_snapshot(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_snapshot(path: str, tables: Dict[str, Dict[str, Any]]) -> None:
+    """Stream the tables to a snapshot file, one record at a time"""
+    offsets: Dict[str, Tuple[int, int]] = {}
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for table in EAGER_TABLES:
+            chunk = []
+            for item in tables.get(table, {}).items():
+                chunk.append(item)
+                if len(chunk) == CHUNK_SIZE:
+                    f.write(encode_frame((table, chunk)))
+                    chunk = []
+            if chunk:
+                f.write(encode_frame((table, chunk)))
+
+        lazy_offset = f.tell()
+        # Copy the raw bytes of records that were never loaded
+        for key, value in dict.items(tables.get(LAZY_TABLE, {})):
+            data = (
+                value.raw()
+                if isinstance(value, LazyRecord)
+                else encode_frame((LAZY_TABLE, key, value))
+            )
+            offsets[key] = (f.tell(), len(data))
+            f.write(data)
+
+        index_offset = f.tell()
+        f.write(
+            pydantic_core.to_json({"lazy_offset": lazy_offset, LAZY_TABLE: offsets})
+        )
+        f.write(FOOTER.pack(index_offset) + MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_snapshot(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load the runs, runs info and threads of a snapshot file. Runs outputs are
+    memory-mapped and only decoded when accessed."""
+    # Loading allocates millions of long-lived objects, which would trigger
+    # many useless collections of the young generations
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _read_snapshot(path)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _read_snapshot(path: str) -> Dict[str, Dict[str, Any]]:
+    file = _MappedFile(path)
+    buffer = file.mmap
+    footer_offset = len(buffer) - FOOTER.size - len(MAGIC)
+    if buffer[: len(MAGIC)] != MAGIC or buffer[footer_offset + FOOTER.size :] != MAGIC:
+        raise ValueError(f"{path} is not a valid snapshot")
+    (index_offset,) = FOOTER.unpack_from(buffer, footer_offset)
+    index = pydantic_core.from_json(buffer[index_offset:footer_offset])
+
+    tables: Dict[str, Dict[str, Any]] = {table: {} for table in EAGER_TABLES}
+    offset = len(MAGIC)
+    while offset < index["lazy_offset"]:
+        (table, chunk), offset = decode_frame(buffer, offset)
+        records = tables[table]
+        for key, value in chunk:
+            records[key] = restore_fields(table, value)
+
+    tables[LAZY_TABLE] = LazyDict(
+        (key, LazyRecord(file, start, size))
+        for key, (start, size) in index[LAZY_TABLE].items()
+    )
+    return tables
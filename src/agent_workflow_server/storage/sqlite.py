@@ -0,0 +1,315 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import atexit
+import logging
+import pickle
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, List, Optional
+
+from .models import Run, RunInfo, RunStatus, Thread
+from .service import DBOperations, _matches
+
+logger = logging.getLogger(__name__)
+
+# Record fields stored in their own (indexed) columns, besides the pickled record
+RUN_COLUMNS = ("thread_id", "agent_id", "status")
+THREAD_COLUMNS = ("status",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    agent_id TEXT,
+    status TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_thread_id_status ON runs (thread_id, status);
+CREATE INDEX IF NOT EXISTS idx_runs_agent_id ON runs (agent_id);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status);
+CREATE TABLE IF NOT EXISTS runs_info (
+    run_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs_output (
+    run_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    status TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_status ON threads (status);
+"""
+
+
+def _dumps(record: Any) -> bytes:
+    return pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data: Optional[bytes]) -> Any:
+    return pickle.loads(data) if data is not None else None
+
+
+def _split_filters(filters: dict, columns: tuple) -> tuple[dict, dict]:
+    """Split filters between the ones that can be pushed down to indexed columns
+    and the ones that must be checked on the unpickled records"""
+    column_filters, other_filters = {}, {}
+    for key, value in filters.items():
+        if key in columns and isinstance(value, str):
+            column_filters[key] = value
+        else:
+            other_filters[key] = value
+    return column_filters, other_filters
+
+
+class SqliteDB(DBOperations):
+    """SQLite database in WAL mode. Records are pickled, with the searchable fields
+    stored in indexed columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._presist_threads: bool = False
+        self._closed: bool = False
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, cached_statements=256
+        )
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        logger.debug("Registering database close handler on exit")
+        atexit.register(self.close)
+        logger.info(f"SqliteDB initialized with database {path}")
+
+    def set_persist_threads(self, persist: bool) -> None:
+        """Set whether to persist threads across restarts"""
+        self._presist_threads = persist
+        if not persist:
+            self._execute("DELETE FROM threads")
+        logger.info("Set persist_threads to %s", persist)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                if not self._presist_threads:
+                    self._execute("DELETE FROM threads")
+                self._conn.close()
+                logger.info("Database %s closed successfully", self.path)
+            except sqlite3.Error as e:
+                logger.error("Failed to close database: %s", str(e))
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _fetch_one(self, sql: str, params: tuple = ()) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return row[0] if row is not None else None
+
+    def _fetch_all(self, sql: str, params: tuple = ()) -> List[Any]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_loads(row[0]) for row in rows]
+
+    def _put_run(self, sql: str, run: Run) -> None:
+        self._execute(
+            sql,
+            (
+                run.get("thread_id"),
+                run.get("agent_id"),
+                run.get("status"),
+                _dumps(run),
+                str(run["run_id"]),
+            ),
+        )
+
+    def _search(self, table: str, columns: tuple, filters: dict) -> List[Any]:
+        column_filters, other_filters = _split_filters(filters, columns)
+        sql = f"SELECT data FROM {table}"
+        if column_filters:
+            sql += " WHERE " + " AND ".join(f"{key} = ?" for key in column_filters)
+        records = self._fetch_all(
+            sql + " ORDER BY rowid", tuple(column_filters.values())
+        )
+        return [record for record in records if _matches(record, other_filters)]
+
+    def create_run(self, run: Run) -> Run:
+        """Create a new Run"""
+        try:
+            self._put_run(
+                "INSERT INTO runs (thread_id, agent_id, status, data, run_id) VALUES (?, ?, ?, ?, ?)",
+                run,
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Run with ID {run['run_id']} already exists")
+        return run
+
+    def get_run(self, run_id: str) -> Optional[Run]:
+        """Get a Run by ID"""
+        return _loads(
+            self._fetch_one("SELECT data FROM runs WHERE run_id = ?", (run_id,))
+        )
+
+    def list_runs(self) -> List[Run]:
+        """List all Runs"""
+        return self._fetch_all("SELECT data FROM runs ORDER BY rowid")
+
+    def update_run(self, run_id: str, updates: dict) -> Optional[Run]:
+        """Update a Run with the given updates"""
+        with self._lock:
+            run = self.get_run(run_id)
+            if run is None:
+                return None
+            run.update(updates)
+            run["updated_at"] = datetime.now()
+            self._put_run(
+                "UPDATE runs SET thread_id = ?, agent_id = ?, status = ?, data = ?, version = version + 1 WHERE run_id = ?",
+                run,
+            )
+        return run
+
+    def get_run_version(self, run_id: str) -> Optional[int]:
+        """Get the version of a Run, incremented on every update"""
+        return self._fetch_one("SELECT version FROM runs WHERE run_id = ?", (run_id,))
+
+    def delete_run(self, run_id: str) -> bool:
+        """Delete a Run and its associated info and output"""
+        with self._lock, self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM runs WHERE run_id = ?", (run_id,)
+            ).rowcount
+            if not deleted:
+                return False
+            self._conn.execute("DELETE FROM runs_info WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs_output WHERE run_id = ?", (run_id,))
+        return True
+
+    def search_run(self, filters: dict) -> List[Run]:
+        """Search Runs by filters"""
+        return self._search("runs", RUN_COLUMNS, filters)
+
+    def get_run_status(self, run_id: str) -> Optional[RunStatus]:
+        """Get the status of a Run"""
+        return self._fetch_one("SELECT status FROM runs WHERE run_id = ?", (run_id,))
+
+    def add_run_output(self, run_id: str, output: Any) -> None:
+        """Add the output of a Run"""
+        self._execute(
+            "INSERT OR REPLACE INTO runs_output (run_id, data) VALUES (?, ?)",
+            (run_id, _dumps(output)),
+        )
+
+    def get_run_output(self, run_id: str) -> Optional[Any]:
+        """Get the output of a Run"""
+        return _loads(
+            self._fetch_one("SELECT data FROM runs_output WHERE run_id = ?", (run_id,))
+        )
+
+    def get_run_output_size(self, run_id: str) -> Optional[int]:
+        """Get the size in bytes of the serialized output of a Run"""
+        return self._fetch_one(
+            "SELECT length(data) FROM runs_output WHERE run_id = ?", (run_id,)
+        )
+
+    def create_run_info(self, run_info: RunInfo) -> RunInfo:
+        """Create a new Run info in the database"""
+        self._execute(
+            "INSERT OR REPLACE INTO runs_info (run_id, data) VALUES (?, ?)",
+            (str(run_info["run_id"]), _dumps(run_info)),
+        )
+        return run_info
+
+    def get_run_info(self, run_id: str) -> Optional[RunInfo]:
+        """Get a Run info by run ID"""
+        return _loads(
+            self._fetch_one("SELECT data FROM runs_info WHERE run_id = ?", (run_id,))
+        )
+
+    def list_run_info(self) -> List[RunInfo]:
+        """List all Run info"""
+        return self._fetch_all("SELECT data FROM runs_info ORDER BY rowid")
+
+    def delete_run_info(self, run_id: str) -> bool:
+        """Delete a Run info by run ID"""
+        cursor = self._execute("DELETE FROM runs_info WHERE run_id = ?", (run_id,))
+        return cursor.rowcount > 0
+
+    def update_run_info(self, run_id: str, updates: dict) -> Optional[RunInfo]:
+        """Update a Run info"""
+        with self._lock:
+            run_info = self.get_run_info(run_id)
+            if run_info is None:
+                return None
+            run_info.update(updates)
+            self._execute(
+                "UPDATE runs_info SET data = ? WHERE run_id = ?",
+                (_dumps(run_info), run_id),
+            )
+        return run_info
+
+    def create_thread(self, thread: Thread) -> Thread:
+        """Create a new Thread"""
+        thread_id = str(thread["thread_id"])
+        try:
+            self._execute(
+                "INSERT INTO threads (thread_id, status, data) VALUES (?, ?, ?)",
+                (thread_id, thread.get("status"), _dumps(thread)),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Thread with ID {thread_id} already exists")
+        return thread
+
+    def get_thread(self, thread_id: str) -> Optional[Thread]:
+        """Get a Thread by ID"""
+        return _loads(
+            self._fetch_one(
+                "SELECT data FROM threads WHERE thread_id = ?", (thread_id,)
+            )
+        )
+
+    def list_threads(self) -> List[Thread]:
+        """List all Threads"""
+        return self._fetch_all("SELECT data FROM threads ORDER BY rowid")
+
+    def update_thread(self, thread_id: str, updates: dict) -> Optional[Thread]:
+        """Update a Thread with the given updates"""
+        with self._lock:
+            thread = self.get_thread(thread_id)
+            if thread is None:
+                return None
+            thread.update(updates)
+            thread["updated_at"] = datetime.now()
+            self._execute(
+                "UPDATE threads SET status = ?, data = ?, version = version + 1 WHERE thread_id = ?",
+                (thread.get("status"), _dumps(thread), thread_id),
+            )
+        return thread
+
+    def get_thread_version(self, thread_id: str) -> Optional[int]:
+        """Get the version of a Thread, incremented on every update"""
+        return self._fetch_one(
+            "SELECT version FROM threads WHERE thread_id = ?", (thread_id,)
+        )
+
+    def delete_thread(self, thread_id: str) -> bool:
+        """Delete a Thread"""
+        cursor = self._execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+        return cursor.rowcount > 0
+
+    def search_thread(self, filters: dict) -> List[Thread]:
+        """Search Threads by filters"""
+        return self._search("threads", THREAD_COLUMNS, filters)
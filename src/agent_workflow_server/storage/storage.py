@@ -3,21 +3,54 @@
 
 import atexit
 import logging
+import multiprocessing
 import os
 import pickle
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
 
 import agent_workflow_server.logging.logger  # noqa: F401
 
+from .journal import Journal, read_journal
 from .models import Run, RunInfo
-from .service import DBOperations
+from .service import ChangeOp, DBOperations, apply_change
+from .snapshot import is_snapshot, read_snapshot, write_snapshot
+from .sqlite import SqliteDB
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+DEFAULT_STORAGE_FILE = "agws_storage.snapshot"
+# Default storage file of previous versions, still loaded if it is the only one
+LEGACY_STORAGE_FILE = "agws_storage.pkl"
+
+
+def _storage_file() -> str:
+    """The storage file, as set by AGWS_STORAGE_PATH"""
+    storage_file = os.getenv("AGWS_STORAGE_PATH")
+    if storage_file:
+        return storage_file
+    if not os.path.exists(DEFAULT_STORAGE_FILE) and os.path.exists(LEGACY_STORAGE_FILE):
+        logger.info(
+            f"Using the storage file {LEGACY_STORAGE_FILE} of a previous version"
+        )
+        return LEGACY_STORAGE_FILE
+    return DEFAULT_STORAGE_FILE
+
+
+def _persist() -> bool:
+    """Whether the storage is saved to files, as set by AGWS_STORAGE_PERSIST.
+
+    Never in a child process started by the process executor: it imports the
+    modules of the server, creating this storage, before running its entry
+    point, and must not load nor save the storage of the parent."""
+    if getattr(multiprocessing.current_process(), "_inheriting", False):
+        return False
+    return os.getenv("AGWS_STORAGE_PERSIST", "True") == "True"
+
 
 class InMemoryDB(DBOperations):
     """In-memory database with file persistence"""
@@ -28,15 +61,29 @@ class InMemoryDB(DBOperations):
         self._runs_output: Dict[str, Any] = {}
         self._threads: Dict[str, Any] = {}
         self._presist_threads: bool = False
+        self._journal: Optional[Journal] = None
 
-        use_fs_storage = os.getenv("AGWS_STORAGE_PERSIST", "True") == "True"
-        if use_fs_storage:
-            storage_file = os.getenv("AGWS_STORAGE_PATH") or "agws_storage.pkl"
+        if _persist():
+            storage_file = _storage_file()
             self.storage_file = storage_file
-            self._load_from_file()
+            self.journal_file = storage_file + ".journal"
+            use_journal = os.getenv("AGWS_STORAGE_JOURNAL", "True") == "True"
+            self._load_from_file(replay_journal=use_journal)
+            if use_journal:
+                self._journal = Journal(
+                    self.journal_file,
+                    take_state=self._take_state,
+                    write_snapshot=self._write_snapshot,
+                    flush_interval=float(
+                        os.getenv("AGWS_STORAGE_JOURNAL_FLUSH_INTERVAL", 1.0)
+                    ),
+                    compact_interval=float(
+                        os.getenv("AGWS_STORAGE_COMPACT_INTERVAL", 300.0)
+                    ),
+                )
             # Register save on exit
             logger.debug("Registering database save handler on exit")
-            atexit.register(self._save_to_file)
+            atexit.register(self.close)
 
         super().__init__(self._runs, self._runs_info, self._runs_output, self._threads)
         logger.debug("InMemoryDB initialization complete")
@@ -46,6 +93,47 @@ class InMemoryDB(DBOperations):
         self._presist_threads = persist
         logger.info("Set persist_threads to %s", persist)
 
+    def _record_change(
+        self,
+        op: ChangeOp,
+        table: str,
+        key: str,
+        value: Any = None,
+        updated_at: Optional[datetime] = None,
+    ) -> None:
+        if self._journal is None:
+            return
+        if table == "threads" and not self._presist_threads:
+            return
+        if updated_at is not None:
+            value = {**value, "updated_at": updated_at}
+        self._journal.append((op, table, key, value))
+
+    def close(self) -> None:
+        """Save the current state to file and stop journaling"""
+        atexit.unregister(self.close)
+        self._save_to_file()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _take_state(self) -> Dict[str, Dict[str, Any]]:
+        """Shallow copy of the tables to persist"""
+        data = {
+            "runs": dict(self._runs),
+            "runs_info": dict(self._runs_info),
+            "runs_output": dict(self._runs_output),
+        }
+        if self._presist_threads:
+            data["threads"] = dict(self._threads)
+        return data
+
+    def _write_snapshot(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically replace the storage file with the given state"""
+        tmp_file = self.storage_file + ".tmp"
+        write_snapshot(tmp_file, data)
+        os.replace(tmp_file, self.storage_file)
+
     def _save_to_file(self) -> None:
         """Save the current state to file"""
         try:
@@ -56,30 +144,36 @@ class InMemoryDB(DBOperations):
                 len(self._runs_output),
                 len(self._threads),
             )
-            data = {
-                "runs": self._runs,
-                "runs_info": self._runs_info,
-                "runs_output": self._runs_output,
-            }
-            if self._presist_threads:
-                data["threads"] = self._threads
-
-            with open(self.storage_file, "wb") as f:
-                pickle.dump(data, f)
+            if self._journal is not None:
+                self._journal.checkpoint()
+            else:
+                self._write_snapshot(self._take_state())
+                if os.path.exists(self.journal_file):
+                    # The snapshot supersedes a journal left by a previous run
+                    os.remove(self.journal_file)
             logger.info("Database state saved successfully to %s", self.storage_file)
         except Exception as e:
             logger.error("Failed to save database state: %s", str(e))
 
-    def _load_from_file(self) -> None:
-        """Load the state from file if it exists"""
-        if not os.path.exists(self.storage_file):
+    def _load_from_file(self, replay_journal: bool = True) -> None:
+        """Load the state from file if it exists, then replay the journal"""
+        if os.path.exists(self.storage_file):
+            self._load_snapshot()
+        else:
             logger.debug("No existing database file found at %s", self.storage_file)
-            return
 
+        if replay_journal and os.path.exists(self.journal_file):
+            self._replay_journal()
+
+    def _load_snapshot(self) -> None:
         try:
             logger.debug("Loading database state")
-            with open(self.storage_file, "rb") as f:
-                data = pickle.load(f)
+            if is_snapshot(self.storage_file):
+                data = read_snapshot(self.storage_file)
+            else:
+                # Pickle file written by previous versions
+                with open(self.storage_file, "rb") as f:
+                    data = pickle.load(f)
 
             logger.debug(
                 "Processing state: %d runs, %d runs_info records, %d runs_output, %d threads",
@@ -104,7 +198,41 @@ class InMemoryDB(DBOperations):
             self._runs_output = {}
             self._threads = {}
 
+    def _replay_journal(self) -> None:
+        tables = {
+            "runs": self._runs,
+            "runs_info": self._runs_info,
+            "runs_output": self._runs_output,
+            "threads": self._threads,
+        }
+        count = 0
+        for record in read_journal(self.journal_file):
+            apply_change(tables, *record)
+            count += 1
+        logger.info(
+            f"Replayed {count} journal records from {os.path.abspath(self.journal_file)}"
+        )
+
+
+def _create_db() -> DBOperations:
+    """Create the database for the storage backend selected by AGWS_STORAGE_BACKEND"""
+    backend = os.getenv("AGWS_STORAGE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        path = (
+            os.getenv("AGWS_STORAGE_SQLITE_PATH") or "agws_storage.db"
+            if _persist()
+            else ":memory:"
+        )
+        logger.debug("Creating global SqliteDB instance")
+        return SqliteDB(path)
+    if backend != "memory":
+        raise ValueError(
+            f'Invalid AGWS_STORAGE_BACKEND "{backend}". Must be one of: memory, sqlite'
+        )
+
+    logger.debug("Creating global InMemoryDB instance")
+    return InMemoryDB()
+
 
 # Global instance of the database
-logger.debug("Creating global InMemoryDB instance")
-DB = InMemoryDB()
+DB = _create_db()
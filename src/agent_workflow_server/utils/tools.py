@@ -4,9 +4,10 @@
 import importlib
 import uuid
 from enum import Enum
-from typing import Any
+from typing import Any, Callable, Dict
 from urllib.parse import urlparse
 
+import pydantic_core
 from pydantic import BaseModel
 
 
@@ -27,21 +28,91 @@ def is_valid_url(val):
         return False
 
 
-def make_serializable(v: Any):
-    if isinstance(v, list):
-        return [make_serializable(vv) for vv in v]
-    elif isinstance(v, dict):
-        return {kk: make_serializable(vv) for kk, vv in v.items()}
-    elif (
-        isinstance(v, BaseModel) and hasattr(v, "model_dump") and callable(v.model_dump)
-    ):
-        return v.model_dump(mode="json")
-    elif isinstance(v, BaseModel) and hasattr(v, "dict") and callable(v.dict):
-        return v.dict()
-    elif isinstance(v, Enum):
-        return v.value
+def _identity(v: Any) -> Any:
+    return v
+
+
+def _convert(v: Any) -> Any:
+    handler = _HANDLERS.get(type(v)) or _handler(type(v))
+    return handler(v)
+
+
+def _list(v: list) -> list:
+    # Copied only if an item is converted
+    copy = None
+    for index, item in enumerate(v):
+        handler = _HANDLERS.get(type(item)) or _handler(type(item))
+        if handler is _identity:
+            continue
+        converted = handler(item)
+        if converted is not item:
+            if copy is None:
+                copy = list(v)
+            copy[index] = converted
+    return v if copy is None else copy
+
+
+def _dict(v: dict) -> dict:
+    copy = None
+    for key, value in v.items():
+        handler = _HANDLERS.get(type(value)) or _handler(type(value))
+        if handler is _identity:
+            continue
+        converted = handler(value)
+        if converted is not value:
+            if copy is None:
+                copy = dict(v)
+            copy[key] = converted
+    return v if copy is None else copy
+
+
+def _model(v: BaseModel) -> Any:
+    return v.model_dump(mode="json")
+
+
+def _enum(v: Enum) -> Any:
+    return v.value
+
+
+# Conversion of the values of each type met, resolved once per type
+_HANDLERS: Dict[type, Callable[[Any], Any]] = {
+    str: _identity,
+    int: _identity,
+    float: _identity,
+    bool: _identity,
+    type(None): _identity,
+    list: _list,
+    dict: _dict,
+}
+
+
+def _handler(cls: type) -> Callable[[Any], Any]:
+    if issubclass(cls, list):
+        handler = lambda v: [_convert(vv) for vv in v]  # noqa: E731
+    elif issubclass(cls, dict):
+        handler = lambda v: {kk: _convert(vv) for kk, vv in v.items()}  # noqa: E731
+    elif issubclass(cls, BaseModel):
+        handler = _model
+    elif issubclass(cls, Enum):
+        handler = _enum
     else:
-        return v
+        handler = _identity
+    _HANDLERS[cls] = handler
+    return handler
+
+
+def make_serializable(v: Any):
+    """Convert the pydantic models and enums in a value to JSON values.
+
+    Lists and dicts are only copied when some of their items are converted: the
+    result shares its already serializable parts with the value."""
+    return _convert(v)
+
+
+def serialize_json(v: Any) -> bytes:
+    """JSON encoding of a value, with its pydantic models and enums converted as
+    by make_serializable, without building the converted value"""
+    return pydantic_core.to_json(v)
 
 
 def load_from_module(module: str, obj: str) -> object:
@@ -33,6 +33,9 @@ class JokeFlow(Workflow):
         return StopEvent(result=str(response))
 
 
+jokeflow_workflow = JokeFlow(timeout=60, verbose=False)
+
+
 async def main():
     w = JokeFlow(timeout=60, verbose=False)
     result = await w.run(topic="pirates")
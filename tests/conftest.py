@@ -7,6 +7,10 @@ from pathlib import Path
 import pytest
 from dotenv import load_dotenv
 
+# The storage is created when the server modules are imported, before the test
+# environment is loaded: the tests must not save it to the working directory
+os.environ.setdefault("AGWS_STORAGE_PERSIST", "False")
+
 
 @pytest.fixture(autouse=True)
 def load_test_env():
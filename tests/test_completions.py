@@ -0,0 +1,50 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+
+import pytest
+
+from agent_workflow_server.services.completions import RunCompletions
+
+
+@pytest.mark.asyncio
+async def test_completions():
+    completions = RunCompletions()
+    reads = []
+
+    def get_output(run_id):
+        reads.append(run_id)
+        return {"output": run_id}
+
+    # Not waited for: the output is not read and nothing is tracked
+    completions.resolve({"run_id": "run-0", "status": "success"}, get_output)
+    assert reads == [] and len(completions) == 0
+
+    # All the waiters are woken up with the same run and output, read once
+    waiters = [
+        asyncio.create_task(completions.wait("run-1", timeout=1)) for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert len(completions) == 1
+    run = {"run_id": "run-1", "status": "success"}
+    completions.resolve(run, get_output)
+    assert len(completions) == 0
+    results = await asyncio.gather(*waiters)
+    assert results == [(run, {"output": "run-1"})] * 3
+    assert reads == ["run-1"]
+
+    # The entry is removed when the last waiter gives up
+    with pytest.raises(asyncio.TimeoutError):
+        await completions.wait("run-2", timeout=0.01)
+    assert len(completions) == 0
+
+    # A waiter giving up does not affect the others
+    waiter = asyncio.create_task(completions.wait("run-3", timeout=1))
+    with pytest.raises(asyncio.TimeoutError):
+        await completions.wait("run-3", timeout=0.01)
+    assert len(completions) == 1
+    run = {"run_id": "run-3", "status": "error"}
+    completions.resolve(run, get_output)
+    assert await waiter == (run, {"output": "run-3"})
+    assert len(completions) == 0
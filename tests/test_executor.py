@@ -0,0 +1,132 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import json
+from contextlib import aclosing
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from agent_workflow_server.services.executor import ExecutorError, ProcessExecutor
+
+AGENT_ID = "3f1e2549-5799-4321-91ae-2a4881d55526"
+
+
+def _make_run(input: dict, thread_id=None) -> dict:
+    return {
+        "run_id": str(uuid4()),
+        "agent_id": AGENT_ID,
+        "thread_id": thread_id,
+        "input": input,
+        "config": None,
+        "metadata": None,
+        "webhook": None,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "status": "pending",
+    }
+
+
+@pytest.mark.asyncio
+async def test_process_executor(tmp_path):
+    with open("tests/agents/jokeflow_manifest.json") as file:
+        manifest = json.load(file)
+    manifest["locators"] = [{"url": "tests/agents", "type": "source-code"}]
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest))
+
+    executor = ProcessExecutor(
+        json.dumps({AGENT_ID: "tests.agents.jokeflow:jokeflow_workflow"}),
+        [str(manifest_path)],
+        n_processes=2,
+    )
+    executor.start()
+    try:
+        messages = [
+            message
+            async for message in executor.stream(
+                _make_run({"topic": "pirates"}, str(uuid4()))
+            )
+        ]
+        assert [message.type for message in messages] == ["message", "message"]
+        assert (
+            messages[-1].data
+            == "this is a critique of the joke: this is a joke about pirates"
+        )
+
+        with pytest.raises(ExecutorError):
+            async for _ in executor.stream(_make_run({"subject": "pirates"})):
+                pass
+    finally:
+        await executor.stop()
+
+
+class _FakeChild:
+    alive = True
+
+    def __init__(self, n_streams: int):
+        self.streams = {str(i): None for i in range(n_streams)}
+
+
+def test_select_child():
+    executor = ProcessExecutor("{}", [], n_processes=3)
+    executor._children = [_FakeChild(2), _FakeChild(0), _FakeChild(1)]
+
+    # Runs with a thread_id (stateless runs too) always go to the same child,
+    # however busy the children are
+    thread_id = str(uuid4())
+    child = executor._select(_make_run({}, thread_id))
+    for other in executor._children:
+        other.streams = {}
+    child.streams = {"0": None, "1": None}
+    assert executor._select(_make_run({}, thread_id)) is child
+
+    # Runs without thread_id go to the least busy child
+    executor._children = [_FakeChild(2), _FakeChild(0), _FakeChild(1)]
+    for _ in range(3):
+        assert executor._select(_make_run({})) is executor._children[1]
+
+
+@pytest.mark.asyncio
+async def test_process_executor_resume(tmp_path):
+    with open("tests/agents/jokereviewer_manifest.json") as file:
+        manifest = json.load(file)
+    manifest["locators"] = [{"url": "tests/agents", "type": "source-code"}]
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest))
+
+    executor = ProcessExecutor(
+        json.dumps({AGENT_ID: "tests.agents.jokereviewer:interrupt_workflow"}),
+        [str(manifest_path)],
+        n_processes=2,
+    )
+    executor.start()
+    try:
+        # A stateless run, interrupted while the other child is the least busy
+        run = _make_run({"topic": "pirates"}, str(uuid4()))
+        child = executor._select(run)
+        other = next(c for c in executor._children if c is not child)
+        child.streams["busy"] = asyncio.Queue()
+        async with aclosing(executor.stream(run)) as stream:
+            async for interrupt in stream:
+                if interrupt.type == "interrupt":
+                    # The worker stops reading the run at its interrupt
+                    break
+        assert interrupt.type == "interrupt"
+        del child.streams["busy"]
+
+        # Resumed from the checkpoint of the child which interrupted it
+        other.streams["busy"] = asyncio.Queue()
+        run["interrupt"] = {
+            "event": interrupt.event,
+            "name": interrupt.interrupt_name,
+            "ai_data": interrupt.data,
+            "user_data": {"answer": "funny"},
+        }
+        messages = [message async for message in executor.stream(run)]
+        del other.streams["busy"]
+        assert "Received human answer: funny" in messages[-1].data["review"]
+    finally:
+        await executor.stop()
@@ -1,10 +1,14 @@
 # Copyright AGNTCY Contributors (https://github.com/agntcy)
 # SPDX-License-Identifier: Apache-2.0
 
+import asyncio
 import logging
+import operator
+from typing import Annotated, TypedDict
 from uuid import uuid4
 
 import pytest
+from langgraph.graph import START, StateGraph
 
 from agent_workflow_server.agents.adapters.langgraph import (
     LangGraphAdapter,
@@ -52,6 +56,9 @@ async def test_langgraph_astream():
 
     events = []
     async for result in agent.astream(new_run):
+        # Each node update is timed
+        assert result.step == result.event
+        assert result.duration >= 0
         messages = result.data.get("messages", [])
         for message in messages:
             events.append(message.content)
@@ -65,6 +72,36 @@ async def test_langgraph_astream():
         )
 
 
+@pytest.mark.asyncio
+async def test_langgraph_astream_parallel_nodes():
+    class State(TypedDict):
+        nodes: Annotated[list, operator.add]
+
+    async def fast(state: State):
+        return {"nodes": ["fast"]}
+
+    async def slow(state: State):
+        await asyncio.sleep(0.2)
+        return {"nodes": ["slow"]}
+
+    builder = StateGraph(State)
+    builder.add_node("fast", fast)
+    builder.add_node("slow", slow)
+    builder.add_edge(START, "fast")
+    builder.add_edge(START, "slow")
+    agent = LangGraphAgent(builder.compile())
+
+    durations = {}
+    async for result in agent.astream(
+        Run(agent_id=MOCK_AGENT_ID, input={}, thread_id=str(uuid4()), config=None)
+    ):
+        durations[result.step] = result.duration
+
+    # Both nodes run in the same superstep, each one is timed on its own
+    assert durations["slow"] >= 0.2
+    assert durations["fast"] < 0.2
+
+
 @pytest.mark.asyncio
 async def test_langgraph_get_agent_state():
     expected = [
@@ -64,8 +64,12 @@ async def test_llamaindex_astream():
     )
 
     events = []
+    steps = []
     async for result in agent.astream(new_run):
         events.append(result.data)
+        if result.step is not None:
+            steps.append(result.step)
+            assert result.duration >= 0
 
     assert len(events) == len(expected), (
         "Unexpected number of events generated during the run"
@@ -74,6 +78,8 @@ async def test_llamaindex_astream():
         assert event == expected[i], (
             f"Event {i} does not match expected value: {event} != {expected[i]}"
         )
+    # Every event but the final result is a timed step
+    assert len(steps) == len(events) - 1
 
 
 @pytest.mark.asyncio
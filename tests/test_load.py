@@ -35,6 +35,8 @@ def test_load_agents(mocker: MockerFixture):
 
     assert len(AGENTS) == 1
     assert isinstance(AGENTS[MOCK_AGENT_ID].agent, MockAgent)
+    # Validators are compiled at load time
+    assert AGENTS[MOCK_AGENT_ID].validators is not None
 
 
 @pytest.mark.parametrize(
@@ -0,0 +1,111 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime
+
+import pytest
+
+from agent_workflow_server.apis.authentication import authentication_with_api_key
+from agent_workflow_server.apis.metrics import get_metrics
+from agent_workflow_server.services import (
+    queue,  # noqa: F401, registers the pool metrics
+)
+from agent_workflow_server.services.metrics import CONTENT_TYPE, Registry
+from agent_workflow_server.services.runs import Runs
+from agent_workflow_server.storage.storage import DB
+
+
+def test_counter():
+    registry = Registry()
+    counter = registry.counter("runs_total", "Runs", ["agent_id", "status"])
+    counter.inc("a", "success")
+    counter.inc("a", "success")
+    counter.inc('b"', "error", amount=3)
+    assert registry.render().splitlines() == [
+        "# HELP runs_total Runs",
+        "# TYPE runs_total counter",
+        'runs_total{agent_id="a",status="success"} 2',
+        'runs_total{agent_id="b\\"",status="error"} 3',
+    ]
+
+
+def test_histogram():
+    registry = Registry()
+    histogram = registry.histogram("exec_seconds", "Exec", ["agent_id"], [0.1, 1])
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value, "a")
+    assert registry.render().splitlines()[2:] == [
+        'exec_seconds_bucket{agent_id="a",le="0.1"} 2',
+        'exec_seconds_bucket{agent_id="a",le="1"} 3',
+        'exec_seconds_bucket{agent_id="a",le="+Inf"} 4',
+        'exec_seconds_sum{agent_id="a"} 2.65',
+        'exec_seconds_count{agent_id="a"} 4',
+    ]
+
+
+def test_callback():
+    registry = Registry()
+    depth = {"default": 3}
+    registry.callback(
+        "queued", "Queued", lambda: {(k,): v for k, v in depth.items()}, ["pool"]
+    )
+    registry.callback("dropped_total", "Dropped", lambda: 1, type="counter")
+    depth["agent"] = 1
+    assert registry.render().splitlines() == [
+        "# HELP queued Queued",
+        "# TYPE queued gauge",
+        'queued{pool="default"} 3',
+        'queued{pool="agent"} 1',
+        "# HELP dropped_total Dropped",
+        "# TYPE dropped_total counter",
+        "dropped_total 1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    now = datetime.now()
+    DB.create_run(
+        {
+            "run_id": "metrics-run",
+            "agent_id": "metrics-agent",
+            "thread_id": None,
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": now,
+            "updated_at": now,
+            "status": "pending",
+        }
+    )
+    try:
+        # A failed attempt, retried
+        await Runs.set_status("metrics-run", "error", retried=True)
+        await Runs.set_status("metrics-run", "success")
+    finally:
+        DB.delete_run("metrics-run")
+
+    response = await get_metrics()
+    assert response.media_type == CONTENT_TYPE
+    body = response.body.decode()
+    assert 'agws_runs_ended_total{agent_id="metrics-agent",status="success"} 1' in body
+    assert 'agent_id="metrics-agent",status="error"' not in body
+    for name in (
+        "agws_run_queue_seconds",
+        "agws_queued_runs",
+        "agws_busy_workers",
+        "agws_stream_subscribers",
+        "agws_webhooks_dropped_total",
+        "agws_validation_seconds",
+    ):
+        assert f"# TYPE {name} " in body
+
+
+def test_metrics_authenticated():
+    from agent_workflow_server.main import app
+
+    [route] = [route for route in app.routes if route.path == "/metrics"]
+    assert authentication_with_api_key in [
+        dependency.call for dependency in route.dependant.dependencies
+    ]
@@ -0,0 +1,129 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from agent_workflow_server.apis.stateless_runs import get_stateless_run_profile
+from agent_workflow_server.apis.threads_runs import get_thread_run_profile
+from agent_workflow_server.services import profile
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.metrics import STEP_SECONDS
+from agent_workflow_server.services.profile import record_step, run_profile
+from agent_workflow_server.storage.storage import DB
+
+RUN = {"run_id": "run", "agent_id": "profile-agent", "status": "success"}
+
+
+def test_record_step(monkeypatch):
+    monkeypatch.setattr(profile, "MAX_PROFILE_STEPS", 2)
+    monkeypatch.setattr(profile, "MAX_TIMELINE_STEPS", 3)
+    run_info = {"run_id": "run", "attempts": 1, "queue_s": 0.5, "exec_s": 4.0}
+    profile.start_timeline("run")
+    steps = (("plan", 1.0), ("tool", 0.5), ("plan", 2.0), ("tool", 1), ("answer", 3))
+    for step, duration in steps:
+        record_step(RUN, run_info, Message("message", {}, step=step, duration=duration))
+    # Not timed by the adapter
+    record_step(RUN, run_info, Message("message", {}, event="plan"))
+
+    # All the steps are in the metrics
+    assert STEP_SECONDS.values[("profile-agent", "plan")].count == 2
+    assert STEP_SECONDS.values[("profile-agent", "tool")].count == 2
+
+    result = run_profile(RUN, run_info)
+    assert result["exec_s"] == 4.0
+    # The last steps, while the run is executed
+    assert [s["step"] for s in result["steps"]] == ["plan", "tool", "answer"]
+    # Step names beyond the limit are totalled together
+    assert result["by_step"] == {
+        "plan": {"count": 2, "total_s": 3.0, "max_s": 2.0},
+        "(other)": {"count": 1, "total_s": 3.0, "max_s": 3},
+        "tool": {"count": 2, "total_s": 1.5, "max_s": 1},
+    }
+
+    profile.end_timeline("run")
+    result = run_profile(RUN, run_info)
+    assert result["steps"] == [] and len(result["by_step"]) == 3
+    # Only the totals are kept in the run info
+    assert set(run_info) == {"run_id", "attempts", "queue_s", "exec_s", "step_totals"}
+
+
+def test_run_profile_without_steps():
+    result = run_profile(RUN, {"run_id": "run", "attempts": 0})
+    assert result["steps"] == [] and result["by_step"] == {}
+    assert result["exec_s"] is None
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint():
+    now = datetime.now()
+    DB.create_run(
+        {
+            **RUN,
+            "run_id": "profile-run",
+            "thread_id": None,
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    DB.create_run_info(
+        {
+            "run_id": "profile-run",
+            "queued_at": now,
+            "attempts": 1,
+            "step_totals": {"plan": {"count": 1, "total_s": 1.0, "max_s": 1.0}},
+        }
+    )
+    try:
+        result = await get_stateless_run_profile("profile-run")
+        assert result["by_step"]["plan"]["count"] == 1
+        # Not a thread run
+        with pytest.raises(HTTPException) as e:
+            await get_thread_run_profile("profile-thread", "profile-run")
+        assert e.value.status_code == 404
+    finally:
+        DB.delete_run("profile-run")
+
+    with pytest.raises(HTTPException) as e:
+        await get_stateless_run_profile("profile-run")
+    assert e.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_thread_run_profile_endpoint():
+    now = datetime.now()
+    DB.create_thread(
+        {
+            "thread_id": "profile-thread",
+            "metadata": {},
+            "status": "idle",
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    DB.create_run(
+        {
+            **RUN,
+            "run_id": "profile-thread-run",
+            "thread_id": "profile-thread",
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    DB.create_run_info({"run_id": "profile-thread-run", "queued_at": now})
+    try:
+        result = await get_thread_run_profile("profile-thread", "profile-thread-run")
+        assert result["run_id"] == "profile-thread-run" and result["by_step"] == {}
+    finally:
+        DB.delete_run("profile-thread-run")
+        DB.delete_thread("profile-thread")
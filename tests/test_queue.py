@@ -0,0 +1,94 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+
+from agent_workflow_server.services.queue import Autoscaler, WorkerPool, worker
+from agent_workflow_server.services.scheduler import RunScheduler
+
+
+@pytest_asyncio.fixture
+async def pool(mocker: MockerFixture) -> AsyncIterator[WorkerPool]:
+    async def idle_worker(worker_id: int, pool: WorkerPool):
+        pool.idle.add(worker_id)
+        await asyncio.Future()
+
+    mocker.patch("agent_workflow_server.services.queue.worker", idle_worker)
+    pool = WorkerPool("default", 2, RunScheduler({}.get))
+    yield pool
+    tasks = list(pool.workers.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_pool_resize(pool: WorkerPool):
+    task = asyncio.create_task(pool.run())
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert pool.size == 2
+
+    pool.resize(5)
+    await asyncio.sleep(0)
+    assert pool.size == 5
+    assert len(pool.idle) == 5
+
+    pool.resize(3)
+    assert pool.size == 3
+    assert len(pool.idle) == 3
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert pool.size == 0
+
+
+@pytest.mark.asyncio
+async def test_autoscaler_decide(pool: WorkerPool):
+    pool.grow(2)
+    await asyncio.sleep(0)
+    autoscaler = Autoscaler(
+        pool, min_workers=2, max_workers=8, target_queue_s=1.0, down_checks=2
+    )
+    for run_id in range(10):
+        pool.queue._queue.push(str(run_id), "agent", 1, 0)
+    pool.idle.clear()
+    pool.busy = 2
+    pool.exec_s = 0.5
+
+    # Overloaded: 10 queued runs x 0.5s / 2 workers, but only after 2 checks
+    assert autoscaler.decide(loop_lag=0.0) == 2
+    assert autoscaler.decide(loop_lag=0.0) == 4
+    # The event loop lags: more workers would not help
+    assert autoscaler.decide(loop_lag=1.0) == 2
+    assert autoscaler.decide(loop_lag=1.0) == 2
+
+    while pool.queue.qsize():
+        pool.queue._queue.pop()
+    pool.busy = 0
+    pool.grow(2)
+    assert autoscaler.decide(loop_lag=0.0) == 4
+    assert autoscaler.decide(loop_lag=0.0) == 3
+
+
+@pytest.mark.asyncio
+async def test_worker_skips_deleted_run():
+    scheduler = RunScheduler({}.get)
+    pool = WorkerPool("default", 1, scheduler)
+    task = asyncio.create_task(worker(1, pool))
+    try:
+        # Deleted (e.g. evicted) while queued
+        await scheduler.put("deleted")
+        await asyncio.wait_for(scheduler.join(), 1)
+        assert not task.done()
+        assert pool.busy == 0
+        assert scheduler.running("") == 0
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
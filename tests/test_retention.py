@@ -0,0 +1,123 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from pytest_mock import MockerFixture
+
+from agent_workflow_server.services.retention import (
+    Retention,
+    RetentionPolicy,
+    load_policies,
+)
+from agent_workflow_server.services.scheduler import MAX_RETRY_ATTEMPTS
+from agent_workflow_server.storage.service import DBOperations
+
+AGENT_ID_1 = "3f1e2549-5799-4321-91ae-2a4881d55526"
+AGENT_ID_2 = "2f1e2549-5799-4321-91ae-2a4881d55526"
+
+
+def _add_run(
+    db: DBOperations,
+    agent_id: str,
+    status: str,
+    age_s: float,
+    output,
+    attempts: int = 1,
+):
+    run_id = str(uuid4())
+    updated_at = datetime.now() - timedelta(seconds=age_s)
+    db.create_run(
+        {
+            "run_id": run_id,
+            "agent_id": agent_id,
+            "thread_id": None,
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": updated_at,
+            "updated_at": updated_at,
+            "status": status,
+        }
+    )
+    db.create_run_info(
+        {"run_id": run_id, "queued_at": updated_at, "attempts": attempts}
+    )
+    db.add_run_output(run_id, output)
+    return run_id
+
+
+@pytest.fixture
+def db(mocker: MockerFixture) -> DBOperations:
+    db = DBOperations({}, {}, {}, {})
+    mocker.patch("agent_workflow_server.services.retention.DB", db)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_sweep_ttl(db: DBOperations):
+    expired = _add_run(db, AGENT_ID_1, "success", 120, "output")
+    recent = _add_run(db, AGENT_ID_1, "success", 1, "output")
+    failed = _add_run(db, AGENT_ID_1, "error", 120, "error", MAX_RETRY_ATTEMPTS + 1)
+    # Failed an attempt, queued again
+    retried = _add_run(db, AGENT_ID_1, "error", 120, "error")
+    pending = _add_run(db, AGENT_ID_1, "pending", 120, None)
+    interrupted = _add_run(db, AGENT_ID_1, "interrupted", 120, {"interrupt": 1})
+    other_agent = _add_run(db, AGENT_ID_2, "success", 120, "output")
+
+    evicted_bytes = db.get_run_output_size(expired) + db.get_run_output_size(failed)
+    retention = Retention(
+        RetentionPolicy(ttl=60), {AGENT_ID_2: RetentionPolicy(ttl=3600)}
+    )
+    assert await retention.sweep() == 2
+
+    assert db.get_run(expired) is None
+    assert db.get_run_info(expired) is None
+    assert db.get_run_output(expired) is None
+    assert db.get_run(failed) is None
+    for run_id in (recent, retried, pending, interrupted, other_agent):
+        assert db.get_run(run_id) is not None
+    assert retention.stats.evicted_runs == 2
+    assert retention.stats.evicted_bytes == evicted_bytes
+
+
+@pytest.mark.asyncio
+async def test_sweep_limits(db: DBOperations):
+    run_ids = [
+        _add_run(db, AGENT_ID_1, "success", 100 - i, "x" * 100) for i in range(5)
+    ]
+    pending = _add_run(db, AGENT_ID_1, "pending", 200, "x" * 100)
+
+    retention = Retention(RetentionPolicy(max_runs=3))
+    # Reading a run output makes it the most recently used
+    retention.touch(run_ids[0])
+    assert await retention.sweep() == 2
+    assert [db.get_run(run_id) is not None for run_id in run_ids] == [
+        True,
+        False,
+        False,
+        True,
+        True,
+    ]
+
+    size = db.get_run_output_size(run_ids[0])
+    retention.default = RetentionPolicy(max_bytes=size)
+    assert await retention.sweep() == 2
+    assert db.get_run(run_ids[0]) is not None
+    assert db.get_run(pending) is not None
+    assert retention.stats.evicted_runs == 4
+    assert retention.stats.evicted_bytes == 4 * size
+
+
+def test_load_policies(monkeypatch):
+    monkeypatch.setenv("AGWS_RETENTION_TTL", "3600")
+    monkeypatch.setenv("AGWS_RETENTION_MAX_RUNS", "0")
+    monkeypatch.setenv(
+        "AGWS_RETENTION_AGENTS", f'{{"{AGENT_ID_1}": {{"max_runs": 10}}}}'
+    )
+    default, agents = load_policies()
+    assert default == RetentionPolicy(ttl=3600)
+    assert agents == {AGENT_ID_1: RetentionPolicy(ttl=3600, max_runs=10)}
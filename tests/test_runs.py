@@ -16,6 +16,7 @@ from agent_workflow_server.generated.models.run_search_request import (
 )
 from agent_workflow_server.services.queue import start_workers
 from agent_workflow_server.services.runs import ApiRun, ApiRunCreate, Runs
+from agent_workflow_server.services.webhooks import WEBHOOKS
 from agent_workflow_server.storage.models import RunStatus
 from agent_workflow_server.storage.storage import DB
 from tests.mock import (
@@ -118,6 +119,7 @@ async def test_invoke(
 
         # Check if the webhook was called with the expected payload
         if run_create_mock.webhook:
+            await WEBHOOKS.join()
             assert mock_server.webhook_payload.decode("utf-8") == run.model_dump_json(
                 by_alias=True, exclude_unset=True
             )
@@ -0,0 +1,130 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from agent_workflow_server.services.scheduler import RunScheduler
+
+AGENT_ID_1 = "3f1e2549-5799-4321-91ae-2a4881d55526"
+AGENT_ID_2 = "2f1e2549-5799-4321-91ae-2a4881d55526"
+
+
+def _add_run(runs: Dict[str, dict], agent_id: str, **kwargs) -> str:
+    run_id = f"run-{len(runs)}"
+    runs[run_id] = {
+        "run_id": run_id,
+        "agent_id": agent_id,
+        "metadata": None,
+        "config": None,
+        **kwargs,
+    }
+    return run_id
+
+
+async def _drain(scheduler: RunScheduler) -> List[str]:
+    run_ids = []
+    while not scheduler.empty():
+        run_ids.append(await scheduler.get())
+        scheduler.task_done()
+    await scheduler.join()
+    return run_ids
+
+
+@pytest.mark.asyncio
+async def test_fifo_single_agent():
+    runs = {}
+    scheduler = RunScheduler(runs.get)
+    run_ids = [_add_run(runs, AGENT_ID_1) for _ in range(5)]
+    for run_id in run_ids:
+        await scheduler.put(run_id)
+    assert scheduler.qsize() == 5
+    assert await _drain(scheduler) == run_ids
+
+
+@pytest.mark.asyncio
+async def test_fair_share():
+    runs = {}
+    scheduler = RunScheduler(runs.get, weights={AGENT_ID_2: 2})
+    flood = [_add_run(runs, AGENT_ID_1) for _ in range(10)]
+    other = [_add_run(runs, AGENT_ID_2) for _ in range(4)]
+    for run_id in flood + other:
+        await scheduler.put(run_id)
+
+    served = await _drain(scheduler)
+    # AGENT_ID_2 gets two runs for each run of AGENT_ID_1 while both are queued
+    assert [runs[run_id]["agent_id"] for run_id in served[:6]].count(AGENT_ID_2) == 4
+    assert [r for r in served if r in flood] == flood
+    assert [r for r in served if r in other] == other
+
+
+@pytest.mark.asyncio
+async def test_priority_and_resume():
+    runs = {}
+    scheduler = RunScheduler(runs.get)
+    new = _add_run(runs, AGENT_ID_1)
+    low = _add_run(runs, AGENT_ID_2, metadata={"priority": -1})
+    high = _add_run(runs, AGENT_ID_1, config={"configurable": {"priority": 5}})
+    resumed = _add_run(
+        runs,
+        AGENT_ID_2,
+        interrupt={"event": "e", "name": "n", "user_data": {}},
+        resume_pending=True,
+    )
+    unknown = "missing"
+    for run_id in (new, low, high, resumed, unknown):
+        await scheduler.put(run_id)
+
+    assert await _drain(scheduler) == [resumed, high, unknown, new, low]
+
+    # Once its attempt started, a resumed run is retried as a new run
+    runs[resumed]["resume_pending"] = False
+    for run_id in (new, resumed):
+        await scheduler.put(run_id)
+    assert await _drain(scheduler) == [new, resumed]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    runs = {}
+    scheduler = RunScheduler(runs.get, limits={AGENT_ID_1: 1})
+    limited = [_add_run(runs, AGENT_ID_1) for _ in range(3)]
+    other = _add_run(runs, AGENT_ID_2)
+    for run_id in limited + [other]:
+        await scheduler.put(run_id)
+
+    assert await scheduler.get() == limited[0]
+    # AGENT_ID_1 is at its limit: its runs do not block the other agent
+    assert await scheduler.get() == other
+    assert scheduler.empty()
+    assert scheduler.qsize() == 2
+    assert scheduler.running(AGENT_ID_1) == 1
+
+    getter = asyncio.create_task(scheduler.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+    scheduler.release(limited[0])
+    scheduler.release(limited[0])
+    assert await asyncio.wait_for(getter, 1) == limited[1]
+    assert scheduler.running(AGENT_ID_1) == 1
+
+    scheduler.set_limits({})
+    assert await scheduler.get() == limited[2]
+    assert scheduler.running(AGENT_ID_1) == 2
+
+
+@pytest.mark.asyncio
+async def test_routes():
+    runs = {}
+    scheduler = RunScheduler(runs.get)
+    dedicated = RunScheduler(runs.get)
+    scheduler.set_routes({AGENT_ID_2: dedicated})
+    shared = _add_run(runs, AGENT_ID_1)
+    routed = _add_run(runs, AGENT_ID_2)
+    for run_id in (shared, routed):
+        await scheduler.put(run_id)
+
+    assert await _drain(scheduler) == [shared]
+    assert await _drain(dedicated) == [routed]
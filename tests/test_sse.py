@@ -0,0 +1,44 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pytest
+
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.sse import event_frame, event_payload
+
+
+@pytest.mark.parametrize(
+    "status, data, event_type",
+    [
+        ("pending", {"messages": [{"content": "hello"}]}, "values"),
+        ("success", None, "values"),
+        ("interrupted", {"question": "sure?"}, "interrupt"),
+        ("error", "failed", "error"),
+    ],
+)
+def test_event_frame(status, data, event_type):
+    message = Message(type="message", data=data, id=7)
+    message.run_status = status
+
+    frame = event_frame("run-1", message)
+    header, data_line, *rest = frame.decode().split("\n")
+    assert header == "id: 7"
+    assert data_line == "event: agent_event"
+    assert rest[1:] == ["", ""]
+    assert rest[0].startswith("data: ")
+
+    # Same content as the API model
+    payload = event_payload("run-1", message)
+    assert payload.actual_instance.type == event_type
+    assert json.loads(rest[0][len("data: ") :]) == json.loads(payload.to_json())
+
+    # Built once
+    assert event_frame("run-1", message) is frame
+
+
+def test_event_frame_unknown_status():
+    message = Message(type="message", data=None, id=1)
+    with pytest.raises(ValueError):
+        event_frame("run-1", message)
@@ -0,0 +1,323 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import atexit
+import multiprocessing
+import os
+import pickle
+from datetime import datetime
+from typing import Iterator
+from uuid import uuid4
+
+import pytest
+
+from agent_workflow_server.storage.records import (
+    decode_frame,
+    encode_frame,
+    restore_fields,
+)
+from agent_workflow_server.storage.service import DBOperations
+from agent_workflow_server.storage.snapshot import LazyRecord, is_snapshot
+from agent_workflow_server.storage.sqlite import SqliteDB
+from agent_workflow_server.storage.storage import InMemoryDB
+
+AGENT_ID_1 = "3f1e2549-5799-4321-91ae-2a4881d55526"
+AGENT_ID_2 = "2f1e2549-5799-4321-91ae-2a4881d55526"
+THREAD_ID_1 = str(uuid4())
+THREAD_ID_2 = str(uuid4())
+
+
+def _make_run(agent_id: str, thread_id: str, status: str) -> dict:
+    return {
+        "run_id": str(uuid4()),
+        "agent_id": agent_id,
+        "thread_id": thread_id,
+        "input": {},
+        "config": None,
+        "metadata": None,
+        "webhook": None,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "status": status,
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request) -> Iterator[DBOperations]:
+    if request.param == "sqlite":
+        db = SqliteDB(":memory:")
+    else:
+        db = DBOperations({}, {}, {}, {})
+    for agent_id, thread_id, status in [
+        (AGENT_ID_1, THREAD_ID_1, "pending"),
+        (AGENT_ID_1, THREAD_ID_1, "success"),
+        (AGENT_ID_1, THREAD_ID_2, "success"),
+        (AGENT_ID_2, THREAD_ID_2, "error"),
+        (AGENT_ID_2, THREAD_ID_2, "pending"),
+    ]:
+        db.create_run(_make_run(agent_id, thread_id, status))
+    yield db
+    if request.param == "sqlite":
+        db.close()
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({}, 5),
+        ({"thread_id": THREAD_ID_1}, 2),
+        ({"thread_id": THREAD_ID_2, "status": "pending"}, 1),
+        ({"agent_id": AGENT_ID_1, "status": "success"}, 2),
+        ({"agent_id": AGENT_ID_2, "thread_id": THREAD_ID_1}, 0),
+        ({"status": "interrupted"}, 0),
+        ({"status": "success", "webhook": None}, 2),
+        ({"metadata": {"unhashable": True}}, 0),
+    ],
+)
+def test_search_run(db: DBOperations, filters: dict, expected: int):
+    runs = db.search_run(filters)
+    assert len(runs) == expected
+    for run in runs:
+        for key, value in filters.items():
+            assert run[key] == value
+
+
+def test_search_run_after_updates(db: DBOperations):
+    (pending,) = db.search_run({"thread_id": THREAD_ID_1, "status": "pending"})
+
+    db.update_run_status(pending["run_id"], "success")
+    assert db.search_run({"thread_id": THREAD_ID_1, "status": "pending"}) == []
+    assert len(db.search_run({"thread_id": THREAD_ID_1, "status": "success"})) == 2
+
+    db.update_run(pending["run_id"], {"thread_id": THREAD_ID_2})
+    assert len(db.search_run({"thread_id": THREAD_ID_1})) == 1
+    assert len(db.search_run({"thread_id": THREAD_ID_2, "status": "success"})) == 2
+
+    db.delete_run(pending["run_id"])
+    assert len(db.search_run({"thread_id": THREAD_ID_2, "status": "success"})) == 1
+    assert len(db.search_run({"status": "success"})) == 2
+
+
+def test_update_run_versions(db: DBOperations):
+    (run,) = db.search_run({"thread_id": THREAD_ID_1, "status": "pending"})
+    run_id = run["run_id"]
+    assert db.get_run_version(run_id) == 1
+
+    updated = db.update_run_status(run_id, "success")
+    assert updated["status"] == "success"
+    assert db.get_run(run_id)["status"] == "success"
+    assert db.get_run_version(run_id) == 2
+
+    db.create_run_info({"run_id": run_id, "attempts": 0})
+    run_info = db.get_run_info(run_id)
+    run_info["attempts"] += 1
+    db.update_run_info(run_id, run_info)
+    assert db.update_run_info(run_id, {"exec_s": 1.0}) == {
+        "run_id": run_id,
+        "attempts": 1,
+        "exec_s": 1.0,
+    }
+
+    assert db.get_run_version("missing") is None
+    db.delete_run(run_id)
+    assert db.get_run_version(run_id) is None
+
+
+def test_update_in_place():
+    db = DBOperations({}, {}, {}, {})
+    run = db.create_run(_make_run(AGENT_ID_1, THREAD_ID_1, "pending"))
+    assert db.update_run_status(run["run_id"], "success") is run
+    assert run["status"] == "success"
+    assert db.search_run({"status": "success"}) == [run]
+    assert db.search_run({"status": "pending"}) == []
+
+
+def test_search_thread(db: DBOperations):
+    for status in ["idle", "busy", "idle"]:
+        db.create_thread(
+            {
+                "thread_id": str(uuid4()),
+                "metadata": {"key": status},
+                "status": status,
+                "created_at": datetime.now(),
+                "updated_at": datetime.now(),
+            }
+        )
+
+    idle = db.search_thread({"status": "idle"})
+    assert len(idle) == 2
+    assert len(db.search_thread({"metadata": {"key": "busy"}})) == 1
+
+    db.update_thread(idle[0]["thread_id"], {"status": "busy"})
+    assert len(db.search_thread({"status": "busy"})) == 2
+
+    db.delete_thread(idle[1]["thread_id"])
+    assert db.search_thread({"status": "idle"}) == []
+
+
+def test_sqlite_persistence(tmp_path):
+    path = str(tmp_path / "agws_storage.db")
+    db = SqliteDB(path)
+    run = _make_run(AGENT_ID_1, THREAD_ID_1, "pending")
+    db.create_run(run)
+    db.create_run_info({"run_id": run["run_id"], "queued_at": datetime.now()})
+    db.update_run_info(run["run_id"], {"attempts": 1})
+    db.update_run_status(run["run_id"], "success")
+    db.add_run_output(run["run_id"], {"message": "done"})
+    with pytest.raises(ValueError):
+        db.create_run(run)
+    db.close()
+
+    db = SqliteDB(path)
+    assert db.get_run_status(run["run_id"]) == "success"
+    assert db.get_run(run["run_id"])["created_at"] == run["created_at"]
+    assert db.get_run_info(run["run_id"])["attempts"] == 1
+    assert db.get_run_output(run["run_id"]) == {"message": "done"}
+    assert db.search_run({"thread_id": THREAD_ID_1, "status": "success"})
+
+    assert db.delete_run(run["run_id"])
+    assert db.get_run_info(run["run_id"]) is None
+    assert db.get_run_output(run["run_id"]) is None
+    assert not db.delete_run(run["run_id"])
+    db.close()
+
+
+def test_encode_frame_round_trip(caplog):
+    run = _make_run(AGENT_ID_1, THREAD_ID_1, "success")
+    run["metadata"] = {"tags": ("a", "b"), "id": run["run_id"]}
+    decoded, _ = decode_frame(encode_frame(run), 0)
+    assert restore_fields("runs", decoded) == {
+        **run,
+        "metadata": {"tags": ["a", "b"], "id": run["run_id"]},
+    }
+    assert "as strings" not in caplog.text
+
+    class Unknown:
+        def __str__(self):
+            return "unknown"
+
+    decoded, _ = decode_frame(encode_frame({"value": Unknown()}), 0)
+    assert decoded == {"value": "unknown"}
+    assert "Storing values of type" in caplog.text
+
+
+@pytest.fixture
+def persistent_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("AGWS_STORAGE_PERSIST", "True")
+    monkeypatch.setenv("AGWS_STORAGE_PATH", str(tmp_path / "agws_storage.snapshot"))
+    monkeypatch.setenv("AGWS_STORAGE_JOURNAL", "True")
+    monkeypatch.setenv("AGWS_STORAGE_JOURNAL_FLUSH_INTERVAL", "60")
+    return tmp_path
+
+
+def test_journal_replay_after_crash(persistent_env):
+    db = InMemoryDB()
+    run = _make_run(AGENT_ID_1, THREAD_ID_1, "pending")
+    db.create_run(run)
+    db.create_run_info({"run_id": run["run_id"], "queued_at": datetime.now()})
+    db.update_run_info(run["run_id"], {"attempts": 1})
+    db.update_run_status(run["run_id"], "success")
+    db.add_run_output(run["run_id"], {"message": "done"})
+    deleted = db.create_run(_make_run(AGENT_ID_2, THREAD_ID_2, "pending"))
+    db.delete_run(deleted["run_id"])
+
+    # Simulate a crash: records are flushed, but no snapshot is written on exit
+    db._journal.close()
+    atexit.unregister(db.close)
+    assert not os.path.exists(db.storage_file)
+
+    recovered = InMemoryDB()
+    assert recovered.get_run_status(run["run_id"]) == "success"
+    assert recovered.get_run_info(run["run_id"])["attempts"] == 1
+    assert recovered.get_run_output(run["run_id"]) == {"message": "done"}
+    assert recovered.get_run(deleted["run_id"]) is None
+    assert len(recovered.search_run({"thread_id": THREAD_ID_1})) == 1
+    recovered.close()
+
+
+def test_journal_checkpoint(persistent_env):
+    db = InMemoryDB()
+    run = db.create_run(_make_run(AGENT_ID_1, THREAD_ID_1, "pending"))
+    db._journal.checkpoint()
+    assert os.path.getsize(db.journal_file) == 0
+
+    db.update_run_status(run["run_id"], "success")
+    db._journal.flush()
+    assert os.path.getsize(db.journal_file) > 0
+    db.close()
+    assert os.path.getsize(db.journal_file) == 0
+
+    recovered = InMemoryDB()
+    assert recovered.get_run_status(run["run_id"]) == "success"
+    recovered.close()
+
+
+def test_snapshot_lazy_outputs(persistent_env):
+    db = InMemoryDB()
+    runs = [
+        db.create_run(_make_run(AGENT_ID_1, THREAD_ID_1, "success")) for _ in range(3)
+    ]
+    for i, run in enumerate(runs):
+        db.add_run_output(run["run_id"], {"message": f"output {i}"})
+    db.close()
+    assert is_snapshot(db.storage_file)
+
+    loaded = InMemoryDB()
+    assert loaded.get_run(runs[0]["run_id"])["created_at"] == runs[0]["created_at"]
+    assert all(isinstance(v, LazyRecord) for v in dict(loaded._runs_output).values())
+    assert loaded.get_run_output(runs[1]["run_id"]) == {"message": "output 1"}
+    assert not isinstance(dict(loaded._runs_output)[runs[1]["run_id"]], LazyRecord)
+    assert isinstance(dict(loaded._runs_output)[runs[2]["run_id"]], LazyRecord)
+
+    # Unloaded outputs are copied as they are to the next snapshot
+    loaded.delete_run(runs[0]["run_id"])
+    loaded.close()
+    reloaded = InMemoryDB()
+    assert reloaded.get_run_output(runs[0]["run_id"]) is None
+    assert reloaded.get_run_output(runs[1]["run_id"]) == {"message": "output 1"}
+    assert reloaded.get_run_output(runs[2]["run_id"]) == {"message": "output 2"}
+    reloaded.close()
+
+
+def test_load_pickle_snapshot(persistent_env, monkeypatch):
+    # Default storage file of previous versions
+    monkeypatch.delenv("AGWS_STORAGE_PATH")
+    monkeypatch.chdir(persistent_env)
+    run = _make_run(AGENT_ID_1, THREAD_ID_1, "success")
+    with open(persistent_env / "agws_storage.pkl", "wb") as f:
+        pickle.dump(
+            {
+                "runs": {run["run_id"]: run},
+                "runs_info": {},
+                "runs_output": {run["run_id"]: "output"},
+            },
+            f,
+        )
+
+    db = InMemoryDB()
+    assert db.storage_file == "agws_storage.pkl"
+    assert db.get_run(run["run_id"]) == run
+    assert db.get_run_output(run["run_id"]) == "output"
+    db.close()
+    assert is_snapshot(db.storage_file)
+
+
+def _child_storage(conn) -> None:
+    from agent_workflow_server.storage import storage
+
+    conn.send(storage.DB._journal is None and not hasattr(storage.DB, "storage_file"))
+
+
+def test_child_process_storage_not_persisted(persistent_env):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(
+        target=_child_storage, args=(child_conn,)
+    )
+    process.start()
+    try:
+        assert parent_conn.poll(60)
+        assert parent_conn.recv()
+    finally:
+        process.join(10)
+    assert os.environ["AGWS_STORAGE_PERSIST"] == "True"
+    assert not os.path.exists(persistent_env / "agws_storage.snapshot.journal")
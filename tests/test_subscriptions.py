@@ -0,0 +1,144 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.runs import Runs, StreamManager
+from agent_workflow_server.services.subscriptions import (
+    EventLog,
+    SlowConsumerError,
+    Subscription,
+)
+
+DONE = Message(type="control", data="done")
+
+
+def _values(n: int):
+    return [Message(type="message", data=i) for i in range(n)]
+
+
+async def _drain(subscription: Subscription):
+    messages = []
+    while not subscription.empty():
+        messages.append(await subscription.get())
+    return [m.data for m in messages]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "policy, expected, dropped",
+    [
+        ("drop_oldest", [2, 3, 4, "done"], 2),
+        ("latest", [3, 4, "done"], 3),
+    ],
+)
+async def test_subscription_overflow(policy, expected, dropped):
+    subscription = Subscription(max_size=3, policy=policy)
+    for message in _values(5):
+        subscription.put_nowait(message)
+    subscription.put_nowait(DONE)
+    assert await _drain(subscription) == expected
+    assert subscription.dropped == dropped
+
+
+@pytest.mark.asyncio
+async def test_subscription_disconnect():
+    subscription = Subscription(max_size=3, policy="disconnect")
+    for message in _values(4):
+        subscription.put_nowait(message)
+    assert subscription.closed and subscription.dropped == 3
+    with pytest.raises(SlowConsumerError):
+        await subscription.get()
+
+
+@pytest.mark.asyncio
+async def test_subscription_get_waits():
+    subscription = Subscription()
+    getter = asyncio.create_task(subscription.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+    subscription.put_nowait(DONE)
+    assert await getter is DONE
+
+
+def test_stream_manager_cleanup():
+    manager = StreamManager()
+    manager.max_size, manager.policy = 1, "disconnect"
+
+    # Unsubscribing the last subscriber removes the run entry
+    subscription = manager.subscribe("run-1")
+    manager.unsubscribe("run-1", subscription)
+    assert manager.subscriptions == {}
+
+    # Slow subscribers are removed when disconnected
+    slow, other = manager.subscribe("run-1"), manager.subscribe("run-1")
+    manager.put_message("run-1", Message(type="message", data=0))
+    manager.put_message("run-1", Message(type="message", data=1))
+    assert slow.closed and other.closed
+    assert manager.subscriptions == {}
+
+    # The run entry is removed after "done", subscribers keep their messages
+    subscription = manager.subscribe("run-2")
+    manager.put_message("run-2", DONE)
+    assert manager.subscriptions == {}
+    assert subscription.qsize() == 1
+
+
+def test_event_log():
+    events = EventLog(size=3, ttl=60)
+    messages = _values(5)
+    for message in messages:
+        events.record("run-1", message)
+    assert [m.id for m in messages] == [1, 2, 3, 4, 5]
+    # Only the last messages are kept
+    assert [m.data for m in events.replay("run-1", 0)] == [2, 3, 4]
+    assert [m.data for m in events.replay("run-1", 4)] == [4]
+    assert events.replay("run-2", 0) == []
+
+    # Runs without messages for ttl seconds are forgotten
+    events.ttl = 0
+    events.record("run-2", Message(type="message", data=0))
+    assert len(events) == 1
+    assert events.replay("run-2", 0) == []
+
+
+@pytest.mark.asyncio
+async def test_event_log_expiry():
+    events = EventLog(size=3, ttl=0.1)
+    events.record("run-1", Message(type="message", data=0))
+    events.record("run-1", Message(type="control", data="done"))
+    # Forgotten once expired, without any other message recorded
+    await asyncio.sleep(0.3)
+    assert len(events) == 0
+
+
+@pytest.mark.asyncio
+async def test_join_replay(mocker: MockerFixture):
+    manager = StreamManager()
+    mocker.patch("agent_workflow_server.services.runs.stream_manager", manager)
+    mocker.patch(
+        "agent_workflow_server.services.runs.DB.get_run",
+        return_value={"run_id": "run-1", "status": "pending"},
+    )
+    for message in _values(3):
+        await Runs.Stream.publish("run-1", message)
+
+    async def join(last_event_id):
+        return [
+            message.data async for message in Runs.Stream.join("run-1", last_event_id)
+        ]
+
+    # Resumes after the last event received, then follows the live messages
+    joined = asyncio.create_task(join(1))
+    await asyncio.sleep(0)
+    await Runs.Stream.publish("run-1", Message(type="message", data=3))
+    await Runs.Stream.publish("run-1", DONE)
+    assert await joined == [1, 2, 3, "done"]
+    assert manager.subscriptions == {}
+
+    # Replays up to "done" once the run is over
+    assert await join(2) == [2, 3, "done"]
@@ -0,0 +1,59 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from collections import OrderedDict
+from enum import Enum, IntEnum
+
+from pydantic import BaseModel
+
+from agent_workflow_server.utils.tools import make_serializable, serialize_json
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Level(IntEnum):
+    HIGH = 2
+
+
+class Item(BaseModel):
+    name: str
+    color: Color
+
+
+def test_make_serializable_converts():
+    value = {
+        "items": [Item(name="a", color=Color.RED), {"level": Level.HIGH}],
+        "ordered": OrderedDict(color=Color.RED),
+        "tuple": (1, 2),
+    }
+    assert make_serializable(value) == {
+        "items": [{"name": "a", "color": "red"}, {"level": 2}],
+        "ordered": {"color": "red"},
+        "tuple": (1, 2),
+    }
+    # Subclasses of list and dict become plain ones
+    assert type(make_serializable(value)["ordered"]) is dict
+    # The value is not modified
+    assert isinstance(value["items"][0], Item)
+    assert value["items"][1]["level"] is Level.HIGH
+
+
+def test_make_serializable_shares_serializable_parts():
+    messages = [{"type": "human", "content": "hi", "tags": ["a"]}] * 3
+    value = {"messages": messages, "summary": None, "step": 1.5}
+    assert make_serializable(value) is value
+
+    value["last"] = Color.RED
+    result = make_serializable(value)
+    assert result is not value
+    assert result["messages"] is messages
+    assert result["last"] == "red"
+    assert value["last"] is Color.RED
+
+
+def test_serialize_json():
+    value = {"items": [Item(name="a", color=Color.RED)], "level": Level.HIGH}
+    assert json.loads(serialize_json(value)) == make_serializable(value)
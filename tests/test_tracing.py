@@ -0,0 +1,163 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List
+
+import pytest
+from aiohttp import web
+from pytest_mock import MockerFixture
+
+from agent_workflow_server.services import queue
+from agent_workflow_server.services.completions import COMPLETIONS
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.scheduler import RunScheduler
+from agent_workflow_server.services.tracing import TRACER
+from agent_workflow_server.services.webhooks import WebhookDispatcher
+from agent_workflow_server.storage.storage import DB
+
+HOST = "127.0.0.1"
+PORT = 9755
+
+
+@pytest.fixture
+def memory_tracer():
+    TRACER.configure("memory")
+    yield TRACER.exporter.spans
+    TRACER.configure("none")
+
+
+def _by_name(spans) -> Dict[str, list]:
+    by_name: Dict[str, list] = {}
+    for span in spans:
+        by_name.setdefault(span.name, []).append(span)
+    return by_name
+
+
+def test_tracer_disabled():
+    TRACER.configure("none")
+    with TRACER.span("run.create") as span:
+        assert span is None
+    assert TRACER.traceparent(span) is None
+    TRACER.record("agent.step", 1.0)
+
+
+def test_tracer_spans(memory_tracer):
+    with TRACER.span("run.create", agent_id="agent") as root:
+        with TRACER.span("child"):
+            TRACER.record("agent.step", 0.5, step="node")
+    traceparent = TRACER.traceparent(root)
+    with pytest.raises(ValueError):
+        with TRACER.span("run.execute", traceparent):
+            raise ValueError("failed")
+
+    spans = _by_name(memory_tracer)
+    root, child = spans["run.create"][0], spans["child"][0]
+    step, execute = spans["agent.step"][0], spans["run.execute"][0]
+    assert traceparent == f"00-{root.trace_id}-{root.span_id}-01"
+    assert root.parent_id is None and root.attributes == {"agent_id": "agent"}
+    # Nested in the current span
+    assert child.parent_id == root.span_id
+    assert step.parent_id == child.span_id and step.attributes == {"step": "node"}
+    assert step.end_ns - step.start_ns == 500_000_000
+    # Continued from the traceparent of the run
+    assert execute.trace_id == root.trace_id and execute.parent_id == root.span_id
+    assert execute.error == "ValueError: failed"
+
+
+def test_tracer_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    TRACER.configure("file", str(path))
+    try:
+        with TRACER.span("run.create"):
+            TRACER.record("agent.step", 0.1)
+    finally:
+        TRACER.configure("none")
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["agent.step", "run.create"]
+    assert spans[0]["parent_id"] == spans[1]["span_id"]
+
+
+@pytest.mark.asyncio
+async def test_run_trace(memory_tracer, mocker: MockerFixture):
+    async def execute(run):
+        for step in ("plan", "answer"):
+            yield Message("message", {"step": step}, step=step, duration=0.01)
+
+    mocker.patch.object(queue, "execute", execute)
+    mocker.patch.object(queue, "validate_output")
+
+    with TRACER.span("run.create") as create:
+        now = datetime.now()
+        DB.create_run(
+            {
+                "run_id": "traced-run",
+                "agent_id": "traced-agent",
+                "thread_id": None,
+                "input": {},
+                "config": None,
+                "metadata": None,
+                "webhook": None,
+                "created_at": now,
+                "updated_at": now,
+                "status": "pending",
+                "traceparent": TRACER.traceparent(create),
+            }
+        )
+        DB.create_run_info({"run_id": "traced-run", "queued_at": now, "attempts": 0})
+
+    pool = queue.WorkerPool("traced", 1, RunScheduler())
+    await pool.queue.put("traced-run")
+    try:
+        pool.grow(1)
+        await COMPLETIONS.wait("traced-run", timeout=5)
+        await asyncio.sleep(0.01)
+    finally:
+        pool.shrink(1)
+        DB.delete_run("traced-run")
+
+    spans = _by_name(memory_tracer)
+    trace_id = create.span.trace_id
+    execute_span = spans["run.execute"][0]
+    assert execute_span.parent_id == create.span.span_id
+    assert execute_span.attributes["agent_id"] == "traced-agent"
+    assert spans["run.queue"][0].parent_id == create.span.span_id
+    assert [s.attributes["step"] for s in spans["agent.step"]] == ["plan", "answer"]
+    for span in spans["agent.step"] + spans["run.validate_output"]:
+        assert span.parent_id == execute_span.span_id
+    for span in memory_tracer:
+        assert span.trace_id == trace_id
+
+
+@pytest.mark.asyncio
+async def test_webhook_trace(memory_tracer):
+    received: List[str] = []
+
+    async def handler(request: web.Request) -> web.Response:
+        received.append(request.headers.get("traceparent"))
+        return web.Response(status=200)
+
+    app = web.Application()
+    app.router.add_post("/webhook", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, PORT)
+    await site.start()
+
+    dispatcher = WebhookDispatcher(shards=1)
+    try:
+        with TRACER.span("run.create") as create:
+            traceparent = TRACER.traceparent(create)
+        url = f"http://{HOST}:{PORT}/webhook"
+        assert dispatcher.enqueue("run-1", url, b"{}", traceparent)
+        await dispatcher.join()
+    finally:
+        await dispatcher.aclose()
+        await runner.cleanup()
+
+    deliver = _by_name(memory_tracer)["webhook.deliver"][0]
+    assert deliver.parent_id == create.span.span_id
+    # The receiver continues the trace from the webhook call
+    assert received == [deliver.traceparent]
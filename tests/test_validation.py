@@ -3,12 +3,23 @@
 
 from unittest import mock
 
+import jsonschema
 import pytest
 
+from agent_workflow_server.agents.validators import (
+    AgentValidators,
+    InterruptIndex,
+    compile_validator,
+)
+from agent_workflow_server.generated.models.agent_acp_spec_interrupts_inner import (
+    AgentACPSpecInterruptsInner,
+)
 from agent_workflow_server.generated.models.run_create_stateful import RunCreateStateful
 from agent_workflow_server.generated.models.run_create_stateless import (
     RunCreateStateless,
 )
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.stream import _insert_interrupt_name
 from agent_workflow_server.services.validation import (
     InvalidFormatException,
     validate_output,
@@ -467,3 +478,108 @@ def test_validate_run_create_complex_schema_additional_properties_fail():
         # Should fail validation
         with pytest.raises(InvalidFormatException):
             validate_run_create(run_create)
+
+
+def test_agent_validators():
+    interrupts = [
+        AgentACPSpecInterruptsInner(
+            interrupt_type="approval",
+            interrupt_payload={"type": "object", "required": ["approve"]},
+            resume_payload={"type": "object", "required": ["approved"]},
+        ),
+        AgentACPSpecInterruptsInner(
+            interrupt_type="question",
+            interrupt_payload={"type": "object", "required": ["question"]},
+            resume_payload={},
+        ),
+    ]
+    validators = AgentValidators.compile(
+        {
+            "input": {"type": "object"},
+            "output": {},
+            "config": None,
+            "interrupts": interrupts,
+        }
+    )
+    assert validators.input is not None
+    assert validators.output is None and validators.config is None
+
+    # Interrupts are matched in the descriptor order
+    message = _insert_interrupt_name(
+        validators.interrupt_payloads, Message(type="interrupt", data={"question": "?"})
+    )
+    assert message.interrupt_name == "question"
+    with pytest.raises(ValueError):
+        _insert_interrupt_name(
+            validators.interrupt_payloads, Message(type="interrupt", data={})
+        )
+
+    assert validators.resume_payloads["approval"].is_valid({"approved": True})
+    assert not validators.resume_payloads["approval"].is_valid({})
+    assert validators.resume_payloads["question"] is None
+
+    # Invalid schemas are rejected when compiled
+    with pytest.raises(jsonschema.SchemaError):
+        compile_validator({"type": "not-a-type"})
+
+
+def _interrupt_index(payloads):
+    return InterruptIndex(
+        [
+            (interrupt_type, payload, compile_validator(payload))
+            for interrupt_type, payload in payloads
+        ]
+    )
+
+
+def test_interrupt_index_discriminator():
+    def payload(kind):
+        return {
+            "type": "object",
+            "properties": {"kind": {"const": kind}, "text": {"type": "string"}},
+            "required": ["kind", "text"],
+        }
+
+    index = _interrupt_index(
+        [("approval", payload("approval")), ("question", payload("question"))]
+    )
+    assert index.discriminator == "kind"
+    assert index.match({"kind": "question", "text": "?"}) == "question"
+    # Only the selected interrupt is validated
+    assert index.match({"kind": "question", "text": 1}) is None
+    assert index.match({"kind": "other", "text": "?"}) is None
+    assert index.match({"kind": ["approval"], "text": "?"}) is None
+    assert index.match("approval") is None
+
+
+def test_interrupt_index_required_keys():
+    index = _interrupt_index(
+        [
+            ("approval", {"type": "object", "required": ["approve"]}),
+            ("question", {"type": "object", "required": ["question"]}),
+            ("both", {"type": "object", "required": ["approve", "question"]}),
+            ("text", {"type": "string"}),
+        ]
+    )
+    assert index.discriminator is None
+    # The first valid interrupt of the descriptor is matched
+    assert index.match({"approve": True, "question": "?"}) == "approval"
+    assert index.match({"question": "?"}) == "question"
+    assert index.match("?") == "text"
+    assert index.match({}) is None
+    assert list(index) == [(c.interrupt_type, c.validator) for c in index.candidates]
+
+
+def test_interrupt_index_given_type():
+    index = _interrupt_index(
+        [
+            ("any", {}),
+            ("question", {"type": "object", "required": ["question"]}),
+        ]
+    )
+    assert index.match({"question": "?"}) == "any"
+    # A type given by the adapter is only checked against its schema
+    assert index.match({"question": "?"}, "question") == "question"
+    assert index.match({}, "question") is None
+    # Unknown types are looked up from the payload
+    assert index.match({"question": "?"}, "unknown") == "any"
@@ -0,0 +1,177 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+"""Differential tests of the "codegen" validation engine against jsonschema"""
+
+import glob
+import json
+import os
+
+import jsonschema
+import pytest
+
+from agent_workflow_server.agents.validators import (
+    CodegenValidator,
+    compile_validator,
+    validate,
+)
+
+# Instances of every JSON type, with the edge cases of the type checks
+INSTANCES = [
+    None,
+    True,
+    False,
+    0,
+    1,
+    -1,
+    1.0,
+    1.5,
+    -0.5,
+    "",
+    "a",
+    "ab",
+    "abc1",
+    "é" * 3,
+    [],
+    [1],
+    [1, "a"],
+    ["a", "b", "c"],
+    [True, 1],
+    {},
+    {"a": 1},
+    {"a": "x", "b": 2},
+    {"a": True},
+    {"a": 1.0, "c": None},
+    {"name": "bob", "age": 30, "tags": ["x"]},
+    {"name": "bob", "age": 30.5, "extra": True},
+]
+
+SCHEMAS = [
+    {"type": "string"},
+    {"type": "integer"},
+    {"type": "number"},
+    {"type": "boolean"},
+    {"type": "null"},
+    {"type": "array"},
+    {"type": "object"},
+    {"type": ["string", "null"]},
+    {"type": ["integer", "boolean"]},
+    {"enum": ["a", "b"]},
+    {"enum": [1, "a", None]},
+    {"enum": [True]},
+    {"enum": [1]},
+    {"enum": [[1], {"a": 1}]},
+    {"const": 1},
+    {"const": True},
+    {"const": {"a": 1}},
+    {"minLength": 2, "maxLength": 3},
+    {"type": "string", "pattern": "^[a-z]+$"},
+    {"pattern": "[0-9]"},
+    {"minimum": 0, "maximum": 1},
+    {"exclusiveMinimum": 0, "exclusiveMaximum": 1.5},
+    {"minItems": 1, "maxItems": 2},
+    {"items": {"type": "integer"}},
+    {"items": False},
+    {"items": True},
+    {"required": ["a"]},
+    {"properties": {"a": {"type": "integer"}, "b": False}},
+    {"properties": {"a": True}, "additionalProperties": False},
+    {"properties": {"a": {}}, "additionalProperties": {"type": "integer"}},
+    {"allOf": [{"type": "number"}, {"minimum": 1}]},
+    {"anyOf": [{"type": "string"}, {"type": "array", "minItems": 2}]},
+    {"oneOf": [{"type": "integer"}, {"type": "number"}]},
+    {"not": {"type": "object"}},
+    {"type": "string", "format": "date", "title": "Date", "nullable": True},
+    {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "minLength": 1},
+            "age": {"type": "integer", "minimum": 0},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["name", "age"],
+        "additionalProperties": False,
+    },
+    {"$schema": "http://json-schema.org/draft-07/schema#", "type": "integer"},
+    {"$defs": {"a": {"type": "string"}}, "$ref": "#/$defs/a"},
+    {"$defs": {"a": {"type": "integer"}}, "$ref": "#/$defs/a", "minimum": 10},
+    {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "definitions": {"a b": {"type": "integer"}},
+        "$ref": "#/definitions/a%20b",
+        "minimum": 10,
+    },
+    {
+        "definitions": {"a/b": False},
+        "properties": {"a": {"$ref": "#/definitions/a~1b"}},
+    },
+    {
+        "$defs": {
+            "node": {
+                "type": "object",
+                "properties": {"a": {"$ref": "#/$defs/node"}, "b": {"type": "integer"}},
+            }
+        },
+        "$ref": "#/$defs/node",
+    },
+]
+
+
+def _manifest_schemas():
+    root = os.path.dirname(__file__)
+    paths = glob.glob(os.path.join(root, "agents", "*.json")) + [
+        os.path.join(root, "mock_manifest.json")
+    ]
+    schemas = []
+    for path in sorted(paths):
+        with open(path) as file:
+            acp = json.load(file)["extensions"][0]["data"]["acp"]
+        schemas += [acp[key] for key in ("input", "output", "config") if acp.get(key)]
+        for interrupt in acp.get("interrupts") or []:
+            schemas += [interrupt["interrupt_payload"], interrupt["resume_payload"]]
+    return schemas
+
+
+def _error(validator, instance):
+    try:
+        validate(validator, instance)
+    except jsonschema.ValidationError as e:
+        return str(e)
+    return None
+
+
+@pytest.mark.parametrize("schema", SCHEMAS + _manifest_schemas())
+def test_codegen_matches_jsonschema(schema):
+    reference = compile_validator(schema, "jsonschema")
+    codegen = compile_validator(schema, "codegen")
+    for instance in INSTANCES:
+        assert codegen.is_valid(instance) == reference.is_valid(instance), (
+            schema,
+            instance,
+        )
+        # Same errors reported
+        assert _error(codegen, instance) == _error(reference, instance)
+
+
+@pytest.mark.parametrize(
+    "schema",
+    [
+        {"$ref": "https://example.com/schema.json"},
+        {"$defs": {"a": {"$id": "a.json", "type": "string"}}, "$ref": "#/$defs/a"},
+        {"$dynamicRef": "#meta"},
+        {"patternProperties": {"^a": {"type": "string"}}},
+        {"properties": {"a": {"uniqueItems": True}}},
+        {"$schema": "http://json-schema.org/draft-04/schema#", "type": "integer"},
+        {"$schema": "http://json-schema.org/draft-07/schema#", "items": [{}]},
+    ],
+)
+def test_codegen_fallback(schema):
+    validator = compile_validator(schema, "codegen")
+    assert not isinstance(validator, CodegenValidator)
+    assert isinstance(validator, jsonschema.protocols.Validator)
+
+
+def test_codegen_generated():
+    validator = compile_validator(SCHEMAS[-7], "codegen")
+    assert isinstance(validator, CodegenValidator)
+    assert "def _v" in validator.source
@@ -0,0 +1,109 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from pytest_mock import MockerFixture
+
+from agent_workflow_server.services import queue
+from agent_workflow_server.services.completions import COMPLETIONS
+from agent_workflow_server.services.message import Message
+from agent_workflow_server.services.metrics import LOOP_BLOCKED, LOOP_LAG_SECONDS
+from agent_workflow_server.services.scheduler import RunScheduler
+from agent_workflow_server.services.watchdog import LoopWatchdog
+from agent_workflow_server.storage.storage import DB
+
+
+def blocking_node():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_reports_blocking_call():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1)
+    blocked_before = LOOP_BLOCKED.values.get(("",), 0)
+    lag_before = (
+        LOOP_LAG_SECONDS.values[()].count if () in LOOP_LAG_SECONDS.values else 0
+    )
+    task = asyncio.create_task(watchdog.run())
+    try:
+        await asyncio.sleep(0.05)
+        blocking_node()
+        await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert len(watchdog.blocked) == 1
+    blocked = watchdog.blocked[0]
+    assert blocked.blocked_s > 0.1
+    assert "blocking_node" in blocked.stack[-1]
+    assert blocked.run_id is None
+    assert watchdog.max_lag >= 0.25
+    assert LOOP_BLOCKED.values[("",)] == blocked_before + 1
+    assert LOOP_LAG_SECONDS.values[()].count > lag_before
+
+
+@pytest.mark.asyncio
+async def test_watchdog_lag_only():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0)
+    task = asyncio.create_task(watchdog.run())
+    try:
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert watchdog.blocked == []
+    assert watchdog.max_lag >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_watchdog_finds_run(mocker: MockerFixture):
+    async def execute(run):
+        blocking_node()
+        yield Message("message", {})
+
+    mocker.patch.object(queue, "execute", execute)
+    mocker.patch.object(queue, "validate_output")
+
+    now = datetime.now()
+    DB.create_run(
+        {
+            "run_id": "blocking-run",
+            "agent_id": "blocking-agent",
+            "thread_id": None,
+            "input": {},
+            "config": None,
+            "metadata": None,
+            "webhook": None,
+            "created_at": now,
+            "updated_at": now,
+            "status": "pending",
+        }
+    )
+    DB.create_run_info({"run_id": "blocking-run", "queued_at": now, "attempts": 0})
+
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.1)
+    task = asyncio.create_task(watchdog.run())
+    pool = queue.WorkerPool("blocking", 1, RunScheduler())
+    await pool.queue.put("blocking-run")
+    try:
+        pool.grow(1)
+        await COMPLETIONS.wait("blocking-run", timeout=5)
+        await asyncio.sleep(0.05)
+    finally:
+        pool.shrink(1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        DB.delete_run("blocking-run")
+
+    blocked = watchdog.blocked[0]
+    assert (blocked.run_id, blocked.agent_id) == ("blocking-run", "blocking-agent")
+    assert "blocking_node" in blocked.stack[-1]
+    assert LOOP_BLOCKED.values[("blocking-agent",)] >= 1
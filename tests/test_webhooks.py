@@ -0,0 +1,130 @@
+# Copyright AGNTCY Contributors (https://github.com/agntcy)
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+from typing import List
+
+import pytest
+from aiohttp import web
+
+from agent_workflow_server.services.tracing import TRACER
+from agent_workflow_server.services.webhooks import WebhookDispatcher
+
+HOST = "127.0.0.1"
+PORT = 9754
+
+
+@pytest.mark.asyncio
+async def test_webhook_delivery():
+    received: List[bytes] = []
+    statuses = [503, 200, 200, 200]
+
+    async def handler(request: web.Request) -> web.Response:
+        body = await request.read()
+        status = statuses.pop(0) if statuses else 200
+        if status == 200:
+            received.append(body)
+        return web.Response(status=status)
+
+    app = web.Application()
+    app.router.add_post("/webhook", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, PORT)
+    await site.start()
+
+    dispatcher = WebhookDispatcher(shards=2, backoff_s=0.01)
+    try:
+        url = f"http://{HOST}:{PORT}/webhook"
+        for i in range(3):
+            assert dispatcher.enqueue("run-1", url, f"run-1 {i}".encode())
+        assert dispatcher.enqueue("run-2", url, b"run-2")
+        await dispatcher.join()
+
+        # The first call was retried, and the calls of a run stay in order
+        assert [body for body in received if body.startswith(b"run-1")] == [
+            b"run-1 0",
+            b"run-1 1",
+            b"run-1 2",
+        ]
+        assert b"run-2" in received
+        client = dispatcher._http
+
+        # Unreachable receiver: the call fails after all its attempts
+        assert dispatcher.enqueue("run-3", "http://127.0.0.1:1/webhook", b"run-3")
+        await dispatcher.join()
+        assert dispatcher.failed == 1
+        # A single client, with a bounded pool, for all the hosts
+        assert dispatcher._http is client
+    finally:
+        await dispatcher.aclose()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_webhook_queue_full():
+    dispatcher = WebhookDispatcher(shards=1, queue_size=1)
+    try:
+        url = "http://127.0.0.1:1/webhook"
+        assert dispatcher.enqueue("run-1", url, b"1")
+        assert not dispatcher.enqueue("run-1", url, b"2")
+        assert dispatcher.dropped == 1
+    finally:
+        await dispatcher.aclose(timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_webhook_batching():
+    received: List[list] = []
+    traceparents: List[str] = []
+
+    async def handler(request: web.Request) -> web.Response:
+        received.append(await request.json())
+        traceparents.append(request.headers.get("traceparent"))
+        return web.Response(status=200)
+
+    app = web.Application()
+    app.router.add_post("/webhook", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, PORT)
+    await site.start()
+
+    dispatcher = WebhookDispatcher(batch_window_s=0.05, batch_size=3)
+    try:
+        url = f"http://{HOST}:{PORT}/webhook"
+        # Superseded statuses are collapsed, the batch is sent after the window
+        dispatcher.enqueue("run-1", url, b'{"run_id": "run-1", "status": "pending"}')
+        dispatcher.enqueue("run-2", url, b'{"run_id": "run-2", "status": "pending"}')
+        dispatcher.enqueue("run-1", url, b'{"run_id": "run-1", "status": "success"}')
+        await asyncio.sleep(0.2)
+        await dispatcher.join()
+        assert received == [
+            [
+                {"run_id": "run-2", "status": "pending"},
+                {"run_id": "run-1", "status": "success"},
+            ]
+        ]
+
+        # A full batch is sent without waiting for the window
+        received.clear()
+        dispatcher.batch_window_s = 60
+        for i in range(3):
+            dispatcher.enqueue(f"run-{i}", url, f'{{"run_id": "run-{i}"}}'.encode())
+        assert not dispatcher._batches
+        await asyncio.wait_for(dispatcher.join(), 1)
+        assert received == [[{"run_id": f"run-{i}"} for i in range(3)]]
+
+        # Pending batches are sent on close, in the trace of their first run
+        received.clear()
+        TRACER.configure("memory")
+        traceparent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        dispatcher.enqueue("run-1", url, b'{"run_id": "run-1"}', traceparent)
+        dispatcher.enqueue("run-2", url, b'{"run_id": "run-2"}')
+        await dispatcher.aclose()
+        assert received == [[{"run_id": "run-1"}, {"run_id": "run-2"}]]
+        assert traceparents[-1].split("-")[1] == traceparent.split("-")[1]
+    finally:
+        TRACER.configure("none")
+        await dispatcher.aclose()
+        await runner.cleanup()